@@ -0,0 +1,77 @@
+"""
+benchmark for how many urls each frontier order discovers for a budget of fetches
+
+fetching is simulated on a synthetic site so that only the order changes:
+    * /hub/<n>/ pages link to many items and a few other hubs (high link yield)
+    * /item/<n>/<i> pages link to the next item and an archive page (low yield)
+    * /archive/<n>/<m> pages link to the next archive page and an item (low yield)
+a crawl of --pages fetches is run through a Frontier with each order and the
+number of distinct urls discovered (and per fetch) is reported
+
+usage:
+    python -m benchmarks.frontier_order --pages 500
+"""
+import random
+
+import click
+
+from simple_crawler.frontier import Frontier
+from simple_crawler.hyperlink import make_hyperlink
+from simple_crawler.ordering import make_order
+from simple_crawler.ordering import ORDERS
+
+HOST = "https://www.example.com"
+
+
+def links_on(path: str, rng: random.Random, hub_links: int) -> list:
+    """the links of a page of the synthetic site"""
+    parts = path.strip("/").split("/")
+    if parts[0] == "hub":
+        links = [f"/item/{parts[1]}/{i}" for i in range(hub_links)]
+        return links + [f"/hub/{rng.randint(0, 10000)}/" for _ in range(hub_links // 4)]
+    if parts[0] == "item":
+        section, page = int(parts[1]), int(parts[2])
+        return ["/", f"/item/{section}/{page + 1}", f"/archive/{rng.randint(0, 10000)}/0"]
+    if parts[0] == "archive":
+        section, page = int(parts[1]), int(parts[2])
+        return ["/", f"/archive/{section}/{page + 1}", f"/item/{rng.randint(0, 10000)}/0"]
+    return [f"/hub/{i}/" for i in range(3)] + [f"/archive/{i}/0" for i in range(30)]
+
+
+def run(order_name: str, pages: int, hub_links: int, seed: int) -> int:
+    """simulate a crawl of pages fetches and return the number of distinct urls discovered"""
+    rng = random.Random(seed)
+    order = make_order(order_name)
+    frontier = Frontier(order=order)
+    seen = {"/"}
+    frontier.put(make_hyperlink(HOST + "/"))
+
+    for _ in range(pages):
+        url = frontier.get(timeout=0)
+        if url is None:
+            break
+        new_links = 0
+        for path in links_on(url.path or "/", rng, hub_links):
+            if path not in seen:
+                seen.add(path)
+                frontier.put(make_hyperlink(HOST + path), frontier.depth_of(url) + 1)
+                new_links += 1
+        order.record(url, new_links)
+        frontier.task_done(url)
+
+    return len(seen)
+
+
+@click.command()
+@click.option("--pages", default=500)
+@click.option("--hub-links", default=20)
+@click.option("--seed", default=0)
+def main(pages, hub_links, seed):
+    click.echo(f"{'order':>15} {'discovered':>11} {'per fetch':>10}")
+    for order_name in ORDERS:
+        discovered = run(order_name, pages, hub_links, seed)
+        click.echo(f"{order_name:>15} {discovered:>11} {discovered / pages:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
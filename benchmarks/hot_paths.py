@@ -0,0 +1,310 @@
+"""
+micro benchmarks of the per link hot paths: normalising urls, Hyperlink, HyperlinkSet and parsing
+
+the corpus is made up from a seed to look like the real world: urls with
+messy casing, relative paths (../, ./, //host), userinfo, ports, unsorted
+queries, spaces & percent escapes, fragments and the odd mailto: or
+javascript:, and pages of html with those urls in <a> tags between navs,
+scripts, comments, entities and upper case tags
+
+for each benchmark the time per op is the best of --repeat runs over the
+corpus (ops on a whole HyperlinkSet are per link), and the allocations per
+op are the memory blocks and bytes still held by the results (from
+sys.getallocatedblocks and tracemalloc) so a cheaper Hyperlink shows up in both,
+the url & link caches are cleared before every run, so a run only gains from
+the urls it repeats, as the *.site benchmarks do: the links of 50 pages that
+share a nav of 80 links, each with 20 links of its own
+
+the results can be saved as a baseline (--save, to hot_paths_baseline.json
+next to this file) which later runs are compared with, --max-slowdown fails
+the run if any benchmark got slower by more than that percentage, timings are
+only comparable on the same machine and python
+
+usage:
+    python -m benchmarks.hot_paths
+    python -m benchmarks.hot_paths --save
+    python -m benchmarks.hot_paths -b normalise_url -b hyperlink --max-slowdown 10
+"""
+import gc
+import json
+import os
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from typing import Callable
+from typing import Dict
+from typing import List
+from typing import NamedTuple
+from typing import Tuple
+
+import click
+
+from simple_crawler.hyperlink import Hyperlink
+from simple_crawler.hyperlink import LINK_CACHE
+from simple_crawler.hyperlink import LinkPipeline
+from simple_crawler.hyperlink import make_hyperlink
+from simple_crawler.hyperlink import make_hyperlink_set
+from simple_crawler.parser import AnchorTagParser
+from simple_crawler.parser import parse_hrefs
+from simple_crawler.url_normalisation import normalise_url
+from simple_crawler.url_normalisation import URL_CACHE
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "hot_paths_baseline.json")
+BASE = "https://www.example.com/blog/2020/10/post.html"
+
+HOSTS = [
+    "www.example.com",
+    "WWW.Example.COM",
+    "example.com.",
+    "cdn.example.net",
+    "news.example.org",
+]
+WORDS = ["blog", "news", "about", "Products", "tag", "category", "2020", "10", "post", "IMAGES"]
+PARAMS = ["utm_source", "utm_medium", "page", "sort", "q", "ref", "id", "lang"]
+
+
+class Corpus(NamedTuple):
+    """
+    urls and pages to benchmark with
+
+    :param urls: (list) hrefs as they are found on pages (relative and absolute)
+    :param pages: (list) html of pages with those hrefs in <a> tags
+    """
+
+    urls: List[str]
+    pages: List[str]
+
+
+def make_url(rng: random.Random) -> str:
+    """an href as they are found on real pages"""
+    path = "/".join(rng.choice(WORDS) for _ in range(rng.randint(0, 4)))
+    if rng.random() < 0.1:
+        path += " " + rng.choice(WORDS)
+    if rng.random() < 0.1:
+        path += "%20" + rng.choice(WORDS)
+    if rng.random() < 0.3:
+        path += rng.choice([".html", "/", ".php", ".PDF"])
+
+    query = ""
+    if rng.random() < 0.3:
+        params = rng.sample(PARAMS, rng.randint(1, 4))
+        query = "?" + "&".join(f"{param}={rng.choice(WORDS)}" for param in params)
+    fragment = "#" + rng.choice(WORDS) if rng.random() < 0.15 else ""
+
+    kind = rng.random()
+    if kind < 0.03:
+        return rng.choice(["mailto:hello@example.com", "javascript:void(0)", "tel:+441234567890"])
+    if kind < 0.35:
+        scheme = rng.choice(["https", "http", "HTTPS"])
+        userinfo = rng.choice(["", "", "", "", "user:@", ":@"])
+        port = rng.choice(["", "", "", ":8080"])
+        return f"{scheme}://{userinfo}{rng.choice(HOSTS)}{port}/{path}{query}{fragment}"
+    if kind < 0.4:
+        return f"//{rng.choice(HOSTS)}/{path}{query}{fragment}"
+    if kind < 0.55:
+        return rng.choice(["../", "./", "", "../../"]) + path + query + fragment
+    if kind < 0.6:
+        return query or fragment or "#"
+    return f"/{path}{query}{fragment}"
+
+
+def make_page(urls: List[str], rng: random.Random) -> str:
+    """the html of a page linking to urls, with the rest of a real page around them"""
+    body = [
+        "<!DOCTYPE html><html lang='en'><head><meta charset='utf-8'><title>Post &amp; more</title>",
+        "<script>window.dataLayer = window.dataLayer || []; if (a < b) { go(); }</script>",
+        "<style>.nav a { color: red; }</style></head><body><!-- header -->",
+        "<nav class='nav'><ul>",
+    ]
+    for i, url in enumerate(urls):
+        tag = rng.choice(["a", "a", "a", "A"])
+        text = " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 5)))
+        quote = rng.choice(["'", '"'])
+        link = f"<{tag} class='link' href={quote}{url}{quote} rel='nofollow'>{text}</{tag}>"
+        if i % 10 == 0:
+            body.append("</ul></nav><div class='content'><p>")
+            body.append(" ".join(rng.choice(WORDS) for _ in range(60)) + " &copy; &#8212;</p>")
+            body.append("<img src='/images/a.png' alt='an image'><ul>")
+        body.append(f"<li>{link}</li>")
+    body.append("</ul></div><footer><p>&copy; 2020</p></footer></body></html>")
+    return "".join(body)
+
+
+def make_corpus(seed: int = 0, urls: int = 5000, pages: int = 50, links: int = 100) -> Corpus:
+    rng = random.Random(seed)
+    corpus_urls = [make_url(rng) for _ in range(urls)]
+    corpus_pages = [make_page(rng.sample(corpus_urls, links), rng) for _ in range(pages)]
+    return Corpus(corpus_urls, corpus_pages)
+
+
+def site_links(urls: List[str], pages: int = 50, nav: int = 80, own: int = 20) -> List[str]:
+    """the links of pages of a site, each with the same nav links and some of its own"""
+    links = []
+    for page in range(pages):
+        start, end = nav + page * own, nav + (page + 1) * own
+        links += urls[:nav] + urls[start:end]
+    return links
+
+
+def clear_caches() -> None:
+    URL_CACHE.clear()
+    LINK_CACHE.clear()
+
+
+def feed(page: str):
+    parser = AnchorTagParser()
+    parser.feed(page)
+    return parser.found_links
+
+
+def benchmarks(corpus: Corpus) -> Dict[str, Tuple[Callable[[], object], int]]:
+    """each benchmark: a function running it over the corpus, and the number of ops it runs"""
+    urls = corpus.urls
+    links = [Hyperlink(url) for url in urls]
+    base = make_hyperlink(BASE)
+    link_set = make_hyperlink_set(urls)
+    joined = link_set.join_all(base)
+    pages = [page.encode() for page in corpus.pages]
+    site = site_links(urls)
+    pipeline = (
+        LinkPipeline()
+        .trim(query=True, fragment=True)
+        .join(base)
+        .filter_by(authority=base.authority)
+    )
+    return {
+        "normalise_url": (lambda: [normalise_url(url) for url in urls], len(urls)),
+        "normalise_url.site": (lambda: [normalise_url(url) for url in site], len(site)),
+        "hyperlink": (lambda: [Hyperlink(url) for url in urls], len(urls)),
+        "hyperlink.site": (lambda: [Hyperlink(url) for url in site], len(site)),
+        "hyperlink.join": (lambda: [link.join(base) for link in links], len(links)),
+        "hyperlink.authority": (lambda: [link.authority for link in links], len(links)),
+        "hyperlink.hash": (lambda: [hash(link) for link in links], len(links)),
+        "make_hyperlink_set": (lambda: make_hyperlink_set(urls), len(urls)),
+        "hyperlink_set.trim": (lambda: link_set.trim(query=True, fragment=True), len(link_set)),
+        "hyperlink_set.join_all": (lambda: link_set.join_all(base), len(link_set)),
+        "hyperlink_set.filter_by": (
+            lambda: joined.filter_by(authority=base.authority),
+            len(joined),
+        ),
+        # the hrefs of a page as the crawler took them, then as it takes them
+        "hyperlink_set.chain": (
+            lambda: make_hyperlink_set(urls)
+            .trim(query=True, fragment=True)
+            .join_all(base)
+            .filter_by(authority=base.authority),
+            len(urls),
+        ),
+        "link_pipeline": (lambda: pipeline.collect(urls), len(urls)),
+        "link_pipeline.site": (lambda: pipeline.collect(site), len(site)),
+        "anchor_tag_parser": (lambda: [feed(page) for page in corpus.pages], len(corpus.pages)),
+        "parse_hrefs": (lambda: [parse_hrefs(page) for page in pages], len(pages)),
+    }
+
+
+def time_op(func: Callable[[], object], ops: int, repeat: int) -> float:
+    """the best ns per op of repeat runs of func"""
+    best = None
+    for _ in range(repeat):
+        clear_caches()
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best / ops * 1e9
+
+
+def allocations_per_op(func: Callable[[], object], ops: int) -> Tuple[float, float]:
+    """(blocks, bytes) of memory held by the result of func, per op"""
+    clear_caches()
+    gc.collect()
+    blocks = sys.getallocatedblocks()
+    result = func()
+    blocks = sys.getallocatedblocks() - blocks
+    del result
+
+    clear_caches()
+    gc.collect()
+    tracemalloc.start()
+    size = tracemalloc.get_traced_memory()[0]
+    result = func()
+    size = tracemalloc.get_traced_memory()[0] - size
+    tracemalloc.stop()
+    del result
+    return blocks / ops, size / ops
+
+
+def run(names: List[str], corpus: Corpus, repeat: int) -> Dict[str, dict]:
+    results = {}
+    for name, (func, ops) in benchmarks(corpus).items():
+        if names and name not in names:
+            continue
+        # warm up
+        func()
+        blocks, size = allocations_per_op(func, ops)
+        results[name] = {
+            "ns_per_op": time_op(func, ops, repeat),
+            "blocks_per_op": blocks,
+            "bytes_per_op": size,
+        }
+    return results
+
+
+def slowdown(result: dict, baseline: dict) -> float:
+    """
+    the percentage result is slower than baseline by (negative if faster)
+
+    >>> slowdown({'ns_per_op': 1500.0}, {'ns_per_op': 1000.0})
+    50.0
+    """
+    return (result["ns_per_op"] / baseline["ns_per_op"] - 1) * 100
+
+
+@click.command()
+@click.option("--benchmark", "-b", multiple=True, help="benchmarks to run, all if none")
+@click.option("--repeat", default=5)
+@click.option("--seed", default=0)
+@click.option("--baseline", type=click.Path(dir_okay=False), default=BASELINE_FILE)
+@click.option("--save", is_flag=True, help="save the results as the baseline")
+@click.option("--max-slowdown", type=float, default=None, help="percent, fail if any is slower")
+def main(benchmark, repeat, seed, baseline, save, max_slowdown):
+    corpus = make_corpus(seed)
+    results = run(list(benchmark), corpus, repeat)
+
+    baselines = {}
+    if not save and os.path.exists(baseline):
+        with open(baseline) as file:
+            baselines = json.load(file)["results"]
+
+    click.echo(
+        f"{'benchmark':>24} {'ns/op':>10} {'blocks/op':>10} {'bytes/op':>10} "
+        f"{'baseline':>10} {'change':>8}"
+    )
+    slower = []
+    for name, result in results.items():
+        line = (
+            f"{name:>24} {result['ns_per_op']:>10.0f} {result['blocks_per_op']:>10.1f} "
+            f"{result['bytes_per_op']:>10.0f}"
+        )
+        if name in baselines:
+            change = slowdown(result, baselines[name])
+            line += f" {baselines[name]['ns_per_op']:>10.0f} {change:>+7.1f}%"
+            if max_slowdown is not None and change > max_slowdown:
+                slower.append(name)
+        click.echo(line)
+
+    if save:
+        machine = {"python": platform.python_version(), "platform": platform.platform()}
+        with open(baseline, "w") as file:
+            json.dump({"machine": machine, "seed": seed, "results": results}, file, indent=2)
+            file.write("\n")
+        click.echo(f"saved baseline to: {baseline}")
+
+    if slower:
+        raise click.ClickException(f"slower than baseline by over {max_slowdown}%: {slower}")
+
+
+if __name__ == "__main__":
+    main()
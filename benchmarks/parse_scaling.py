@@ -0,0 +1,83 @@
+"""
+benchmark for how html parsing throughput scales with parse workers (processes)
+
+fetching is taken out of the picture: max_workers threads each take a page
+of synthetic content-heavy html and get its hrefs the same way Crawler does
+after a fetch (Crawler._hrefs_from_response), so the only thing that changes
+between runs is where the parsing happens
+
+usage:
+    python -m benchmarks.parse_scaling --pages 400 --links 300 --max-workers 16
+"""
+import os
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import click
+
+from simple_crawler.crawler import Crawler
+
+
+class FakeResponse:
+    """the parts of a response the parse stage uses"""
+
+    status_code = 200
+    encoding = "utf-8"
+
+    def __init__(self, content: bytes):
+        self.content = content
+
+    @property
+    def text(self) -> str:
+        return self.content.decode(self.encoding)
+
+
+def make_page(links: int, paragraphs: int, rng: random.Random) -> bytes:
+    """a content-heavy html page with links spread between paragraphs of text"""
+    words = ["lorem", "ipsum", "dolor", "sit", "amet", "consectetur", "adipiscing", "elit"]
+    body = []
+    for i in range(paragraphs):
+        text = " ".join(rng.choice(words) for _ in range(80))
+        body.append(f"<p class='text'><span>{text}</span></p>")
+        for _ in range(links // paragraphs):
+            path = "/".join(rng.choice(words) for _ in range(rng.randint(1, 4)))
+            body.append(f"<a href='/{path}?page={rng.randint(0, 50)}'>{rng.choice(words)}</a>")
+    return f"<html><head><title>page</title></head><body>{''.join(body)}</body></html>".encode()
+
+
+def run(pages, parse_workers: int, max_workers: int) -> float:
+    """parse every page and return pages/sec"""
+    crawler = Crawler(max_workers=max_workers, parse_workers=parse_workers)
+    with crawler._parse_stage(), ThreadPoolExecutor(max_workers=max_workers) as executor:
+        # warm up the process pool so we don't time process start up
+        list(executor.map(crawler._hrefs_from_response, pages[:max_workers]))
+
+        start = time.perf_counter()
+        list(executor.map(crawler._hrefs_from_response, pages))
+        elapsed = time.perf_counter() - start
+
+    return len(pages) / elapsed
+
+
+@click.command()
+@click.option("--pages", default=400)
+@click.option("--links", default=300)
+@click.option("--paragraphs", default=50)
+@click.option("--max-workers", default=16)
+@click.option("--seed", default=0)
+def main(pages, links, paragraphs, max_workers, seed):
+    rng = random.Random(seed)
+    responses = [FakeResponse(make_page(links, paragraphs, rng)) for _ in range(pages)]
+
+    parse_workers = [0] + [n for n in (1, 2, 4, 8, 16, 32) if n <= (os.cpu_count() or 1)]
+    baseline = None
+    click.echo(f"{'parse workers':>14} {'pages/sec':>10} {'speedup':>8}")
+    for workers in parse_workers:
+        pages_per_sec = run(responses, workers, max_workers)
+        baseline = baseline or pages_per_sec
+        click.echo(f"{workers:>14} {pages_per_sec:>10.1f} {pages_per_sec / baseline:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
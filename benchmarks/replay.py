@@ -0,0 +1,81 @@
+"""
+benchmark for the time a crawl takes with no network, replayed from a WARC file
+
+a synthetic site of --pages pages each linking to --links others (relative,
+absolute, with queries & fragments, so normalising and deduping have work to
+do) is written to a WARC file, then crawled with Crawler(replay=...) for each
+number of workers, fetching is a lookup in the archive so what is timed is
+robots, parsing, normalising, deduping and the frontier (with no events
+written), the same every run
+
+usage:
+    python -m benchmarks.replay --pages 2000 --links 20
+"""
+import os
+import random
+import tempfile
+import time
+
+import click
+import requests
+
+from simple_crawler.crawler import Crawler
+from simple_crawler.warc import WarcWriter
+
+HOST = "https://www.example.com"
+
+
+def page(n: int, pages: int, links: int, rng: random.Random) -> bytes:
+    """the html of page n of the synthetic site"""
+    hrefs = []
+    for _ in range(links):
+        m = rng.randrange(pages)
+        hrefs.append(rng.choice([f"/page/{m}", f"{HOST}/page/{m}?ref={n}", f"../page/{m}#top"]))
+    anchors = "".join(f"<li><a href='{href}'>page {href}</a></li>" for href in hrefs)
+    return f"<html><head><title>{n}</title></head><body><ul>{anchors}</ul></body></html>".encode()
+
+
+def response(url: str, content: bytes, status_code: int = 200) -> requests.Response:
+    resp = requests.Response()
+    resp.url = url
+    resp.status_code = status_code
+    resp.reason = "OK" if status_code == 200 else "Not Found"
+    resp.headers = requests.structures.CaseInsensitiveDict({"Content-Type": "text/html"})
+    resp._content = content
+    return resp
+
+
+def write_site(path: str, pages: int, links: int, seed: int) -> None:
+    """write every page of the synthetic site (and a missing robots.txt) to a WARC file"""
+    rng = random.Random(seed)
+    with WarcWriter(path) as writer:
+        writer.write_response(response(HOST + "/robots.txt", b"", 404))
+        writer.write_response(response(HOST + "/", page(0, pages, links, rng)))
+        for n in range(pages):
+            writer.write_response(response(f"{HOST}/page/{n}", page(n, pages, links, rng)))
+
+
+@click.command()
+@click.option("--pages", default=2000)
+@click.option("--links", default=20)
+@click.option("--seed", default=0)
+@click.option("--workers", "-w", multiple=True, type=int, default=(1, 4, 16))
+def main(pages, links, seed, workers):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "site.warc.gz")
+        write_site(path, pages, links, seed)
+        click.echo(f"{pages} pages, {os.path.getsize(path) / 1e6:.1f} MB of WARC")
+
+        click.echo(f"{'workers':>8} {'found':>7} {'seconds':>8} {'pages/sec':>10}")
+        for max_workers in workers:
+            crawler = Crawler(max_workers=max_workers, timeout=5, replay=path, verbosity=0)
+            start = time.perf_counter()
+            found = crawler.crawl(HOST + "/")
+            elapsed = time.perf_counter() - start
+            click.echo(
+                f"{max_workers:>8} {len(found):>7} {elapsed:>8.2f} {len(found) / elapsed:>10.0f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""
+benchmark for the memory used per url by the seen-set of a crawl
+
+compares a URLRegistry of Hyperlinks with a FingerprintRegistry (both
+collision modes) by the growth in traced memory after adding the same urls
+
+usage:
+    python -m benchmarks.seen_memory --urls 200000
+"""
+import time
+import tracemalloc
+
+import click
+
+from simple_crawler.fingerprint import FingerprintRegistry
+from simple_crawler.hyperlink import make_hyperlink
+from simple_crawler.url_registry import URLRegistry
+
+
+def run(factory, urls: int) -> tuple:
+    """add urls to a fresh registry, return (bytes per url, urls/sec)"""
+    tracemalloc.start()
+    registry = factory()
+    before = tracemalloc.get_traced_memory()[0]
+    start = time.perf_counter()
+    for i in range(urls):
+        registry.add(make_hyperlink(f"https://www.example.com/section/{i % 97}/page/{i}"))
+    elapsed = time.perf_counter() - start
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return (after - before) / urls, urls / elapsed
+
+
+@click.command()
+@click.option("--urls", default=200000)
+def main(urls):
+    registries = {
+        "URLRegistry": URLRegistry,
+        "Fingerprint (ignore)": lambda: FingerprintRegistry(collisions="ignore"),
+        "Fingerprint (check)": lambda: FingerprintRegistry(collisions="check"),
+    }
+    click.echo(f"{'registry':>22} {'bytes/url':>10} {'urls/sec':>10}")
+    for name, factory in registries.items():
+        bytes_per_url, urls_per_sec = run(factory, urls)
+        click.echo(f"{name:>22} {bytes_per_url:>10.1f} {urls_per_sec:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,361 @@
+"""
+benchmark of whole crawls of a synthetic local website, across worker counts and engines
+
+the site is served from this process by a threaded HTTP server and is made up
+from a seed, so every run crawls the same pages:
+    * --hosts virtual hosts, told apart by the Host header, they are at
+      127.0.0.1, 127.0.0.2... (on linux every 127.x.x.x address is the
+      loopback, so no DNS is needed)
+    * --pages pages per host at /page/<n> (and /), each links to a power law
+      number of pages (pareto with --fanout-alpha, at most --max-fanout), some
+      on other hosts (--cross-host, which a crawl of a host filters out)
+    * each response waits a lognormal time (median --latency-ms) and pads its
+      html to a lognormal size (median --size-kb)
+    * --error-rate of pages are a 500 or a 503
+    * --trap-rate of pages link to a crawler trap: /trap/<n>/<i> links to
+      /trap/<n>/<i + 1> forever, so a crawl only gets out by --max-depth
+
+each run crawls every host at once (a crawler per host, as a crawl keeps to
+the host it started from) in a new process, so its peak RSS is only of the
+crawl, and pages/sec, p50 & p99 seconds to fetch and parse a url and peak
+RSS are printed as a table and written as JSON (to compare runs)
+
+usage:
+    python -m benchmarks.synthetic_site --pages 500 --hosts 4 -w 4 -w 16 -w 64 -e threads -e async
+    python -m benchmarks.synthetic_site --out before.json
+"""
+import http.server
+import json
+import math
+import multiprocessing
+import random
+import resource
+import socketserver
+import sys
+import threading
+import time
+
+import click
+
+from simple_crawler.cli import ENGINES
+
+WORDS = ["lorem", "ipsum", "dolor", "sit", "amet", "consectetur", "adipiscing", "elit"]
+ROBOTS = "User-agent: *\nAllow: /\n"
+
+
+def host_name(n: int) -> str:
+    """the address of the n-th virtual host"""
+    return f"127.0.0.{n + 1}"
+
+
+def percentile(values: list, q: float) -> float:
+    """
+    the q quantile of values by nearest rank, 0 if there are none
+
+    >>> percentile([4, 1, 3, 2], 0.5)
+    2
+    >>> percentile([4, 1, 3, 2], 0.99)
+    4
+    """
+    if not values:
+        return 0
+    values = sorted(values)
+    return values[max(0, math.ceil(q * len(values)) - 1)]
+
+
+class SyntheticSite:
+    """
+    the pages of the synthetic site, each made up from the seed and its host and path
+
+    :param pages: (int) number of pages per host
+    :param hosts: (int) number of virtual hosts
+    :param fanout_alpha: (float) shape of the pareto distribution of links per page
+    :param max_fanout: (int) max number of links per page
+    :param cross_host: (float) fraction of links to other hosts
+    :param latency_ms: (float) median milliseconds to wait before a response
+    :param latency_sigma: (float) sigma of the lognormal distribution of latency
+    :param size_kb: (float) median size of a page in KB
+    :param size_sigma: (float) sigma of the lognormal distribution of size
+    :param error_rate: (float) fraction of pages that are a 500 or a 503
+    :param trap_rate: (float) fraction of pages that link to a crawler trap
+    :param seed: (int) seed of the site
+    """
+
+    def __init__(
+        self,
+        pages: int = 500,
+        hosts: int = 4,
+        fanout_alpha: float = 1.2,
+        max_fanout: int = 200,
+        cross_host: float = 0.05,
+        latency_ms: float = 20.0,
+        latency_sigma: float = 0.8,
+        size_kb: float = 20.0,
+        size_sigma: float = 0.6,
+        error_rate: float = 0.01,
+        trap_rate: float = 0.01,
+        seed: int = 0,
+    ):
+        self.pages = pages
+        self.hosts = hosts
+        self.fanout_alpha = fanout_alpha
+        self.max_fanout = max_fanout
+        self.cross_host = cross_host
+        self.latency_ms = latency_ms
+        self.latency_sigma = latency_sigma
+        self.size_kb = size_kb
+        self.size_sigma = size_sigma
+        self.error_rate = error_rate
+        self.trap_rate = trap_rate
+        self.seed = seed
+        self._host_names = {host_name(n) for n in range(hosts)}
+
+    @property
+    def config(self) -> dict:
+        return {name: value for name, value in vars(self).items() if not name.startswith("_")}
+
+    def _links(self, path: str, port: int, rng: random.Random) -> list:
+        parts = path.strip("/").split("/")
+        if parts[0] == "trap":
+            return ["/", f"/trap/{parts[1]}/{int(parts[2]) + 1}"]
+
+        fanout = min(self.max_fanout, int(rng.paretovariate(self.fanout_alpha)))
+        links = []
+        for _ in range(fanout):
+            page = rng.randrange(self.pages)
+            if self.hosts > 1 and rng.random() < self.cross_host:
+                other = host_name(rng.randrange(self.hosts))
+                links.append(f"http://{other}:{port}/page/{page}")
+            else:
+                links.append(f"/page/{page}")
+        if rng.random() < self.trap_rate:
+            links.append(f"/trap/{rng.randrange(1 << 30)}/0")
+        return links
+
+    def _html(self, links: list, size: int, rng: random.Random) -> bytes:
+        """a page of links with paragraphs of text until it is size bytes"""
+        body = [f'<a href="{link}">{rng.choice(WORDS)}</a>' for link in links]
+        length = sum(len(part) for part in body)
+        while length < size:
+            text = " ".join(rng.choice(WORDS) for _ in range(60))
+            body.append(f"<p>{text}</p>")
+            length += len(text) + 7
+        return f"<html><head><title>page</title></head><body>{''.join(body)}</body></html>".encode()
+
+    def respond(self, host: str, path: str, port: int) -> tuple:
+        """(status code, content type, body, seconds to wait) of a request for path on host"""
+        path = path.split("?")[0].split("#")[0]
+        if host not in self._host_names:
+            return 404, "text/plain", b"", 0.0
+        if path == "/robots.txt":
+            return 200, "text/plain", ROBOTS.encode(), 0.0
+
+        parts = path.strip("/").split("/")
+        valid = (
+            path == "/"
+            or (len(parts) == 2 and parts[0] == "page" and parts[1].isdigit())
+            or (
+                len(parts) == 3 and parts[0] == "trap" and parts[1].isdigit() and parts[2].isdigit()
+            )
+        )
+        if not valid:
+            return 404, "text/plain", b"", 0.0
+
+        rng = random.Random(f"{self.seed}/{host}{path}")
+        delay = rng.lognormvariate(math.log(self.latency_ms / 1000), self.latency_sigma)
+        if path != "/" and rng.random() < self.error_rate:
+            return rng.choice((500, 503)), "text/plain", b"", delay
+
+        size = int(rng.lognormvariate(math.log(self.size_kb * 1000), self.size_sigma))
+        return 200, "text/html", self._html(self._links(path, port, rng), size, rng), delay
+
+
+class SiteHandler(http.server.BaseHTTPRequestHandler):
+    """serves the server's synthetic site, by the Host header"""
+
+    protocol_version = "HTTP/1.1"
+
+    def _respond(self, send_body: bool) -> None:
+        host = (self.headers.get("Host") or "").rsplit(":", 1)[0]
+        status, content_type, body, delay = self.server.site.respond(
+            host, self.path, self.server.server_address[1]
+        )
+        time.sleep(delay)
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if send_body:
+            self.wfile.write(body)
+
+    def do_GET(self):
+        self._respond(True)
+
+    def do_HEAD(self):
+        self._respond(False)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class SiteServer(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    """
+    a HTTP server of a synthetic site, serving from a background thread until closed
+
+    :param site: (SyntheticSite) the site to serve
+    :param port: (int) port to listen on, 0 for any free port
+    """
+
+    daemon_threads = True
+    # many workers connect at once
+    request_queue_size = 1024
+
+    def __init__(self, site: SyntheticSite, port: int = 0):
+        self.site = site
+        super().__init__(("0.0.0.0", port), SiteHandler)
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+
+    @property
+    def port(self) -> int:
+        return self.server_address[1]
+
+    def close(self) -> None:
+        self.shutdown()
+        self.server_close()
+        self._thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def peak_rss_mb() -> float:
+    """peak resident memory of this process in MB"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macOS, KB elsewhere
+    return peak / 1e6 if sys.platform == "darwin" else peak / 1e3
+
+
+def run(engine: str, max_workers: int, urls: list, max_depth: int, timeout: int) -> dict:
+    """crawl every url at once with a crawler each, run in a process of its own"""
+    results = []
+
+    def crawl(url):
+        crawler = ENGINES[engine](
+            max_workers=max_workers, timeout=timeout, max_depth=max_depth, verbosity=0
+        )
+        results.extend(crawler.iter_crawl(url))
+
+    threads = [threading.Thread(target=crawl, args=(url,)) for url in urls]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    seconds = [result.elapsed for result in results]
+    return {
+        "engine": engine,
+        "workers": max_workers,
+        "urls": len(results),
+        "pages": sum(result.ok for result in results),
+        "errors": sum(not result.ok for result in results),
+        "trap_urls": sum("/trap/" in result.url for result in results),
+        "seconds": elapsed,
+        "pages_per_sec": len(results) / elapsed,
+        "p50_ms": percentile(seconds, 0.5) * 1e3,
+        "p99_ms": percentile(seconds, 0.99) * 1e3,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+@click.command()
+@click.option("--pages", default=500)
+@click.option("--hosts", default=4)
+@click.option("--fanout-alpha", default=1.2)
+@click.option("--max-fanout", default=200)
+@click.option("--cross-host", default=0.05)
+@click.option("--latency-ms", default=20.0)
+@click.option("--latency-sigma", default=0.8)
+@click.option("--size-kb", default=20.0)
+@click.option("--size-sigma", default=0.6)
+@click.option("--error-rate", default=0.01)
+@click.option("--trap-rate", default=0.01)
+@click.option("--max-depth", default=10)
+@click.option("--timeout", default=10)
+@click.option("--seed", default=0)
+@click.option("--port", default=0)
+@click.option("--workers", "-w", multiple=True, type=int, default=(4, 16, 64))
+@click.option(
+    "--engine", "-e", multiple=True, type=click.Choice(list(ENGINES)), default=("threads",)
+)
+@click.option("--out", type=click.Path(dir_okay=False), default=None)
+def main(
+    pages,
+    hosts,
+    fanout_alpha,
+    max_fanout,
+    cross_host,
+    latency_ms,
+    latency_sigma,
+    size_kb,
+    size_sigma,
+    error_rate,
+    trap_rate,
+    max_depth,
+    timeout,
+    seed,
+    port,
+    workers,
+    engine,
+    out,
+):
+    site = SyntheticSite(
+        pages=pages,
+        hosts=hosts,
+        fanout_alpha=fanout_alpha,
+        max_fanout=max_fanout,
+        cross_host=cross_host,
+        latency_ms=latency_ms,
+        latency_sigma=latency_sigma,
+        size_kb=size_kb,
+        size_sigma=size_sigma,
+        error_rate=error_rate,
+        trap_rate=trap_rate,
+        seed=seed,
+    )
+    runs = []
+    # a new process per run, so peak RSS is of that run only
+    context = multiprocessing.get_context("spawn")
+    with SiteServer(site, port) as server:
+        urls = [f"http://{host_name(n)}:{server.port}/" for n in range(hosts)]
+        click.echo(
+            f"{'engine':>8} {'workers':>8} {'urls':>7} {'errors':>7} {'trap':>6} {'seconds':>8} "
+            f"{'pages/sec':>10} {'p50 ms':>8} {'p99 ms':>8} {'RSS MB':>7}"
+        )
+        for engine_name in engine:
+            for max_workers in workers:
+                with context.Pool(1) as pool:
+                    result = pool.apply(run, (engine_name, max_workers, urls, max_depth, timeout))
+                runs.append(result)
+                click.echo(
+                    f"{engine_name:>8} {max_workers:>8} {result['urls']:>7} {result['errors']:>7} "
+                    f"{result['trap_urls']:>6} {result['seconds']:>8.2f} "
+                    f"{result['pages_per_sec']:>10.1f} {result['p50_ms']:>8.1f} "
+                    f"{result['p99_ms']:>8.1f} {result['peak_rss_mb']:>7.1f}"
+                )
+
+    report = {"site": dict(site.config, max_depth=max_depth), "runs": runs}
+    if out is not None:
+        with open(out, "w") as file:
+            json.dump(report, file, indent=2)
+    else:
+        click.echo(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,7 @@
+from simple_crawler.async_crawler import AsyncCrawler
 from simple_crawler.crawler import Crawler
+from simple_crawler.distributed import Coordinator
+from simple_crawler.distributed import CrawlWorker
+from simple_crawler.sharded import ShardedCrawler
 
-__all__ = ["Crawler"]
+__all__ = ["AsyncCrawler", "Coordinator", "Crawler", "CrawlWorker", "ShardedCrawler"]
@@ -0,0 +1,259 @@
+"""
+module for crawling with asyncio, all fetches share one event loop instead of one thread each
+"""
+import asyncio
+import queue
+import time
+from typing import List
+from typing import Set
+from typing import Union
+
+from requests import Session
+
+from simple_crawler.budget import TIMED_OUT
+from simple_crawler.crawler import Crawler
+from simple_crawler.events import CRAWLING
+from simple_crawler.events import ERROR
+from simple_crawler.events import VISITED
+from simple_crawler.hyperlink import Hyperlink
+from simple_crawler.hyperlink import make_hyperlink
+from simple_crawler.requester import AsyncRequester
+from simple_crawler.requester import BadResponse
+from simple_crawler.requester import ClientError
+from simple_crawler.requester import ServerError
+from simple_crawler.requester import WrongMIMEType
+from simple_crawler.results import CrawlResult
+from simple_crawler.robots import RobotsRules
+from simple_crawler.validators import Validators
+
+# asyncio.current_task is new in python 3.7
+current_task = getattr(asyncio, "current_task", None) or asyncio.Task.current_task
+
+
+class AsyncCrawler(Crawler):
+    """
+    A Crawler that runs its fetches as coroutines on a single asyncio event loop
+
+    How to use?
+        * crawler = AsyncCrawler(max_workers=1000)
+        * found_urls = crawler.crawl(some_url)
+        * or from inside a running loop: found_urls = await crawler.crawl_async(some_url)
+
+    It takes the same params as Crawler, except:
+
+    :param session: (requests.Session) only its headers are used
+    :param max_workers: (int) max number of requests in flight at once
+    :param timeout: (int) length of time to wait for any in flight request to
+                    finish before timing out and shutting down
+
+    warc_out and replay aren't supported, as they record & replay through requests
+    """
+
+    def __init__(self, session: Session = None, **kwargs):
+        if kwargs.get("warc_out") is not None or kwargs.get("replay") is not None:
+            raise ValueError("an async crawl can't record to or replay from a WARC file")
+        super().__init__(session=session, **kwargs)
+        headers = dict(session.headers) if session is not None else None
+        self._async_requester = AsyncRequester(user_agent=self.user_agent, headers=headers)
+
+    async def _fetch_async(self, url: Hyperlink, validators: Validators = None):
+        """get the response of url with the async requester, conditional on validators if there are any"""
+        start = time.perf_counter()
+        try:
+            return await self._async_requester(
+                url,
+                check_head_first=self.check_head,
+                follow_redirects=(not self.record_redirects),
+                headers=None if validators is None else validators.headers(),
+            )
+        finally:
+            # the fetches of a task overlap those of others on the thread, so a span per task
+            self._fetched(url, start, None, id(current_task()))
+
+    async def _hrefs_from_response_async(self, resp) -> List[str]:
+        """get hrefs from a response, waiting for the parse pool without blocking the event loop"""
+        if self._parse_pool is not None and not self._is_recorded_redirect(resp):
+            start = time.perf_counter()
+            hrefs = await asyncio.wrap_future(self._submit_parse(resp))
+            self._metrics.parse_seconds.observe(time.perf_counter() - start)
+            return hrefs
+
+        return self._hrefs_from_response(resp)
+
+    async def _get_hrefs_async(self, url: Hyperlink) -> List[str]:
+        """get hrefs from url with the async requester"""
+        return await self._hrefs_from_response_async(await self._fetch_async(url))
+
+    async def _crawl_url_async(self, url: Hyperlink, depth: int = 0) -> Union[CrawlResult, None]:
+        """async version of Crawler._crawl_url"""
+        self._events.emit(CRAWLING, url)
+        start = time.perf_counter()
+        resp, error, new_links, redirect = None, None, 0, None
+        try:
+            validators = self._known_validators(url)
+            resp = await self._fetch_async(url, validators)
+            redirect = self._redirect_target(url, resp)
+            if self._follows_redirect(url, redirect):
+                if self._claim_redirect(url, redirect, depth):
+                    hrefs = await self._hrefs_from_response_async(resp)
+                    self._visit_redirect(redirect, resp, hrefs, depth, start)
+                    new_links = 1
+                resp = resp.history[0]
+
+            else:
+                hrefs = self._unchanged_hrefs(resp, validators)
+                if hrefs is None:
+                    hrefs = await self._hrefs_from_response_async(resp)
+                self._keep_validators(url, resp, hrefs)
+                new_links = self._visit(url, hrefs, depth)
+
+        # except 4xx or 5xx
+        except (ClientError, ServerError) as exc:
+            self._events.emit(ERROR, url, error=exc)
+            resp, error = exc.response, str(exc)
+            if self._retry_later(url, resp.status_code, resp.headers.get("Retry-After")):
+                return None
+
+        # or any connection errors (or responses cut short)
+        except (OSError, asyncio.TimeoutError, BadResponse) as exc:
+            self._events.emit(ERROR, url, error=exc)
+            error = str(exc) or exc.__class__.__name__
+            if self._retry_later(url, exc.__class__.__name__):
+                return None
+
+        # or wrong mime type
+        except WrongMIMEType as exc:
+            self._events.emit(VISITED, url)
+            self._done_urls.add(url)
+            resp = exc.response
+
+        elapsed = time.perf_counter() - start
+        return self._result(url, resp, depth, elapsed, error, new_links, redirect)
+
+    async def _prefetch_robots_async(self, domain: Hyperlink) -> None:
+        """
+        fetch robots.txt of domain into the robots cache without blocking the event loop
+
+        NB: any other host seen later is fetched by the cache with the sync requester
+        """
+        if not self.obey_robots or domain in self._robots:
+            return
+
+        robots_url = domain.with_path("robots.txt")
+        try:
+            resp = await self._async_requester(
+                robots_url, mime_types=("text/plain",), check_head_first=False
+            )
+            text = resp.text
+
+        except (
+            ClientError,
+            ServerError,
+            WrongMIMEType,
+            BadResponse,
+            OSError,
+            asyncio.TimeoutError,
+        ):
+            text = ""
+
+        self._robots.put(domain, RobotsRules(text))
+
+    async def crawl_async(self, domain: str = None, resume: bool = False) -> Set[str]:
+        """crawl any site for all urls, awaitable from a running event loop"""
+        self._budget.start()
+        self.errors.clear()
+        with self._profile_stage(), self._events, self._metrics_stage():
+            with self._state_stage(), self._validators_stage(), self._parse_stage():
+                if domain is not None:
+                    await self._prefetch_robots_async(make_hyperlink(domain))
+                self._seed(domain, resume)
+                return await self._dispatch_async()
+
+    async def resume_async(self) -> Set[str]:
+        """continue the crawl kept in state_dir from where it stopped"""
+        return await self.crawl_async(resume=True)
+
+    async def _dispatch_async(self) -> Set[str]:
+        """dispatch urls as coroutines until every url is crawled"""
+        # the semaphore caps the number of requests in flight
+        semaphore = asyncio.Semaphore(self.max_workers)
+        in_flight = set()
+        loop = asyncio.get_event_loop()
+        last_progress = loop.time()
+
+        async def crawl_url(url: Hyperlink) -> None:
+            retrying = False
+            try:
+                result = await self._crawl_url_async(url, self._queue.depth_of(url))
+                retrying = result is None
+                # NB: this blocks the event loop while iter_crawl's buffer is full
+                if not retrying:
+                    self._record(result)
+            finally:
+                # a url to be retried is back in the queue, so it isn't finished
+                if not retrying:
+                    self._finish(url)
+                semaphore.release()
+
+        try:
+            while True:
+                # stop if the crawl is stopped or a budget is used up
+                self.stop_reason = self._stop_reason()
+                if self.stop_reason is not None:
+                    # let requests in flight finish, as the threaded crawler does
+                    if in_flight:
+                        _, in_flight = await asyncio.wait(in_flight, timeout=self.timeout)
+                    return self._render_results()
+
+                # dispatch every eligible url while there are free slots
+                while not semaphore.locked() and self._stop_reason() is None:
+                    try:
+                        url = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+
+                    if url in self._done_urls:
+                        self._finish(url)
+                        continue
+
+                    await semaphore.acquire()
+                    self._budget.page()
+                    in_flight.add(asyncio.ensure_future(crawl_url(url)))
+
+                ready_in = self._queue.next_ready_in()
+
+                # exit if nothing is in flight and nothing is queued
+                if not in_flight:
+                    if ready_in is None:
+                        self.stop_reason = self._budget.finished_reason()
+                        return self._render_results()
+                    # every queued url is waiting on a host that is cooling down
+                    await asyncio.sleep(self._budget.wait_timeout(ready_in))
+                    continue
+
+                # wait for any request to finish (which may queue more urls)
+                # or for the next host to be eligible
+                wait = self._budget.wait_timeout(self.timeout)
+                if ready_in is not None and not semaphore.locked():
+                    wait = min(wait, ready_in)
+                done, in_flight = await asyncio.wait(
+                    in_flight, timeout=wait, return_when=asyncio.FIRST_COMPLETED
+                )
+
+                # nothing finished within timeout so we assume requests are hung
+                if done:
+                    last_progress = loop.time()
+                elif loop.time() - last_progress >= self.timeout:
+                    self.stop_reason = TIMED_OUT
+                    return self._render_results()
+        finally:
+            for task in in_flight:
+                task.cancel()
+
+    def crawl(self, domain: str = None, resume: bool = False) -> Set[str]:
+        """crawl any site for all urls on a new event loop"""
+        loop = asyncio.new_event_loop()
+        try:
+            return loop.run_until_complete(self.crawl_async(domain, resume=resume))
+        finally:
+            loop.close()
@@ -0,0 +1,110 @@
+"""
+module for the budget of a crawl, limits that stop a crawl before every url is crawled
+
+why?
+    a crawl of a large site otherwise only ends once every url is crawled (or
+    requests hang for timeout), a budget bounds how deep, how many pages, how
+    many bytes or how long a crawl goes and records why it stopped
+"""
+import threading
+import time
+from typing import Union
+
+# why a crawl stopped
+FINISHED = "finished"
+TIMED_OUT = "timeout"
+STOPPED = "stopped"
+MAX_DEPTH = "max_depth"
+MAX_PAGES = "max_pages"
+MAX_BYTES = "max_bytes"
+DEADLINE = "deadline"
+
+
+class CrawlBudget:
+    """
+    thread safe limits of a crawl, None for no limit
+
+    * allows_depth(depth) is checked before a url is queued, urls too deep are left out
+    * page() is called for each url dispatched and add_bytes(size) for each response,
+      retry() when a url is handed back to be retried so it only counts once, at the
+      attempt that gives its final outcome
+    * exceeded() says which budget is used up (if any) so dispatching can stop
+
+    :param max_depth: (int) max number of links followed from the url the crawl started from
+    :param max_pages: (int) max number of urls to crawl
+    :param max_bytes: (int) max number of bytes of responses to download
+    :param deadline_seconds: (float) max seconds a crawl can run for
+    """
+
+    def __init__(
+        self,
+        max_depth: int = None,
+        max_pages: int = None,
+        max_bytes: int = None,
+        deadline_seconds: float = None,
+    ):
+        self.max_depth = max_depth
+        self.max_pages = max_pages
+        self.max_bytes = max_bytes
+        self.deadline_seconds = deadline_seconds
+        self._lock = threading.Lock()
+        self.start()
+
+    def start(self) -> None:
+        """reset the budget for a new crawl, starting the deadline clock"""
+        with self._lock:
+            self.pages = 0
+            self.bytes = 0
+            # if any url was left out for being deeper than max_depth
+            self.pruned = False
+            self._deadline = (
+                None if self.deadline_seconds is None else time.monotonic() + self.deadline_seconds
+            )
+
+    def allows_depth(self, depth: int) -> bool:
+        """check if a url at depth may be crawled"""
+        if self.max_depth is None or depth <= self.max_depth:
+            return True
+        self.pruned = True
+        return False
+
+    def page(self) -> None:
+        """count a url dispatched to be crawled"""
+        with self._lock:
+            self.pages += 1
+
+    def retry(self) -> None:
+        """uncount a url handed back to be retried, it is counted again when redispatched"""
+        with self._lock:
+            self.pages -= 1
+
+    def add_bytes(self, size: int) -> None:
+        """count bytes downloaded"""
+        with self._lock:
+            self.bytes += size
+
+    def time_left(self) -> Union[float, None]:
+        """seconds until the deadline, None if there is no deadline"""
+        if self._deadline is None:
+            return None
+        return max(0.0, self._deadline - time.monotonic())
+
+    def wait_timeout(self, timeout: float) -> float:
+        """timeout, cut short so waiting for it doesn't go past the deadline"""
+        time_left = self.time_left()
+        return timeout if time_left is None else min(timeout, time_left)
+
+    def exceeded(self) -> Union[str, None]:
+        """the reason code of the budget that is used up, None if none are"""
+        with self._lock:
+            if self.max_pages is not None and self.pages >= self.max_pages:
+                return MAX_PAGES
+            if self.max_bytes is not None and self.bytes >= self.max_bytes:
+                return MAX_BYTES
+        if self.time_left() == 0:
+            return DEADLINE
+        return None
+
+    def finished_reason(self) -> str:
+        """the reason code of a crawl that ran out of urls"""
+        return MAX_DEPTH if self.pruned else FINISHED
@@ -1,10 +1,29 @@
 """
 cli application for crawler
 """
+import sys
+
 import click
 
+from simple_crawler.async_crawler import AsyncCrawler
 from simple_crawler.crawler import Crawler
 from simple_crawler.crawler import DEFAULT_USER_AGENT
+from simple_crawler.distributed import Coordinator
+from simple_crawler.distributed import CrawlWorker
+from simple_crawler.distributed import DEFAULT_LEASE_TTL
+from simple_crawler.distributed import parse_address
+from simple_crawler.events import DEFAULT_VERBOSITY
+from simple_crawler.fingerprint import COLLISION_MODES
+from simple_crawler.fingerprint import IGNORE_COLLISIONS
+from simple_crawler.ordering import DEFAULT_ORDER
+from simple_crawler.ordering import ORDERS
+from simple_crawler.retry import DEFAULT_BACKOFF
+from simple_crawler.retry import DEFAULT_MAX_BACKOFF
+from simple_crawler.retry import DEFAULT_MAX_RETRIES
+from simple_crawler.sharded import SHARD_BY
+from simple_crawler.sharded import SHARD_BY_URL
+from simple_crawler.sharded import ShardedCrawler
+from simple_crawler.state import DEFAULT_CHECKPOINT_INTERVAL
 
 DEFAULT_MAX_WORKERS = 1
 DEFAULT_TIMEOUT = 10
@@ -12,10 +31,74 @@ DEFAULT_CHECK_HEAD = False
 DEFAULT_DISOBEY_ROBOTS = False
 DEFAULT_WITH_QUERY = False
 DEFAULT_WITH_FRAGMENT = False
+DEFAULT_ENGINE = "threads"
+DEFAULT_MAX_PER_HOST = None
+DEFAULT_PARSE_WORKERS = 0
+DEFAULT_STATE_DIR = None
+DEFAULT_MAX_FRONTIER_MEMORY = None
+DEFAULT_COMPACT_SEEN = False
+DEFAULT_SEEN_COLLISIONS = IGNORE_COLLISIONS
+DEFAULT_MAX_DEPTH = None
+DEFAULT_MAX_PAGES = None
+DEFAULT_MAX_BYTES = None
+DEFAULT_DEADLINE = None
+DEFAULT_PROCESSES = 1
+DEFAULT_SHARD_BY = SHARD_BY_URL
+DEFAULT_LISTEN = None
+DEFAULT_LEASE_SIZE = None
+DEFAULT_VALIDATORS_DIR = None
+DEFAULT_WARC_OUT = None
+DEFAULT_REPLAY = None
+DEFAULT_RECORD_REDIRECTS = False
+DEFAULT_FOUND_SAMPLE = 1.0
+DEFAULT_EVENTS_JSONL = None
+DEFAULT_METRICS_PORT = None
+DEFAULT_PROFILE_DIR = None
+DEFAULT_CPROFILE = False
+DEFAULT_TRACEMALLOC = False
+
+ENGINES = {"threads": Crawler, "async": AsyncCrawler}
+
+
+class CrawlCommand(click.Command):
+    """
+    a click command that runs one of its subcommands instead when the first
+    argument names it (e.g. crawl worker --coordinator HOST:PORT)
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.subcommands = {}
+
+    def subcommand(self, *args, **kwargs):
+        """decorator to add a subcommand, the same as click.command"""
+
+        def decorator(f):
+            command = click.command(*args, **kwargs)(f)
+            self.subcommands[command.name] = command
+            return command
+
+        return decorator
 
+    def main(self, args=None, prog_name=None, **extra):
+        args = sys.argv[1:] if args is None else list(args)
+        if args and args[0] in self.subcommands:
+            name = args[0]
+            prog_name = f"{prog_name or self.name} {name}"
+            return self.subcommands[name].main(args[1:], prog_name=prog_name, **extra)
+        return super().main(args, prog_name=prog_name, **extra)
 
-@click.command()
-@click.argument("url")
+
+def check_address(ctx, param, value):
+    """click callback to check a HOST:PORT option, giving (host, port)"""
+    try:
+        return value if value is None else parse_address(value)
+    except ValueError as exc:
+        raise click.BadParameter(str(exc))
+
+
+@click.command(cls=CrawlCommand)
+@click.argument("url", required=False)
 @click.option("-u", "--user-agent", default=DEFAULT_USER_AGENT)
 @click.option("-w", "--max-workers", default=DEFAULT_MAX_WORKERS)
 @click.option("-t", "--timeout", default=DEFAULT_TIMEOUT)
@@ -23,6 +106,40 @@ DEFAULT_WITH_FRAGMENT = False
 @click.option("-d", "--disobey-robots", is_flag=True, default=DEFAULT_DISOBEY_ROBOTS)
 @click.option("-wq", "--with-query", is_flag=True, default=DEFAULT_WITH_QUERY)
 @click.option("-wf", "--with-fragment", is_flag=True, default=DEFAULT_WITH_FRAGMENT)
+@click.option("--max-per-host", type=int, default=DEFAULT_MAX_PER_HOST)
+@click.option("--parse-workers", type=int, default=DEFAULT_PARSE_WORKERS)
+@click.option("-s", "--state-dir", type=click.Path(file_okay=False), default=DEFAULT_STATE_DIR)
+@click.option("--resume", type=click.Path(exists=True, file_okay=False), default=None)
+@click.option("--checkpoint-interval", type=float, default=DEFAULT_CHECKPOINT_INTERVAL)
+@click.option("--max-frontier-memory", type=int, default=DEFAULT_MAX_FRONTIER_MEMORY)
+@click.option("--compact-seen", is_flag=True, default=DEFAULT_COMPACT_SEEN)
+@click.option(
+    "--seen-collisions", type=click.Choice(COLLISION_MODES), default=DEFAULT_SEEN_COLLISIONS
+)
+@click.option("--max-depth", type=int, default=DEFAULT_MAX_DEPTH)
+@click.option("--max-pages", type=int, default=DEFAULT_MAX_PAGES)
+@click.option("--max-bytes", type=int, default=DEFAULT_MAX_BYTES)
+@click.option("--deadline", type=float, default=DEFAULT_DEADLINE)
+@click.option("--validators-dir", type=click.Path(file_okay=False), default=DEFAULT_VALIDATORS_DIR)
+@click.option("--warc-out", type=click.Path(dir_okay=False), default=DEFAULT_WARC_OUT)
+@click.option("--replay", type=click.Path(exists=True, dir_okay=False), default=DEFAULT_REPLAY)
+@click.option("--record-redirects", is_flag=True, default=DEFAULT_RECORD_REDIRECTS)
+@click.option("--max-retries", type=int, default=DEFAULT_MAX_RETRIES)
+@click.option("--retry-backoff", type=float, default=DEFAULT_BACKOFF)
+@click.option("--retry-max-backoff", type=float, default=DEFAULT_MAX_BACKOFF)
+@click.option("-v", "--verbosity", type=click.IntRange(0, 3), default=DEFAULT_VERBOSITY)
+@click.option("--found-sample", type=click.FloatRange(0, 1), default=DEFAULT_FOUND_SAMPLE)
+@click.option("--events-jsonl", type=click.Path(dir_okay=False), default=DEFAULT_EVENTS_JSONL)
+@click.option("--metrics-port", type=click.IntRange(0, 65535), default=DEFAULT_METRICS_PORT)
+@click.option("--profile", type=click.Path(file_okay=False), default=DEFAULT_PROFILE_DIR)
+@click.option("--cprofile", is_flag=True, default=DEFAULT_CPROFILE)
+@click.option("--tracemalloc", is_flag=True, default=DEFAULT_TRACEMALLOC)
+@click.option("-o", "--order", type=click.Choice(list(ORDERS)), default=DEFAULT_ORDER)
+@click.option("-p", "--processes", type=int, default=DEFAULT_PROCESSES)
+@click.option("--shard-by", type=click.Choice(SHARD_BY), default=DEFAULT_SHARD_BY)
+@click.option("--listen", callback=check_address, default=DEFAULT_LISTEN)
+@click.option("--lease-ttl", type=float, default=DEFAULT_LEASE_TTL)
+@click.option("-e", "--engine", type=click.Choice(list(ENGINES)), default=DEFAULT_ENGINE)
 @click.option("--debug/--no-debug", default=False)
 def crawl(
     url,
@@ -33,10 +150,73 @@ def crawl(
     disobey_robots,
     with_query,
     with_fragment,
+    max_per_host,
+    parse_workers,
+    state_dir,
+    resume,
+    checkpoint_interval,
+    max_frontier_memory,
+    compact_seen,
+    seen_collisions,
+    max_depth,
+    max_pages,
+    max_bytes,
+    deadline,
+    validators_dir,
+    warc_out,
+    replay,
+    record_redirects,
+    max_retries,
+    retry_backoff,
+    retry_max_backoff,
+    verbosity,
+    found_sample,
+    events_jsonl,
+    metrics_port,
+    profile,
+    cprofile,
+    tracemalloc,
+    order,
+    processes,
+    shard_by,
+    listen,
+    lease_ttl,
+    engine,
     debug,
 ):
-    click.echo(f"crawling URL: {url}")
-    crawler = Crawler(
+    if url is None and resume is None:
+        raise click.UsageError("URL is required unless resuming with --resume STATE_DIR")
+
+    if resume is not None:
+        state_dir = resume
+        click.echo(f"resuming crawl in: {state_dir}")
+    else:
+        click.echo(f"crawling URL: {url}")
+
+    if processes > 1 and engine != "threads":
+        raise click.UsageError("--processes can only be used with the threads engine")
+    if processes > 1 and state_dir is not None:
+        raise click.UsageError("--processes can't be used with --state-dir or --resume")
+    if listen is not None and (processes > 1 or engine != "threads"):
+        raise click.UsageError("--listen can't be used with --processes or the async engine")
+    if warc_out is not None and (processes > 1 or listen is not None or engine != "threads"):
+        raise click.UsageError(
+            "--warc-out can't be used with --processes, --listen or the async engine"
+        )
+    if validators_dir is not None and (processes > 1 or listen is not None):
+        raise click.UsageError("--validators-dir can't be used with --processes or --listen")
+    if replay is not None and (listen is not None or engine != "threads"):
+        raise click.UsageError("--replay can't be used with --listen or the async engine")
+    if events_jsonl is not None and processes > 1:
+        raise click.UsageError("--events-jsonl can't be used with --processes")
+    if metrics_port is not None and processes > 1:
+        raise click.UsageError("--metrics-port can't be used with --processes")
+    if profile is not None and processes > 1:
+        raise click.UsageError("--profile can't be used with --processes")
+    if (cprofile or tracemalloc) and profile is None:
+        raise click.UsageError("--cprofile and --tracemalloc need --profile DIR to write to")
+
+    kwargs = dict(
         user_agent=user_agent,
         max_workers=max_workers,
         timeout=timeout,
@@ -44,16 +224,99 @@ def crawl(
         obey_robots=(not disobey_robots),
         trim_query=(not with_query),
         trim_fragment=(not with_fragment),
+        max_per_host=max_per_host,
+        parse_workers=parse_workers,
+        state_dir=state_dir,
+        checkpoint_interval=checkpoint_interval,
+        max_frontier_memory=max_frontier_memory,
+        compact_seen=compact_seen,
+        seen_collisions=seen_collisions,
+        max_depth=max_depth,
+        max_pages=max_pages,
+        max_bytes=max_bytes,
+        deadline_seconds=deadline,
+        order=order,
+        validators_dir=validators_dir,
+        warc_out=warc_out,
+        replay=replay,
+        record_redirects=record_redirects,
+        max_retries=max_retries,
+        retry_backoff=retry_backoff,
+        retry_max_backoff=retry_max_backoff,
+        verbosity=verbosity,
+        found_sample=found_sample,
+        events_jsonl=events_jsonl,
+        metrics_port=metrics_port,
+        profile_dir=profile,
+        profile_cprofile=cprofile,
+        profile_memory=tracemalloc,
+    )
+    if listen is not None:
+        crawler = Coordinator(host=listen[0], port=listen[1], lease_ttl=lease_ttl, **kwargs)
+        click.echo("coordinating workers on: {}:{}".format(*crawler.address))
+    elif processes > 1:
+        crawler = ShardedCrawler(processes=processes, shard_by=shard_by, **kwargs)
+    else:
+        crawler = ENGINES[engine](**kwargs)
+
+    try:
+        if debug is False:
+            if metrics_port is not None:
+                click.echo(f"serving metrics on: http://127.0.0.1:{metrics_port}/metrics")
+            click.echo(f"WHEN CRAWLING: {url or state_dir} THE CRAWLER FOUND:")
+            # print each url as soon as it is crawled
+            for result in crawler.iter_crawl(url, resume=(resume is not None)):
+                if result.ok:
+                    click.echo(f"FOUND: {result.url}")
+                if record_redirects and result.redirect is not None:
+                    click.echo(f"REDIRECT: {result.url} -> {result.redirect}")
+            # how many of each error every host gave
+            for host, counts in crawler.errors.by_host().items():
+                errors = ", ".join(f"{error} x{n}" for error, n in sorted(counts.items(), key=str))
+                click.echo(f"ERRORS ON {host}: {errors}")
+            click.echo(f"STOPPED: {crawler.stop_reason}")
+            if profile is not None:
+                click.echo(f"PROFILE IN {profile}:")
+                click.echo(crawler.profile.format_stages(), nl=False)
+
+        else:
+            click.echo("debug mode is on: crawling not running")
+            # if debug we print config to console
+            for k, v in crawler.config.items():
+                click.echo(f"{k.replace('_', ' ')}: {v}")
+
+    finally:
+        if listen is not None:
+            crawler.close()
+
+
+@crawl.subcommand("worker")
+@click.option("-c", "--coordinator", required=True, callback=check_address)
+@click.option("-u", "--user-agent", default=DEFAULT_USER_AGENT)
+@click.option("-w", "--max-workers", default=DEFAULT_MAX_WORKERS)
+@click.option("-t", "--timeout", default=DEFAULT_TIMEOUT)
+@click.option("-h", "--check-head", is_flag=True, default=DEFAULT_CHECK_HEAD)
+@click.option("--lease-size", type=int, default=DEFAULT_LEASE_SIZE)
+@click.option("-v", "--verbosity", type=click.IntRange(0, 3), default=DEFAULT_VERBOSITY)
+@click.option("--debug/--no-debug", default=False)
+def worker(coordinator, user_agent, max_workers, timeout, check_head, lease_size, verbosity, debug):
+    """fetch urls for a crawl run with --listen, until it is done"""
+    crawl_worker = CrawlWorker(
+        coordinator="{}:{}".format(*coordinator),
+        lease_size=lease_size,
+        user_agent=user_agent,
+        max_workers=max_workers,
+        timeout=timeout,
+        check_head=check_head,
+        verbosity=verbosity,
     )
+    click.echo(f"working for coordinator: {crawl_worker.coordinator}")
 
     if debug is False:
-        found_links = crawler.crawl(url)
-        click.echo(f"WHEN CRAWLING: {url} THE CRAWLER FOUND:")
-        for link in found_links:
-            click.echo(f"FOUND: {link}")
+        fetched = crawl_worker.work()
+        click.echo(f"FETCHED: {fetched} urls")
 
     else:
-        click.echo("debug mode is on: crawling not running")
-        # if debug we print config to console
-        for k, v in crawler.config.items():
+        click.echo("debug mode is on: worker not running")
+        for k, v in crawl_worker.config.items():
             click.echo(f"{k.replace('_', ' ')}: {v}")
@@ -2,24 +2,82 @@
 module for core software for crawling
 """
 import queue
+import threading
 import time
+import urllib.parse
 from concurrent.futures import Executor
+from concurrent.futures import Future
+from concurrent.futures import ProcessPoolExecutor
 from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Iterable
+from typing import Iterator
+from typing import List
 from typing import Set
 from typing import Union
-from urllib.robotparser import RobotFileParser
 
+from requests import RequestException
 from requests import Session
 
+from simple_crawler.budget import CrawlBudget
+from simple_crawler.budget import STOPPED
+from simple_crawler.budget import TIMED_OUT
+from simple_crawler.events import CRAWL_DELAY
+from simple_crawler.events import CRAWLING
+from simple_crawler.events import DEFAULT_VERBOSITY
+from simple_crawler.events import DISALLOWED
+from simple_crawler.events import ERROR
+from simple_crawler.events import EventSink
+from simple_crawler.events import FOUND
+from simple_crawler.events import make_sink
+from simple_crawler.events import REDIRECTED
+from simple_crawler.events import RESUMING
+from simple_crawler.events import RETRYING
+from simple_crawler.events import VISITED
+from simple_crawler.fingerprint import FingerprintRegistry
+from simple_crawler.fingerprint import IGNORE_COLLISIONS
+from simple_crawler.frontier import Frontier
 from simple_crawler.hyperlink import Hyperlink
 from simple_crawler.hyperlink import HyperlinkSet
+from simple_crawler.hyperlink import LinkPipeline
 from simple_crawler.hyperlink import make_hyperlink
-from simple_crawler.hyperlink import make_hyperlink_set
-from simple_crawler.parser import get_hrefs_from_html
+from simple_crawler.metrics import CrawlMetrics
+from simple_crawler.metrics import MetricsServer
+from simple_crawler.ordering import DEFAULT_ORDER
+from simple_crawler.ordering import make_order
+from simple_crawler.parser import get_raw_hrefs_from_html
+from simple_crawler.parser import parse_hrefs
+from simple_crawler.profiling import NoTracer
+from simple_crawler.profiling import Profiler
+from simple_crawler.redirects import RedirectCache
 from simple_crawler.requester import ClientError
+from simple_crawler.requester import NOT_MODIFIED
 from simple_crawler.requester import Requester
 from simple_crawler.requester import ServerError
 from simple_crawler.requester import WrongMIMEType
+from simple_crawler.results import CrawlResult
+from simple_crawler.results import DEFAULT_BUFFER_SIZE
+from simple_crawler.results import NoResults
+from simple_crawler.results import ResultBuffer
+from simple_crawler.retry import DEFAULT_BACKOFF
+from simple_crawler.retry import DEFAULT_MAX_BACKOFF
+from simple_crawler.retry import DEFAULT_MAX_RETRIES
+from simple_crawler.retry import ErrorLog
+from simple_crawler.retry import RetryPolicy
+from simple_crawler.robots import RobotsCache
+from simple_crawler.robots import RobotsRules
+from simple_crawler.state import CrawlState
+from simple_crawler.state import DEFAULT_CHECKPOINT_INTERVAL
+from simple_crawler.state import NoCrawlState
+from simple_crawler.state import StateError
+from simple_crawler.url_registry import URLRegistry
+from simple_crawler.validators import content_hash
+from simple_crawler.validators import NoValidatorStore
+from simple_crawler.validators import Validators
+from simple_crawler.validators import ValidatorStore
+from simple_crawler.warc import WarcArchive
+from simple_crawler.warc import WarcReplayAdapter
+from simple_crawler.warc import WarcWriter
 
 DEFAULT_USER_AGENT = "PySimpleCrawler"
 
@@ -39,21 +97,95 @@ class Crawler:
         * crawler = Crawler(**some_config)
         * found_urls = crawler.crawl(some_url)
 
-    It's that simple
+    It's that simple (and with a state_dir, a crawl that stopped can be
+    continued with crawler.resume())
+
+    Or to get the result of each url as soon as it is crawled:
+        * for result in crawler.iter_crawl(some_url): ...
 
     :param user_agent: (str) name of the user agent, defaults to PyWebCrawler
     :param session: (requests.Session) option to add a requests.Session, useful
                     if you need to add headers
     :param max_workers: (int) number of threads to spin up, when default as 1,
                         there is NO threading
-    :param timeout: (int) length of time to wait for another url to be sent to
-                    the queue before timing out and shutting down
+    :param timeout: (int) length of time to wait for any url to finish or be
+                    sent to the queue before assuming requests are hung and
+                    shutting down
     :param obey_robots: (bool) should crawler obey robots.txt
     :param check_head: (bool) should crawler check HEAD before GET, useful if
                        there are lots of endpoints with large responses that
                        don't need to be crawled e.g. pdf, .png, etc
     :param trim_query: (bool) should crawler remove ?query=strings from url
     :param trim_fragment: (bool) should crawler remove #fragments from url
+    :param max_per_host: (int) max number of urls of one host being crawled at
+                         once, None for no limit (other than max_workers)
+    :param parse_workers: (int) number of processes to parse html in, when
+                          default as 0, html is parsed in the worker that
+                          fetched it
+    :param state_dir: (str) directory to checkpoint the crawl to (so it can be
+                      resumed), None to keep everything in memory
+    :param checkpoint_interval: (float) seconds between checkpoints
+    :param max_frontier_memory: (int) max number of queued urls to keep in
+                                memory, the rest are spilled to state_dir
+    :param compact_seen: (bool) keep seen urls as 64 bit fingerprints rather
+                         than as hyperlinks, a fraction of the memory of the seen-set
+                         only (crawled and queued urls are still kept as hyperlinks)
+    :param seen_collisions: (str) with compact_seen, "ignore" urls sharing a
+                            fingerprint or "check" them with a second fingerprint
+    :param max_depth: (int) max number of links to follow from the url the crawl
+                      starts from, None for no limit
+    :param max_pages: (int) max number of urls to crawl, None for no limit
+    :param max_bytes: (int) max number of bytes to download, None for no limit
+    :param deadline_seconds: (float) max seconds to crawl for, None for no limit
+    :param order: (str) order to crawl urls in, "bfs", "dfs", "depth-weighted"
+                  or "best-first" (see simple_crawler.ordering)
+    :param validators_dir: (str) directory to keep the ETag, Last-Modified,
+                           content hash and hrefs of each url crawled in, so
+                           the next crawl only downloads and parses pages that
+                           changed, None to fetch every page in full
+    :param warc_out: (str) WARC file to write every response fetched to
+                     (appended to if it exists), None to not record
+    :param replay: (str) WARC file to answer every request from instead of the
+                   network (urls not in it are 404s), None to crawl live
+    :param record_redirects: (bool) don't follow redirects, a url that
+                             redirects is crawled as a page whose only link is
+                             its Location, when False redirects are followed
+                             and the page they end at is crawled as its own url
+
+    :param max_retries: (int) max number of times to try a url again after a
+                        429, 5xx or connection error (honouring Retry-After),
+                        0 to never retry
+    :param retry_backoff: (float) seconds to wait before the first retry of a
+                          url, doubling with each retry (with jitter)
+    :param retry_max_backoff: (float) max seconds to wait before a retry, a
+                              url whose Retry-After is longer isn't retried
+
+    :param verbosity: (int) which events of the crawl to write, 0 for none, 1
+                      for errors, retries, redirects and robots, 2 also each
+                      url crawled and visited, 3 also each link found
+    :param found_sample: (float) fraction of link found (FOUND) events to write
+    :param events_jsonl: (str) file to append events to as JSON lines, None to
+                         write them to stdout
+    :param events: (EventSink) option to give the sink events go to, instead of
+                   one made from verbosity, found_sample and events_jsonl
+    :param metrics_port: (int) port to serve the crawl's metrics on (in the
+                         Prometheus text format at http://127.0.0.1:PORT/metrics)
+                         while crawling, None to not serve them (they are
+                         always kept, see crawler.stats())
+    :param profile_dir: (str) directory to write a profile of each crawl to: a
+                        Chrome trace of the stages of crawling each url (see
+                        simple_crawler.profiling) and a table of time per
+                        stage, None to not profile
+    :param profile_cprofile: (bool) with profile_dir, also run cProfile on every thread
+    :param profile_memory: (bool) with profile_dir, also trace memory allocations
+
+    Either way, where each url redirected to is kept (in the result of the
+    url, as result.redirect, and between crawls) so later links to it are
+    taken as links to where it ends without fetching it again
+
+    When a budget (max_pages, max_bytes or deadline_seconds) is used up the
+    crawl stops dispatching urls and returns the urls found so far, why the
+    crawl stopped is kept in crawler.stop_reason
     """
 
     def __init__(
@@ -66,7 +198,39 @@ class Crawler:
         check_head: bool = False,
         trim_query: bool = True,
         trim_fragment: bool = True,
+        max_per_host: int = None,
+        parse_workers: int = 0,
+        state_dir: str = None,
+        checkpoint_interval: float = DEFAULT_CHECKPOINT_INTERVAL,
+        max_frontier_memory: int = None,
+        compact_seen: bool = False,
+        seen_collisions: str = IGNORE_COLLISIONS,
+        max_depth: int = None,
+        max_pages: int = None,
+        max_bytes: int = None,
+        deadline_seconds: float = None,
+        order: str = DEFAULT_ORDER,
+        validators_dir: str = None,
+        warc_out: str = None,
+        replay: str = None,
+        record_redirects: bool = False,
+        max_retries: int = DEFAULT_MAX_RETRIES,
+        retry_backoff: float = DEFAULT_BACKOFF,
+        retry_max_backoff: float = DEFAULT_MAX_BACKOFF,
+        verbosity: int = DEFAULT_VERBOSITY,
+        found_sample: float = 1.0,
+        events_jsonl: str = None,
+        events: EventSink = None,
+        metrics_port: int = None,
+        profile_dir: str = None,
+        profile_cprofile: bool = False,
+        profile_memory: bool = False,
     ):
+        if max_frontier_memory is not None and state_dir is None:
+            raise ValueError("max_frontier_memory needs a state_dir to spill to")
+        if (profile_cprofile or profile_memory) and profile_dir is None:
+            raise ValueError("profile_cprofile and profile_memory need a profile_dir to write to")
+
         # config elements
         self.user_agent = user_agent
         self.max_workers = max_workers
@@ -75,15 +239,87 @@ class Crawler:
         self.check_head = check_head
         self.trim_query = trim_query
         self.trim_fragment = trim_fragment
+        self.max_per_host = max_per_host
+        self.parse_workers = parse_workers
+        self.state_dir = state_dir
+        self.checkpoint_interval = checkpoint_interval
+        self.max_frontier_memory = max_frontier_memory
+        self.compact_seen = compact_seen
+        self.seen_collisions = seen_collisions
+        self.max_depth = max_depth
+        self.max_pages = max_pages
+        self.max_bytes = max_bytes
+        self.deadline_seconds = deadline_seconds
+        self.order = order
+        self.validators_dir = validators_dir
+        self.warc_out = warc_out
+        self.replay = replay
+        self.record_redirects = record_redirects
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.retry_max_backoff = retry_max_backoff
+        self.verbosity = verbosity
+        self.found_sample = found_sample
+        self.events_jsonl = events_jsonl
+        self.metrics_port = metrics_port
+        self.profile_dir = profile_dir
+        self.profile_cprofile = profile_cprofile
+        self.profile_memory = profile_memory
 
         # setup internal elements
+        # kept between crawls so best-first keeps what it learnt
+        self._order = make_order(order)
         self._requester = Requester(user_agent=self.user_agent, session=session)
-        self._queue = queue.Queue()
-        self._seen_urls = make_hyperlink_set()
-        self._done_urls = make_hyperlink_set()
-
-        # todo elements: could allow recording of redirects, client errors & server errors
-        self.record_redirects = False
+        if replay is not None:
+            adapter = WarcReplayAdapter(WarcArchive(replay))
+            self._requester.session.mount("http://", adapter)
+            self._requester.session.mount("https://", adapter)
+        # where the events of a crawl go, written from a writer thread during a crawl
+        self._events = events or make_sink(verbosity, found_sample, events_jsonl)
+        # where urls redirect to, kept between crawls so a redirect is only fetched once
+        self._redirects = RedirectCache()
+        # politeness delay per host, kept between crawls as robots.txt is cached
+        self._host_delays = {}
+        # on disk state, only open during a crawl
+        self._state = NoCrawlState()
+        # validators of urls from earlier crawls, only open during a crawl
+        self._validators = NoValidatorStore()
+        self._queue = self._new_frontier()
+        self._seen_urls = self._new_seen_registry()
+        self._done_urls = URLRegistry()
+        # robots.txt rules per host, fetched the first time a host is seen
+        self._robots = RobotsCache(self._fetch_robots, on_load=self._set_host_delay)
+        # process pool for parsing html, only running during a crawl
+        self._parse_pool = None
+        # where results go as urls are crawled, a bounded buffer during iter_crawl
+        self._results = NoResults()
+        # set to stop a crawl early (e.g. when iter_crawl is closed)
+        self._stop = threading.Event()
+        self._budget = CrawlBudget(
+            max_depth=max_depth,
+            max_pages=max_pages,
+            max_bytes=max_bytes,
+            deadline_seconds=deadline_seconds,
+        )
+        # why the last crawl stopped, one of the reason codes in simple_crawler.budget
+        self.stop_reason = None
+        self._retry_policy = RetryPolicy(
+            max_retries=max_retries, backoff=retry_backoff, max_backoff=retry_max_backoff
+        )
+        # errors of each url of the last crawl, with counts per host
+        self.errors = ErrorLog()
+        # metrics of the last (or running) crawl, see stats()
+        self._metrics = CrawlMetrics(
+            frontier_size=lambda: len(self._queue), in_flight=lambda: self._queue.in_flight()
+        )
+        # the server of the metrics, only running during a crawl with a metrics_port
+        self._metrics_server = None
+        # times the stages of a crawl, only during a crawl with a profile_dir
+        self._tracer = NoTracer()
+        # the tracer of the last profiled crawl, with its spans
+        self.profile = None
+
+        # todo elements: could allow recording of client errors & server errors
         # self.record_client_errors = False
         # self.record_server_errors = False
 
@@ -97,6 +333,32 @@ class Crawler:
             "check_head": self.check_head,
             "trim_query": self.trim_query,
             "trim_fragment": self.trim_fragment,
+            "max_per_host": self.max_per_host,
+            "parse_workers": self.parse_workers,
+            "state_dir": self.state_dir,
+            "checkpoint_interval": self.checkpoint_interval,
+            "max_frontier_memory": self.max_frontier_memory,
+            "compact_seen": self.compact_seen,
+            "seen_collisions": self.seen_collisions,
+            "max_depth": self.max_depth,
+            "max_pages": self.max_pages,
+            "max_bytes": self.max_bytes,
+            "deadline_seconds": self.deadline_seconds,
+            "order": self.order,
+            "validators_dir": self.validators_dir,
+            "warc_out": self.warc_out,
+            "replay": self.replay,
+            "record_redirects": self.record_redirects,
+            "max_retries": self.max_retries,
+            "retry_backoff": self.retry_backoff,
+            "retry_max_backoff": self.retry_max_backoff,
+            "verbosity": self.verbosity,
+            "found_sample": self.found_sample,
+            "events_jsonl": self.events_jsonl,
+            "metrics_port": self.metrics_port,
+            "profile_dir": self.profile_dir,
+            "profile_cprofile": self.profile_cprofile,
+            "profile_memory": self.profile_memory,
         }
         return rv
 
@@ -109,143 +371,649 @@ class Crawler:
         )
         return executor
 
-    def _get_hrefs(self, url: Hyperlink) -> HyperlinkSet:
+    def _new_frontier(self) -> Frontier:
+        """a frontier that spills to the state store if it is open and max_frontier_memory is set"""
+        spill = isinstance(self._state, CrawlState) and self.max_frontier_memory is not None
+        return Frontier(
+            max_per_host=self.max_per_host,
+            delays=self._host_delays,
+            spill=self._state if spill else None,
+            max_in_memory=self.max_frontier_memory if spill else None,
+            order=self._order,
+        )
+
+    def _new_seen_registry(self) -> Union[URLRegistry, FingerprintRegistry]:
+        """a registry of seen urls, of fingerprints if compact_seen"""
+        if self.compact_seen:
+            return FingerprintRegistry(collisions=self.seen_collisions)
+        return URLRegistry()
+
+    @contextmanager
+    def _state_stage(self):
+        """open the state store (if state_dir) for the duration of a crawl"""
+        if self.state_dir is None:
+            yield
+            return
+
+        self._state = CrawlState(self.state_dir, checkpoint_interval=self.checkpoint_interval)
+        self._queue = self._new_frontier()
+        try:
+            yield
+        finally:
+            self._state.close()
+            self._state = NoCrawlState()
+
+    @contextmanager
+    def _validators_stage(self):
+        """open the validator store (if validators_dir) for the duration of a crawl"""
+        if self.validators_dir is None:
+            yield
+            return
+
+        self._validators = ValidatorStore(self.validators_dir)
+        try:
+            yield
+        finally:
+            self._validators.close()
+            self._validators = NoValidatorStore()
+
+    @contextmanager
+    def _warc_stage(self):
+        """record every response fetched to warc_out (if warc_out) for the duration of a crawl"""
+        if self.warc_out is None:
+            yield
+            return
+
+        with WarcWriter(self.warc_out) as writer:
+            self._requester.recorder = writer
+            try:
+                yield
+            finally:
+                self._requester.recorder = None
+
+    @contextmanager
+    def _metrics_stage(self):
+        """start the metrics of a new crawl and serve them (if metrics_port) for the duration of a crawl"""
+        self._metrics.start()
+        if self.metrics_port is None:
+            yield
+            return
+
+        with MetricsServer(self._metrics.registry, self.metrics_port) as server:
+            self._metrics_server = server
+            try:
+                yield
+            finally:
+                self._metrics_server = None
+
+    @contextmanager
+    def _profile_stage(self):
+        """profile a crawl into profile_dir (if profile_dir) for the duration of a crawl"""
+        if self.profile_dir is None:
+            yield
+            return
+
+        with Profiler(
+            self.profile_dir, cprofile=self.profile_cprofile, memory=self.profile_memory
+        ) as profiler:
+            self._tracer = self.profile = profiler.tracer
+            try:
+                yield
+            finally:
+                self._tracer = NoTracer()
+
+    def stats(self) -> dict:
+        """
+        a snapshot of the metrics of the running (or last) crawl: pages, bytes
+        (and each per second), frontier size, urls in flight, counts of status
+        codes, fetch seconds per host and parse seconds (count, sum, p50 & p99)
+        """
+        rv = self._metrics.stats()
+        rv["errors"] = len(self.errors)
+        return rv
+
+    def _seed(self, domain: Union[str, None], resume: bool) -> None:
+        """queue the url to start crawling from, or everything left to crawl if resuming"""
+        if not resume:
+            domain = make_hyperlink(domain)
+            self._state.start(domain)
+            self._add_url(domain)
+            return
+
+        seed, seen, done, pending = self._state.load()
+        if domain is not None and make_hyperlink(domain) != make_hyperlink(seed):
+            raise StateError(f"can't resume crawl of {seed} as a crawl of {domain}")
+
+        self._events.emit(RESUMING, seed, done=len(done), pending=len(pending))
+        for url in seen:
+            self._seen_urls.add(make_hyperlink(url))
+        for url in done:
+            self._done_urls.add(make_hyperlink(url))
+        for url, depth in pending:
+            self._enqueue(make_hyperlink(url), depth)
+
+    @contextmanager
+    def _parse_stage(self):
+        """run a process pool for parsing html (if parse_workers) for the duration of a crawl"""
+        if not self.parse_workers:
+            yield
+            return
+
+        with ProcessPoolExecutor(max_workers=self.parse_workers) as pool:
+            self._parse_pool = pool
+            try:
+                yield
+            finally:
+                self._parse_pool = None
+
+    def _fetch(self, url: Hyperlink, validators: Validators = None):
+        """get the response of url with requester, conditional on validators if there are any"""
+        start, resp = time.perf_counter(), None
+        try:
+            resp = self._requester(
+                url,
+                check_head_first=self.check_head,
+                follow_redirects=(not self.record_redirects),
+                headers=None if validators is None else validators.headers(),
+            )
+            return resp
+        finally:
+            self._fetched(url, start, resp)
+
+    def _fetched(self, url: Hyperlink, start: float, resp, tid: int = None) -> None:
+        """
+        time a fetch of url (that started at start), split in the profile at
+        the response headers if there was a (sync) response
+        """
+        duration = time.perf_counter() - start
+        self._metrics.fetch_seconds.observe(duration, url.authority)
+        headers = getattr(resp, "elapsed", None)
+        if headers is None:
+            self._tracer.add("fetch", start, duration, tid)
+            return
+        headers = min(headers.total_seconds(), duration)
+        self._tracer.add("fetch.headers", start, headers, tid)
+        self._tracer.add("fetch.body", start + headers, duration - headers, tid)
+
+    def _get_hrefs(self, url: Hyperlink) -> List[str]:
         """get hrefs from url with requester"""
-        resp = self._requester(
-            url,
-            check_head_first=self.check_head,
-            follow_redirects=(not self.record_redirects),
+        return self._hrefs_from_response(self._fetch(url))
+
+    def _is_recorded_redirect(self, resp) -> bool:
+        """if we want to record redirects and the response returns a redirect"""
+        return (
+            self.record_redirects
+            and str(resp.status_code).startswith("3")
+            and "Location" in resp.headers
         )
 
-        # if we want to record redirects
-        # and the response returns a redirect
+    def _redirect_target(self, url: Hyperlink, resp) -> Union[Hyperlink, None]:
+        """
+        keep where url (and any url on the way) redirected to, the url it ended
+        at or None if the (sync or async) response wasn't a redirect
+        """
+        if self._is_recorded_redirect(resp):
+            target, hops = make_hyperlink(resp.headers["Location"]).join(url), [url]
+        elif resp.history:
+            target, hops = make_hyperlink(resp.url), [url]
+            hops += [make_hyperlink(hop.url) for hop in resp.history[1:]]
+        else:
+            return None
+
+        for hop in hops:
+            self._redirects.put(hop, target)
+        return target
+
+    def _follows_redirect(self, url: Hyperlink, target: Union[Hyperlink, None]) -> bool:
+        """
+        if url was redirected to target on the same site, whose page is then crawled
+        as target's (a page off the site is crawled as url's, as its links are off the site)
+        """
+        return (
+            target is not None and not self.record_redirects and target.authority == url.authority
+        )
+
+    def _claim_redirect(self, url: Hyperlink, target: Hyperlink, depth: int) -> bool:
+        """
+        set url as done and register the url it was redirected to as seen, False if
+        that was seen before (and so is, or will be, crawled as its own url)
+        """
+        self._done_urls.add(url)
+        if not self._seen_urls.add_if_absent(target):
+            self._events.emit(REDIRECTED, url, target=target, seen=True)
+            return False
+        self._events.emit(REDIRECTED, url, target=target)
+        self._state.seen(target, depth)
+        return True
+
+    def _visit_redirect(
+        self, target: Hyperlink, resp, hrefs: List[str], depth: int, start: float
+    ) -> None:
+        """visit the page a redirect ended at as target's and record target's result"""
+        new_links = self._visit(target, hrefs, depth)
+        self._state.finish(target, True)
+        elapsed = time.perf_counter() - start
+        self._record(self._result(target, resp, depth, elapsed, new_links=new_links))
+
+    def _submit_parse(self, resp) -> Future:
+        """send the raw html of a response to the parse process pool"""
+        return self._parse_pool.submit(parse_hrefs, resp.content, resp.encoding)
+
+    def _hrefs_from_response(self, resp) -> List[str]:
+        """get the hrefs (as found, as strings) from a (sync or async) response"""
+        start = time.perf_counter()
+        # if the response returns a redirect we want to record
         # then we will grab the the "Location" header from the response
+        # (joined to the url, as it may be relative)
         # because there will be no links to scrape from the text
-        if self.record_redirects and str(resp.status_code).startswith("3"):
-            hrefs = make_hyperlink_set([make_hyperlink(resp.headers["Location"])])
-        # else we scrape from the text
+        if self._is_recorded_redirect(resp):
+            hrefs = [urllib.parse.urljoin(str(resp.url), resp.headers["Location"])]
+        # else we scrape from the text in the parse pool
+        elif self._parse_pool is not None:
+            hrefs = self._submit_parse(resp).result()
+        # or in this worker
         else:
-            hrefs = get_hrefs_from_html(resp.text)
+            hrefs = get_raw_hrefs_from_html(resp.text)
 
+        duration = time.perf_counter() - start
+        self._metrics.parse_seconds.observe(duration)
+        self._tracer.add("parse", start, duration)
         return hrefs
 
-    def _parse_hrefs(self, hrefs: HyperlinkSet, url: Hyperlink) -> HyperlinkSet:
-        """parse the hrefs from collection and by trimming, joining, filtering and deduping"""
-        hrefs = (
+    def _known_validators(self, url: Hyperlink) -> Union[Validators, None]:
+        """the validators of url from an earlier crawl, None if there are none (or redirects are recorded)"""
+        return None if self.record_redirects else self._validators.get(url)
+
+    @staticmethod
+    def _unchanged_hrefs(resp, validators: Validators) -> Union[List[str], None]:
+        """the hrefs kept of a url if its response shows it is unchanged, else None"""
+        if validators is None:
+            return None
+        if (
+            resp.status_code == NOT_MODIFIED
+            or content_hash(resp.content) == validators.content_hash
+        ):
+            return list(validators.links)
+        return None
+
+    def _keep_validators(self, url: Hyperlink, resp, hrefs: List[str]) -> None:
+        """keep the validators of a url crawled for the next crawl"""
+        if resp.status_code != NOT_MODIFIED and not self._is_recorded_redirect(resp):
+            self._validators.put(url, Validators.from_response(resp, hrefs))
+
+    def _parse_hrefs(self, hrefs: Iterable, url: Hyperlink) -> HyperlinkSet:
+        """parse the hrefs (strings or Hyperlinks) by trimming, joining, filtering and deduping"""
+        pipeline = (
+            LinkPipeline()
             # remove the query part and the fragment part
-            hrefs.trim(query=self.trim_query, fragment=self.trim_fragment)
+            .trim(query=self.trim_query, fragment=self.trim_fragment)
             # join all relative urls to the base url
-            .join_all(url)
+            .join(url)
             # then find all urls that match the base url
             .filter_by(authority=url.authority)
         )
 
-        return hrefs
-
-    def _crawl_url(self, url: Hyperlink) -> None:
-        """crawl any url for all the other urls (in <a hrefs=url> tags)"""
-        print(f"CRAWLING: {url}")
+        # in one pass, making a Hyperlink of only the urls left
+        return pipeline.collect(hrefs)
+
+    def _retry_later(self, url: Hyperlink, error: Union[int, str], retry_after: str = None) -> bool:
+        """
+        record an error of url (a status code or the name of an exception) and
+        hand url back to the queue to be tried again if the retry policy allows, True if it was
+        """
+        attempts = self.errors.record(url, error)
+        status = error if isinstance(error, int) else None
+        delay = self._retry_policy.delay(attempts, status, retry_after)
+        if delay is None or self._stop_reason() is not None:
+            return False
+
+        self._events.emit(RETRYING, url, delay=delay)
+        self._budget.retry()
+        self._queue.retry(url, delay)
+        return True
+
+    def _crawl_url(self, url: Hyperlink, depth: int = 0) -> Union[CrawlResult, None]:
+        """
+        crawl any url for all the other urls (in <a hrefs=url> tags), None if
+        it failed and was handed back to the queue to be retried
+        """
+        self._events.emit(CRAWLING, url)
+        start = time.perf_counter()
+        error, new_links, redirect = None, 0, None
         # try get 200 responses
         try:
-            # get all links on page
-            hrefs = self._get_hrefs(url)
-            print(f"VISITED: {url}")
-            # go through all the links found and print them to console
-            for href in hrefs:
-                print(f"FOUND: {href} ON {url}")
-
-            # get all unique links from page that match the domain
-            hrefs = self._parse_hrefs(hrefs, url)
-            # go through all links and add to queue and seen_urls if not in seen_urls
-            for href in hrefs:
-                if href not in self._seen_urls:
-                    self._queue.put(href)
-                    self._seen_urls.add(href)
-
-            # set url as done
-            self._done_urls.add(url)
+            validators = self._known_validators(url)
+            resp = self._fetch(url, validators)
+            redirect = self._redirect_target(url, resp)
+            # crawl the page a redirect ended at as its own url (unless it was seen before)
+            if self._follows_redirect(url, redirect):
+                if self._claim_redirect(url, redirect, depth):
+                    hrefs = self._hrefs_from_response(resp)
+                    self._visit_redirect(redirect, resp, hrefs, depth, start)
+                    new_links = 1
+                resp = resp.history[0]
+
+            # or get all links on page (or those kept from an earlier crawl if it is unchanged)
+            else:
+                hrefs = self._unchanged_hrefs(resp, validators)
+                if hrefs is None:
+                    hrefs = self._hrefs_from_response(resp)
+                self._keep_validators(url, resp, hrefs)
+                new_links = self._visit(url, hrefs, depth)
 
         # except 4xx or 5xx
         except (ClientError, ServerError) as exc:
             # NB: we don't set as done here as we don't record responses that
             #     returned 4xx or 5xx status codes
-            # todo: as this does not add to done_urls, we will have to wait
-            #  for timeout
-            print(f"ERROR: {exc} ON {url}")
+            self._events.emit(ERROR, url, error=exc)
+            resp, error = exc.response, str(exc)
+            if self._retry_later(url, resp.status_code, resp.headers.get("Retry-After")):
+                return None
+
+        # or no response at all (e.g. the connection was refused or timed out)
+        except RequestException as exc:
+            self._events.emit(ERROR, url, error=exc)
+            resp, error = None, str(exc) or exc.__class__.__name__
+            if self._retry_later(url, exc.__class__.__name__):
+                return None
 
         # or wrong mime type
-        except WrongMIMEType:
-            print(f"VISITED: {url}")
+        except WrongMIMEType as exc:
+            self._events.emit(VISITED, url)
             # add to done_urls as it is fair to report .pdf, etc files to found urls
             self._done_urls.add(url)
+            resp = exc.response
+
+        elapsed = time.perf_counter() - start
+        return self._result(url, resp, depth, elapsed, error, new_links, redirect)
+
+    @staticmethod
+    def _result(
+        url: Hyperlink,
+        resp,
+        depth: int,
+        elapsed: float,
+        error: str = None,
+        new_links: int = 0,
+        redirect: Hyperlink = None,
+    ) -> CrawlResult:
+        """the result record of a crawled url from its (sync or async) response"""
+        return CrawlResult(
+            url=str(url),
+            status=None if resp is None else resp.status_code,
+            content_type=None if resp is None else resp.headers.get("Content-Type"),
+            depth=depth,
+            elapsed=elapsed,
+            error=error,
+            size=0 if resp is None else len(resp.content),
+            new_links=new_links,
+            redirect=None if redirect is None else str(redirect),
+        )
 
-    def _get_robots(self, domain: Hyperlink) -> RobotFileParser:
-        """get the robots.txt from any domain"""
-        robots_url = domain.with_path("robots.txt")
-        robots = RobotFileParser(str(robots_url))
-        # try and get /robots.txt and parse except error we assume none
-        try:
-            resp = self._requester(robots_url, mime_types=("text/plain",))
-            robots.parse(resp.text.splitlines())
+    def _visit(self, url: Hyperlink, hrefs: List[str], depth: int = 0) -> int:
+        """
+        record the links found on a fetched url, queue the new ones and set url as done
+
+        :return: (int) number of new urls queued
+        """
+        self._events.emit(VISITED, url)
+        # go through all the links found and send them to the sink (if it wants them)
+        if self._events.wants(FOUND):
+            for href in hrefs:
+                self._events.emit(FOUND, url, href=make_hyperlink(href))
 
-        except (ClientError, ServerError, WrongMIMEType):
-            robots.parse("")
+        # get all unique links from page that match the domain, a Hyperlink is only made of those
+        with self._tracer.span("normalise"):
+            hrefs = self._parse_hrefs(hrefs, url)
+        # go through all links and add to queue if they weren't already in seen_urls
+        with self._tracer.span("dedupe"):
+            new_links = sum(self._add_url(href, depth + 1) for href in hrefs)
 
-        return robots
+        # set url as done
+        self._done_urls.add(url)
+        return new_links
 
-    def crawl(self, domain: str) -> Set[str]:
-        """crawl any site for all urls"""
-        domain = make_hyperlink(domain)
-        self._queue.put(domain)
+    def _fetch_robots(self, robots_url: Hyperlink) -> str:
+        """get the text of a robots.txt, if there is an error we assume there is none"""
+        try:
+            with self._tracer.span("robots"):
+                resp = self._requester(robots_url, mime_types=("text/plain",))
+            return resp.text
 
-        # get robots
-        # todo: only do this if we obey robots?
-        robots = self._get_robots(domain)
+        # no response at all (e.g. a connection error or timeout) is taken as a 5xx
+        except (ClientError, ServerError, WrongMIMEType, RequestException):
+            return ""
 
-        with self._executor() as executor:
+    def _get_robots(self, domain: Hyperlink) -> RobotsRules:
+        """get the robots.txt from any domain"""
+        return RobotsRules(self._fetch_robots(domain.with_path("robots.txt")))
+
+    def _can_crawl(self, url: Hyperlink) -> bool:
+        """check if robots.txt allows crawling url (always true if we disobey robots)"""
+        # if we are to obey the robots then we need to see what we can scrape
+        if self.obey_robots and not self._robots.get(url).can_fetch(self.user_agent, str(url)):
+            self._events.emit(DISALLOWED, url, user_agent=self.user_agent)
+            return False
+        return True
+
+    def _crawl_delay(self, robots: RobotsRules) -> float:
+        """
+        get the seconds to wait between requests from robots.txt, this is the
+        larger of Crawl-delay and Request-rate (0 if none)
+        """
+        delay = robots.crawl_delay(self.user_agent) or 0
+        rate = robots.request_rate(self.user_agent)
+        if rate and rate.requests:
+            delay = max(delay, rate.seconds / rate.requests)
+        return delay
+
+    def _set_host_delay(self, url: Hyperlink, robots: RobotsRules) -> None:
+        """set the politeness delay of the host of url when its robots.txt is loaded"""
+        delay = self._crawl_delay(robots)
+        if delay:
+            self._events.emit(CRAWL_DELAY, url.authority, user_agent=self.user_agent, delay=delay)
+        # under the frontier's lock, as workers read the delays of hosts as they take urls
+        self._queue.set_delay(Frontier.host(url), delay)
+
+    def crawl(self, domain: str = None, resume: bool = False) -> Set[str]:
+        """
+        crawl any site for all urls
+
+        :param domain: (str) url to start crawling from
+        :param resume: (bool) continue the crawl kept in state_dir instead
+        :return: (set) of all urls found
+        """
+        self._budget.start()
+        self.errors.clear()
+        with self._profile_stage(), self._events, self._metrics_stage():
+            with self._state_stage(), self._validators_stage(), self._warc_stage():
+                self._seed(domain, resume)
+                return self._dispatch()
+
+    def resume(self) -> Set[str]:
+        """continue the crawl kept in state_dir from where it stopped"""
+        return self.crawl(resume=True)
+
+    def iter_crawl(
+        self, domain: str = None, resume: bool = False, buffer_size: int = DEFAULT_BUFFER_SIZE
+    ) -> Iterator[CrawlResult]:
+        """
+        crawl any site, yielding the result of each url as soon as it is crawled
+
+        the crawl runs on a background thread and workers wait while buffer_size
+        results are waiting to be taken, closing the generator stops the crawl
+
+        :param domain: (str) url to start crawling from
+        :param resume: (bool) continue the crawl kept in state_dir instead
+        :param buffer_size: (int) max number of results waiting to be taken
+        :return: (Iterator) of CrawlResult, one for each url crawled
+        """
+        results = self._results = ResultBuffer(buffer_size)
+        errors = []
+
+        def run():
+            try:
+                self.crawl(domain, resume=resume)
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                # None marks the end of the results
+                results.put(None)
+
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        try:
             while True:
-                # exit if we have crawled all urls found
-                if self._seen_urls == self._done_urls and self._seen_urls.is_not_empty():
-                    # return results
-                    return self._render_results()
-
-                # wait for more urls to enter queue or return if we timeout
+                result = results.get()
+                if result is None:
+                    break
+                yield result
+
+        finally:
+            self._stop.set()
+            # keep taking results so workers waiting on a full buffer can finish
+            while thread.is_alive():
                 try:
-                    url = self._queue.get(timeout=self.timeout)
+                    results.get(timeout=0.1)
                 except queue.Empty:
-                    # return results
-                    return self._render_results()
+                    pass
+            self._results = NoResults()
+            self._stop.clear()
+
+        if errors:
+            raise errors[0]
+
+    def _acquire_worker(self, workers: threading.Semaphore) -> bool:
+        """
+        wait for a free worker, False if none finish within timeout (not
+        counting time workers wait for results to be taken from iter_crawl)
+        """
+        while not workers.acquire(timeout=self._budget.wait_timeout(self.timeout)):
+            if not self._results.full() or self._stop_reason() is not None:
+                return False
+        return True
+
+    def _next_url(self) -> Union[Hyperlink, None]:
+        """
+        wait for a url to be eligible, None if all urls are crawled or if we
+        time out (not counting time workers wait for results to be taken from iter_crawl)
+        """
+        while True:
+            url = self._queue.get(timeout=self._budget.wait_timeout(self.timeout))
+            if (
+                url is not None
+                or self._queue.outstanding == 0
+                or not self._results.full()
+                or self._stop_reason() is not None
+            ):
+                return url
+
+    def _stop_reason(self) -> Union[str, None]:
+        """why the crawl must stop now (it was stopped or a budget is used up), None if it needn't"""
+        if self._stop.is_set():
+            return STOPPED
+        return self._budget.exceeded()
+
+    def _end_reason(self) -> str:
+        """why the crawl ended when no url was eligible in time"""
+        if self._queue.outstanding == 0:
+            return self._budget.finished_reason()
+        return TIMED_OUT
+
+    def _dispatch(self) -> Set[str]:
+        """submit urls to workers until every url is crawled"""
+        # a url is only taken from the queue when a worker is free, so that
+        # workers always get the next eligible url of any host
+        workers = threading.BoundedSemaphore(self.max_workers)
+
+        with self._parse_stage(), self._executor() as executor:
+            while True:
+                # stop if the crawl is stopped or a budget is used up
+                self.stop_reason = self._stop_reason()
+                if self.stop_reason is not None:
+                    break
+
+                # wait for a free worker, stop if none finish within timeout
+                with self._tracer.span("dispatch.wait_worker"):
+                    acquired = self._acquire_worker(workers)
+                if not acquired:
+                    self.stop_reason = self._stop_reason() or TIMED_OUT
+                    break
+
+                # wait for a url to be eligible, stop if all urls are crawled,
+                # if we timeout or if the crawl was stopped while waiting
+                with self._tracer.span("dispatch.wait_url"):
+                    url = self._next_url()
+                self.stop_reason = self._stop_reason()
+                if self.stop_reason is None and url is None:
+                    self.stop_reason = self._end_reason()
+                if self.stop_reason is not None:
+                    break
 
                 # if the url has been done start flow again
                 if url in self._done_urls:
+                    self._finish(url)
+                    workers.release()
                     continue
 
-                # if we are to obey the robots then we need to see what we can scrape
-                if self.obey_robots:
-                    # start again if we can't fetch a url
-                    if not robots.can_fetch(self.user_agent, str(url)):
-                        print(f"{self.user_agent} can't crawl {url}")
-                        continue
-
-                    # there is a bug in py3.6 https://bugs.python.org/issue35922
-                    # this try, except will allow for 3.6
-                    try:
-                        # wait for delay if we can scrape but must crawl slowly
-                        if robots.crawl_delay(self.user_agent):
-                            delay = int(robots.crawl_delay(self.user_agent))
-                            print(f"{self.user_agent} has a delay of {delay}, waiting...")
-                            time.sleep(delay)
-                    except AttributeError:
-                        pass
-
                 # submit crawl_url to executor
-                executor.submit(self._crawl_url, url)
+                self._budget.page()
+                executor.submit(self._crawl_url_and_finish, url, workers)
+
+        # render results once every worker has stopped
+        return self._render_results()
+
+    def _add_url(self, url: Hyperlink, depth: int = 0) -> bool:
+        """register url as seen and queue it, unless it was seen before or is too deep"""
+        # a url known to redirect is taken as the url it redirects to
+        url = self._redirects.resolve(url)
+        if self._budget.allows_depth(depth) and self._seen_urls.add_if_absent(url):
+            self._state.seen(url, depth)
+            return self._enqueue(url, depth)
+        return False
+
+    def _enqueue(self, url: Hyperlink, depth: int = 0) -> bool:
+        """put url on the queue if robots.txt allows it"""
+        if self._can_crawl(url):
+            self._queue.put(url, depth)
+            return True
+        return False
+
+    def _finish(self, url: Hyperlink) -> None:
+        """mark a url taken from the queue as finished"""
+        self._state.finish(url, url in self._done_urls)
+        self._queue.task_done(url)
+
+    def _crawl_url_and_finish(self, url: Hyperlink, workers: threading.Semaphore) -> None:
+        """crawl url and mark it as finished (even if it raised) unless it is to be retried"""
+        retrying = False
+        try:
+            with self._tracer.span("crawl_url"):
+                result = self._crawl_url(url, self._queue.depth_of(url))
+            retrying = result is None
+            if not retrying:
+                self._record(result)
+        finally:
+            # a url to be retried is back in the queue, so it isn't finished
+            if not retrying:
+                self._finish(url)
+            workers.release()
+
+    def _record(self, result: CrawlResult) -> None:
+        """count a result against the budget, learn from it and hand it to iter_crawl (if streaming)"""
+        self._budget.add_bytes(result.size)
+        self._metrics.pages.inc()
+        self._metrics.bytes.inc(result.size)
+        if result.status is not None:
+            self._metrics.responses.inc(label=result.status)
+        self._order.record(result.url, result.new_links)
+        self._results.put(result)
 
     def _render_results(self) -> Set[str]:
         """render all urls as a set of strings and reset crawler"""
         results = {str(url) for url in self._done_urls}
         # reset to start point
-        self._queue = queue.Queue()
-        self._seen_urls = make_hyperlink_set()
-        self._done_urls = make_hyperlink_set()
+        self._queue = self._new_frontier()
+        self._seen_urls = self._new_seen_registry()
+        self._done_urls = URLRegistry()
         return results
@@ -0,0 +1,505 @@
+"""
+module for crawling with several machines, a coordinator hands out urls to workers over TCP
+
+why?
+    a ShardedCrawler is capped by the cores of one machine, here one
+    coordinator keeps everything a crawl must agree on (the frontier with its
+    per host politeness, the seen urls, robots.txt rules, budgets & results)
+    and any number of workers on any machines do the fetching and parsing:
+    * a worker leases a batch of urls, fetches them with its own Requester and
+      reports the hrefs found on each back in one message
+    * a lease not reported within its ttl (or whose worker disconnects) expires
+      and its urls are queued again for another worker
+    * messages are JSON objects, one per line, a request then its reply:
+        {"op": "lease", "size": n} -> {"lease": id, "urls": [[url, depth], ...]}
+                                    | {"wait": seconds} | {"done": true}
+        {"op": "report", "lease": id, "results": [...]} -> {"ok": bool}
+"""
+import itertools
+import json
+import queue
+import socket
+import socketserver
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict
+from typing import Set
+from typing import Tuple
+from typing import Union
+
+from requests import RequestException
+
+from simple_crawler.budget import TIMED_OUT
+from simple_crawler.crawler import Crawler
+from simple_crawler.events import CRAWLING
+from simple_crawler.events import ERROR
+from simple_crawler.hyperlink import Hyperlink
+from simple_crawler.hyperlink import make_hyperlink
+from simple_crawler.requester import ClientError
+from simple_crawler.requester import ServerError
+from simple_crawler.requester import WrongMIMEType
+from simple_crawler.results import CrawlResult
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_LEASE_SIZE = 10
+DEFAULT_LEASE_TTL = 60.0
+
+# seconds between the coordinator's checks for expired leases, and the longest a worker waits
+POLL_INTERVAL = 0.05
+
+
+def parse_address(address: str) -> Tuple[str, int]:
+    """
+    the host and port of an address
+
+    >>> parse_address('127.0.0.1:8765')
+    ('127.0.0.1', 8765)
+    >>> parse_address('crawl.example.com:80')
+    ('crawl.example.com', 80)
+    """
+    host, _, port = address.rpartition(":")
+    if not host or not port.isdigit():
+        raise ValueError(f"address must be HOST:PORT not {address!r}")
+    return host, int(port)
+
+
+def send_message(stream, message: dict) -> None:
+    """write a message to a socket file as one line of JSON"""
+    stream.write(json.dumps(message).encode("utf-8") + b"\n")
+    stream.flush()
+
+
+def read_message(stream) -> Union[dict, None]:
+    """read a message from a socket file, None if the connection was closed"""
+    line = stream.readline()
+    if not line:
+        return None
+    return json.loads(line)
+
+
+class Lease:
+    """
+    urls handed out to a worker, they are queued again if not reported before expires
+
+    :param urls: (list) of (url, depth) leased
+    :param expires: (float) time.monotonic() the lease expires at
+    """
+
+    def __init__(self, urls: list, expires: float):
+        self.urls = urls
+        self.expires = expires
+
+
+class CoordinatorHandler(socketserver.StreamRequestHandler):
+    """handles the messages of one worker connection"""
+
+    def handle(self):
+        coordinator = self.server.coordinator
+        leases = set()
+        try:
+            while True:
+                message = read_message(self.rfile)
+                if message is None:
+                    break
+
+                if message.get("op") == "lease":
+                    reply = coordinator._lease(message.get("size", DEFAULT_LEASE_SIZE))
+                    if "lease" in reply:
+                        leases.add(reply["lease"])
+                elif message.get("op") == "report":
+                    leases.discard(message["lease"])
+                    reply = coordinator._report(message["lease"], message["results"])
+                else:
+                    reply = {"error": f"unknown op {message.get('op')!r}"}
+                send_message(self.wfile, reply)
+
+        except (ConnectionError, ValueError):
+            pass
+        finally:
+            # the urls leased by a worker that disconnected can go to another worker now
+            coordinator._release(leases)
+
+
+class CoordinatorServer(socketserver.ThreadingTCPServer):
+    """a TCP server with a thread per worker connection"""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address: Tuple[str, int], coordinator: "Coordinator"):
+        self.coordinator = coordinator
+        super().__init__(address, CoordinatorHandler)
+
+
+class Coordinator(Crawler):
+    """
+    a Crawler that leases urls to workers (see CrawlWorker) rather than crawling them itself
+
+    How to use?
+        * coordinator = Coordinator(port=8765, **some_config)
+        * on any machines: CrawlWorker('coordinator-host:8765').work()
+        * found_urls = coordinator.crawl(some_url)
+        * coordinator.close()
+
+    the server listens from when the coordinator is made until it is closed,
+    workers that connect before a crawl starts wait for it and are told when it is done
+
+    :param host: (str) host to listen on
+    :param port: (int) port to listen on, 0 for any free port (see address)
+    :param lease_ttl: (float) seconds a worker has to report a lease before its
+                      urls are queued again
+    :param kwargs: the params of Crawler (max_workers isn't used, each worker has its own)
+
+    timeout is the max seconds to wait for any worker to lease or report
+    before assuming the crawl is hung
+    """
+
+    def __init__(
+        self,
+        host: str = DEFAULT_HOST,
+        port: int = DEFAULT_PORT,
+        lease_ttl: float = DEFAULT_LEASE_TTL,
+        **kwargs,
+    ):
+        # workers fetch without conditional requests, so validators would never be used
+        if kwargs.get("validators_dir") is not None:
+            raise ValueError("a coordinated crawl can't keep validators in a validators_dir")
+        # and they fetch live
+        if kwargs.get("replay") is not None:
+            raise ValueError("a coordinated crawl can't replay a WARC file")
+        super().__init__(**kwargs)
+        self.lease_ttl = lease_ttl
+        self._leases: Dict[int, Lease] = {}
+        self._lease_ids = itertools.count(1)
+        # set whenever a worker leases or reports
+        self._progress = threading.Event()
+        # None until a crawl starts, then True until it is done
+        self._crawling = None
+        self._lock = threading.RLock()
+        # number of reports whose results are being recorded (outside the lock)
+        self._reporting = 0
+        self._server = CoordinatorServer((host, port), self)
+        self._serve_thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._serve_thread.start()
+
+    @property
+    def address(self) -> Tuple[str, int]:
+        """the host and port the coordinator is listening on"""
+        return self._server.server_address[:2]
+
+    @property
+    def config(self) -> dict:
+        rv = super().config
+        rv["address"] = "{}:{}".format(*self.address)
+        rv["lease_ttl"] = self.lease_ttl
+        return rv
+
+    def close(self) -> None:
+        """stop listening for workers"""
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _lease(self, size: int) -> dict:
+        """lease up to size eligible urls to a worker"""
+        with self._lock:
+            if self._crawling is None:
+                return {"wait": POLL_INTERVAL}
+            if not self._crawling or self._stop_reason() is not None:
+                return {"done": True}
+
+            urls = []
+            while len(urls) < size and self._budget.exceeded() is None:
+                try:
+                    url = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                # if the url has been done, it needn't be leased
+                if url in self._done_urls:
+                    self._finish(url)
+                    continue
+                self._budget.page()
+                urls.append((str(url), self._queue.depth_of(url)))
+
+            self._progress.set()
+            if not urls:
+                wait = self._queue.next_ready_in()
+                return {"wait": POLL_INTERVAL if wait is None else min(wait, 1.0)}
+
+            lease_id = next(self._lease_ids)
+            self._leases[lease_id] = Lease(urls, time.monotonic() + self.lease_ttl)
+            return {"lease": lease_id, "urls": urls}
+
+    def _report(self, lease_id: int, results: list) -> dict:
+        """record the results of a lease, ok is False if the lease had expired"""
+        with self._lock:
+            lease = self._leases.pop(lease_id, None)
+            if lease is None:
+                return {"ok": False}
+
+            leased = {url for url, _ in lease.urls}
+            reported = {}
+            for item in results:
+                # only urls of the lease can be reported, once
+                if item["url"] in leased and item["url"] not in reported:
+                    reported[item["url"]] = item
+
+            # urls a worker left out are queued again
+            self._requeue([(url, depth) for url, depth in lease.urls if url not in reported])
+            self._reporting += 1
+
+        # visiting may fetch the robots.txt of new hosts, so it is done outside
+        # the lock (the urls reported aren't finished until it is, so the crawl
+        # can't look finished)
+        try:
+            for url, item in reported.items():
+                self._report_result(make_hyperlink(url), item)
+        finally:
+            with self._lock:
+                self._reporting -= 1
+            self._progress.set()
+        return {"ok": True}
+
+    def _report_result(self, url: Hyperlink, item: dict) -> None:
+        """record the result a worker reported of url and finish it, unless it is to be retried"""
+        retrying = False
+        try:
+            result = self._reported_result(url, item)
+            retrying = result is None
+            if not retrying:
+                self._record(result)
+        finally:
+            # a url to be retried is back in the queue, so it isn't finished
+            if not retrying:
+                self._finish(url)
+
+    def _reported_result(self, url: Hyperlink, item: dict) -> Union[CrawlResult, None]:
+        """
+        visit the hrefs a worker found on a url (if it was crawled) and make its
+        result, None if it failed and was handed back to the queue to be retried
+        """
+        item = dict(item)
+        hrefs = item.pop("hrefs", [])
+        exception = item.pop("exception", None)
+        retry_after = item.pop("retry_after", None)
+        first_hop = item.pop("first_hop", None)
+        depth = item["depth"]
+
+        if item["error"] is not None:
+            self._events.emit(ERROR, url, error=item["error"])
+            # workers only report no status when there was no response
+            error = item["status"] or exception or "RequestException"
+            if self._retry_later(url, error, retry_after):
+                return None
+            return CrawlResult(**item)
+
+        redirect = None if item["redirect"] is None else make_hyperlink(item["redirect"])
+        if redirect is not None:
+            self._redirects.put(url, redirect)
+
+        # crawl the page a redirect ended at as its own url (unless it was seen
+        # before), as Crawler._crawl_url does, so its links are joined to it
+        if first_hop is not None and self._follows_redirect(url, redirect):
+            new_links = 0
+            if self._claim_redirect(url, redirect, depth):
+                target = dict(item, url=str(redirect), redirect=None)
+                target["new_links"] = self._visit(redirect, hrefs, depth)
+                self._state.finish(redirect, True)
+                self._record(CrawlResult(**target))
+                new_links = 1
+            return CrawlResult(**dict(first_hop, new_links=new_links))
+
+        item["new_links"] = self._visit(url, hrefs, depth)
+        return CrawlResult(**item)
+
+    def _requeue(self, urls: list) -> None:
+        """queue leased urls again (putting first so the crawl can't look finished)"""
+        for url, depth in urls:
+            url = make_hyperlink(url)
+            self._queue.put(url, depth)
+            self._queue.task_done(url)
+
+    def _release(self, lease_ids) -> None:
+        """queue the urls of leases again"""
+        with self._lock:
+            for lease_id in lease_ids:
+                lease = self._leases.pop(lease_id, None)
+                if lease is not None:
+                    self._requeue(lease.urls)
+
+    def _expire_leases(self) -> None:
+        """queue the urls of expired leases again"""
+        now = time.monotonic()
+        with self._lock:
+            expired = [lease_id for lease_id, lease in self._leases.items() if lease.expires <= now]
+        self._release(expired)
+
+    def _wait_for_progress(self) -> bool:
+        """
+        wait for a worker to lease or report, False if none do within timeout
+        (not counting time waiting for results to be taken from iter_crawl or
+        for the results of a report to be recorded)
+        """
+        deadline = time.monotonic() + self.timeout
+        while time.monotonic() < deadline or self._results.full() or self._reporting:
+            self._expire_leases()
+            if self._progress.wait(self._budget.wait_timeout(POLL_INTERVAL)):
+                self._progress.clear()
+                return True
+            if self._stop_reason() is not None:
+                return True
+        return False
+
+    def _drain_leases(self) -> None:
+        """wait for the urls leased to be reported (and recorded), for at most timeout"""
+        deadline = time.monotonic() + self.timeout
+        while (self._leases or self._reporting) and time.monotonic() < deadline:
+            self._expire_leases()
+            self._progress.wait(POLL_INTERVAL)
+            self._progress.clear()
+
+    def _dispatch(self) -> Set[str]:
+        """lease urls to workers until every url is crawled"""
+        with self._lock:
+            self._leases = {}
+            self._crawling = True
+
+        try:
+            while True:
+                # stop if the crawl is stopped or a budget is used up, once
+                # the urls leased are reported (or their leases expire)
+                self.stop_reason = self._stop_reason()
+                if self.stop_reason is not None:
+                    self._drain_leases()
+                    break
+
+                if self._queue.outstanding == 0:
+                    self.stop_reason = self._end_reason()
+                    break
+
+                if not self._wait_for_progress():
+                    self.stop_reason = TIMED_OUT
+                    break
+
+        finally:
+            with self._lock:
+                self._crawling = False
+                self._leases = {}
+
+        with self._lock:
+            return self._render_results()
+
+
+class CrawlWorker(Crawler):
+    """
+    fetches urls leased from a Coordinator until the coordinator's crawl is done
+
+    How to use?
+        * worker = CrawlWorker('coordinator-host:8765', max_workers=8)
+        * worker.work()
+
+    :param coordinator: (str) HOST:PORT of the coordinator
+    :param lease_size: (int) max number of urls to lease at once, max_workers if None
+    :param kwargs: the params of Crawler used to fetch (user_agent, session,
+                   max_workers, timeout & check_head), what is crawled (robots,
+                   query, fragments, budgets, order) is up to the coordinator
+
+    timeout is also the max seconds to wait for the coordinator to accept the connection
+    """
+
+    def __init__(self, coordinator: str, lease_size: int = None, **kwargs):
+        super().__init__(**kwargs)
+        self.coordinator = coordinator
+        self.lease_size = lease_size if lease_size is not None else self.max_workers
+        self.address = parse_address(coordinator)
+
+    @property
+    def config(self) -> dict:
+        rv = super().config
+        rv["coordinator"] = self.coordinator
+        rv["lease_size"] = self.lease_size
+        return rv
+
+    def _connect(self) -> socket.socket:
+        """connect to the coordinator, trying again until timeout as it may not be up yet"""
+        deadline = time.monotonic() + self.timeout
+        while True:
+            try:
+                return socket.create_connection(self.address, timeout=self.timeout)
+            except OSError:
+                if time.monotonic() >= deadline:
+                    raise
+                time.sleep(POLL_INTERVAL)
+
+    def _fetch_url(self, url: str, depth: int) -> dict:
+        """
+        fetch a url for the hrefs on it, as a CrawlResult dict with the hrefs, and
+        for the coordinator to retry or follow it: the name of the exception
+        raised (if there was no response), the Retry-After header and the result
+        of the first response of a redirect followed
+        """
+        url = make_hyperlink(url)
+        self._events.emit(CRAWLING, url)
+        start = time.perf_counter()
+        resp, error, hrefs, redirect, exception = None, None, [], None, None
+        try:
+            resp = self._fetch(url)
+            redirect = self._redirect_target(url, resp)
+            hrefs = self._hrefs_from_response(resp)
+
+        # except 4xx or 5xx
+        except (ClientError, ServerError) as exc:
+            resp, error = exc.response, str(exc)
+
+        # or wrong mime type, which is still reported as crawled
+        except WrongMIMEType as exc:
+            resp = exc.response
+
+        # or no response at all
+        except RequestException as exc:
+            error, exception = str(exc) or exc.__class__.__name__, exc.__class__.__name__
+
+        elapsed = time.perf_counter() - start
+        rv = self._result(url, resp, depth, elapsed, error, redirect=redirect)._asdict()
+        rv["hrefs"] = hrefs
+        rv["exception"] = exception
+        rv["retry_after"] = None if resp is None else resp.headers.get("Retry-After")
+        rv["first_hop"] = None
+        if redirect is not None and resp.history:
+            first_hop = self._result(url, resp.history[0], depth, elapsed, redirect=redirect)
+            rv["first_hop"] = first_hop._asdict()
+        return rv
+
+    def work(self) -> int:
+        """
+        lease, fetch and report urls until the coordinator's crawl is done
+
+        :return: (int) number of urls this worker fetched
+        """
+        fetched = 0
+        with self._events, self._warc_stage(), self._connect() as sock, sock.makefile(
+            "rwb"
+        ) as stream, ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            # no timeout on replies, a coordinator may wait for iter_crawl to take its results
+            sock.settimeout(None)
+            while True:
+                send_message(stream, {"op": "lease", "size": self.lease_size})
+                reply = read_message(stream)
+                if reply is None or reply.get("done"):
+                    return fetched
+                if "wait" in reply:
+                    time.sleep(min(reply["wait"], POLL_INTERVAL * 20))
+                    continue
+
+                results = list(executor.map(lambda item: self._fetch_url(*item), reply["urls"]))
+                fetched += len(results)
+                send_message(stream, {"op": "report", "lease": reply["lease"], "results": results})
+                if read_message(stream) is None:
+                    return fetched
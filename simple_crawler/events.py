@@ -0,0 +1,299 @@
+"""
+module for the events of a crawl (urls crawled, visited, found, errors...) and the sinks they go to
+
+why?
+    printing each event from the worker that made it has every worker take the
+    stdout lock and wait for an unbuffered write to the terminal, on pages with
+    hundreds of links that is a noticeable share of a crawl, here a worker only
+    queues an event and a writer thread writes them in batches (one write per
+    batch), a verbosity level drops events before they are made (e.g. FOUND,
+    one per link) and FOUND events can be sampled
+
+    sinks:
+    * NullSink drops every event
+    * ConsoleSink writes events to stdout as they were always printed e.g. "VISITED: url"
+    * JsonLinesSink appends events to a file as JSON, one per line
+"""
+import json
+import queue
+import random
+import sys
+import threading
+import time
+from typing import NamedTuple
+from typing import TextIO
+
+RESUMING = "RESUMING"
+DISALLOWED = "DISALLOWED"
+CRAWL_DELAY = "CRAWL_DELAY"
+ERROR = "ERROR"
+RETRYING = "RETRYING"
+REDIRECTED = "REDIRECTED"
+CRAWLING = "CRAWLING"
+VISITED = "VISITED"
+FOUND = "FOUND"
+
+# the verbosity an event is shown from: 1 for the crawl, 2 for each url, 3 for each link
+LEVELS = {
+    RESUMING: 1,
+    DISALLOWED: 1,
+    CRAWL_DELAY: 1,
+    ERROR: 1,
+    RETRYING: 1,
+    REDIRECTED: 1,
+    CRAWLING: 2,
+    VISITED: 2,
+    FOUND: 3,
+}
+DEFAULT_VERBOSITY = 3
+
+FORMATS = {
+    RESUMING: "RESUMING: {url} with {done} done and {pending} to crawl",
+    DISALLOWED: "{user_agent} can't crawl {url}",
+    CRAWL_DELAY: "{user_agent} has a delay of {delay} on {url}",
+    ERROR: "ERROR: {error} ON {url}",
+    RETRYING: "RETRYING: {url} IN {delay:.2f}s",
+    REDIRECTED: "REDIRECTED: {url} TO {target}",
+    CRAWLING: "CRAWLING: {url}",
+    VISITED: "VISITED: {url}",
+    FOUND: "FOUND: {href} ON {url}",
+}
+
+# max number of events written at once
+DEFAULT_BATCH_SIZE = 1000
+
+
+class Event(NamedTuple):
+    """
+    an event of a crawl
+
+    :param time: (float) unix time the event happened at
+    :param kind: (str) what happened, one of the event kinds in simple_crawler.events
+    :param url: (str) the url (or host) it happened to
+    :param detail: (dict) the rest of the event e.g. {"href": ...} of FOUND
+    """
+
+    time: float
+    kind: str
+    url: str
+    detail: dict
+
+
+def format_event(event: Event) -> str:
+    """
+    an event as a line of text
+
+    >>> format_event(Event(0.0, FOUND, 'https://www.example.com/', {'href': '/hello'}))
+    'FOUND: /hello ON https://www.example.com/'
+    >>> format_event(Event(0.0, REDIRECTED, 'https://www.example.com/a', {'target': '/b', 'seen': True}))
+    'REDIRECTED: https://www.example.com/a TO /b (SEEN BEFORE)'
+    """
+    line = FORMATS[event.kind].format(url=event.url, **event.detail)
+    if event.detail.get("seen"):
+        line += " (SEEN BEFORE)"
+    return line
+
+
+def event_to_json(event: Event) -> str:
+    """
+    an event as a line of JSON
+
+    >>> event_to_json(Event(0.0, VISITED, 'https://www.example.com/', {}))
+    '{"time": 0.0, "event": "VISITED", "url": "https://www.example.com/"}'
+    """
+    return json.dumps(
+        {"time": event.time, "event": event.kind, "url": event.url, **event.detail}, default=str
+    )
+
+
+class EventSink:
+    """
+    where the events of a crawl go, a crawl starts its sink and closes it when done
+
+    * wants(kind) is checked before making an event that costs something to make
+    * emit(kind, url, **detail) hands over an event
+    """
+
+    def wants(self, kind: str) -> bool:
+        return False
+
+    def emit(self, kind: str, url, **detail) -> None:
+        pass
+
+    def start(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class NullSink(EventSink):
+    """a sink that drops every event"""
+
+
+class BufferedSink(EventSink):
+    """
+    a sink whose events are written in batches from a writer thread while it is
+    started (and as they come, by the thread that emits them, while it isn't)
+
+    :param verbosity: (int) events of a level over this are dropped (see LEVELS), 0 for none
+    :param found_sample: (float) fraction of FOUND events to keep, picked at random
+    :param batch_size: (int) max number of events written at once
+    :param rng: (random.Random) source of the sampling
+    """
+
+    def __init__(
+        self,
+        verbosity: int = DEFAULT_VERBOSITY,
+        found_sample: float = 1.0,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        rng: random.Random = None,
+    ):
+        if not 0 <= found_sample <= 1:
+            raise ValueError("found_sample must be between 0 and 1")
+        self.verbosity = verbosity
+        self.found_sample = found_sample
+        self.batch_size = batch_size
+        self._rng = rng or random.Random()
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def wants(self, kind: str) -> bool:
+        return LEVELS[kind] <= self.verbosity
+
+    def emit(self, kind: str, url, **detail) -> None:
+        if LEVELS[kind] > self.verbosity:
+            return
+        if kind == FOUND and self.found_sample < 1 and self._rng.random() >= self.found_sample:
+            return
+
+        event = Event(time.time(), kind, str(url), detail)
+        if self._thread is None:
+            self._write([event])
+        else:
+            self._queue.put(event)
+
+    def format(self, event: Event) -> str:
+        raise NotImplementedError
+
+    def _write_text(self, text: str) -> None:
+        raise NotImplementedError
+
+    def _write(self, events: list) -> None:
+        text = "".join(self.format(event) + "\n" for event in events)
+        with self._lock:
+            self._write_text(text)
+
+    def _run(self) -> None:
+        """take the events queued in batches and write them, until None is queued"""
+        while True:
+            events = [self._queue.get()]
+            # everything queued while the last batch was written goes in this one
+            while events[-1] is not None and len(events) < self.batch_size:
+                try:
+                    events.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            done = events[-1] is None
+            if done:
+                events.pop()
+            if events:
+                self._write(events)
+            if done:
+                return
+
+    def start(self) -> None:
+        """start writing events from the writer thread"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def close(self) -> None:
+        """write every event queued and stop the writer thread"""
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+
+class ConsoleSink(BufferedSink):
+    """
+    a sink writing events as lines of text e.g. "VISITED: url"
+
+    :param stream: (file) where to write, stdout (as it is when written to) if None
+    :param kwargs: the params of BufferedSink
+    """
+
+    def __init__(self, stream: TextIO = None, **kwargs):
+        super().__init__(**kwargs)
+        self.stream = stream
+
+    def format(self, event: Event) -> str:
+        return format_event(event)
+
+    def _write_text(self, text: str) -> None:
+        stream = self.stream if self.stream is not None else sys.stdout
+        stream.write(text)
+        stream.flush()
+
+
+class JsonLinesSink(BufferedSink):
+    """
+    a sink appending events to a file as JSON, one per line e.g.
+    {"time": 1600000000.0, "event": "FOUND", "url": "...", "href": "..."}
+
+    :param path: (str) the file to append to, it is open while the sink is started
+    :param kwargs: the params of BufferedSink
+    """
+
+    def __init__(self, path: str, **kwargs):
+        super().__init__(**kwargs)
+        self.path = path
+        self._file = None
+
+    def format(self, event: Event) -> str:
+        return event_to_json(event)
+
+    def _write_text(self, text: str) -> None:
+        if self._file is None:
+            with open(self.path, "a", encoding="utf-8") as file:
+                file.write(text)
+            return
+        self._file.write(text)
+        self._file.flush()
+
+    def start(self) -> None:
+        if self._file is None:
+            self._file = open(self.path, "a", encoding="utf-8")
+        super().start()
+
+    def close(self) -> None:
+        super().close()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def make_sink(verbosity: int = DEFAULT_VERBOSITY, found_sample: float = 1.0, path: str = None):
+    """
+    the sink for a verbosity: none if 0, else to path as JSON lines or to stdout if no path
+
+    >>> make_sink(0).__class__.__name__
+    'NullSink'
+    >>> make_sink(2).__class__.__name__
+    'ConsoleSink'
+    """
+    if verbosity <= 0:
+        return NullSink()
+    if path is not None:
+        return JsonLinesSink(path, verbosity=verbosity, found_sample=found_sample)
+    return ConsoleSink(verbosity=verbosity, found_sample=found_sample)
@@ -0,0 +1,245 @@
+"""
+module for a compact seen-set of urls stored as 64 bit fingerprints
+
+why?
+    a set of Hyperlink objects holds two strings and an object for every url
+    (hundreds of bytes each), all just to answer "have we seen this url?", here
+    each url is reduced to a 64 bit fingerprint (blake2b) kept in a flat
+    array('Q') open addressing table so a url costs 8 bytes per slot (~11 bytes
+    a url at the default max load to ~21 right after the table doubles) e.g. the
+    fingerprints of 50M urls in ~0.5 to ~1GB
+
+    NB: this only makes the seen-set compact, a crawl still keeps the urls it
+    has crawled and those queued as hyperlinks
+
+    the cost is that urls can't be iterated over and two urls may share a
+    fingerprint (a false "seen"), which is ~n^2 / 2^65 likely for n urls
+    (~1 in 15,000 for 50M urls), for when that isn't acceptable collisions can
+    be checked with a second, independent fingerprint per url (16 bytes a slot)
+"""
+import threading
+from array import array
+from hashlib import blake2b
+
+from simple_crawler.hyperlink import Hyperlink
+
+DEFAULT_SHARDS = 64
+DEFAULT_CAPACITY = 1024
+DEFAULT_MAX_LOAD = 0.75
+
+# ways of handling two urls with the same fingerprint
+IGNORE_COLLISIONS = "ignore"
+CHECK_COLLISIONS = "check"
+COLLISION_MODES = (IGNORE_COLLISIONS, CHECK_COLLISIONS)
+
+# 0 marks an empty slot so no fingerprint may be 0
+EMPTY = 0
+
+
+def fingerprint(url, person: bytes = b"") -> int:
+    """
+    a non zero 64 bit fingerprint of a url
+
+    >>> fingerprint('https://www.example.com/') == fingerprint('https://www.example.com/')
+    True
+    >>> fingerprint('https://www.example.com/') == fingerprint('https://www.example.com/', b'check')
+    False
+    """
+    digest = blake2b(str(url).encode("utf-8"), digest_size=8, person=person).digest()
+    return int.from_bytes(digest, "little") or 1
+
+
+class FingerprintTable:
+    """
+    an open addressing (linear probing) hash table of 64 bit fingerprints, not thread safe
+
+    :param capacity: (int) number of slots to start with, rounded up to a power of 2
+    :param max_load: (float) fraction of slots used before the table doubles in size
+    :param check_collisions: (bool) keep a second fingerprint per slot, so two
+                             urls are only the same if both fingerprints are
+    """
+
+    def __init__(
+        self,
+        capacity: int = DEFAULT_CAPACITY,
+        max_load: float = DEFAULT_MAX_LOAD,
+        check_collisions: bool = False,
+    ):
+        if not 0 < max_load < 1:
+            raise ValueError("max_load must be between 0 and 1")
+
+        self.max_load = max_load
+        self.check_collisions = check_collisions
+        # number of urls found with the fingerprint of another url (if checking)
+        self.collisions = 0
+        self._allocate(1 << max(capacity - 1, 1).bit_length())
+
+    def _allocate(self, capacity: int) -> None:
+        self._size = 0
+        self._mask = capacity - 1
+        self._limit = int(capacity * self.max_load)
+        self._keys = array("Q", bytes(8 * capacity))
+        self._checks = array("Q", bytes(8 * capacity)) if self.check_collisions else None
+
+    def _grow(self) -> None:
+        """
+        double the table, every entry goes in the first empty slot from its own
+        (they are all different, so none are compared or counted as collisions again)
+        """
+        keys, checks, size = self._keys, self._checks, self._size
+        self._allocate(len(keys) * 2)
+        new_keys, new_checks, mask = self._keys, self._checks, self._mask
+        for slot, key in enumerate(keys):
+            if key != EMPTY:
+                new_slot = key & mask
+                while new_keys[new_slot] != EMPTY:
+                    new_slot = (new_slot + 1) & mask
+                new_keys[new_slot] = key
+                if new_checks is not None:
+                    new_checks[new_slot] = checks[slot]
+        self._size = size
+
+    def _insert(self, key: int, check: int) -> bool:
+        """insert a fingerprint (and its check) if absent, returns True if it was inserted"""
+        keys, checks, mask = self._keys, self._checks, self._mask
+        slot = key & mask
+        while True:
+            found = keys[slot]
+            if found == EMPTY:
+                keys[slot] = key
+                if checks is not None:
+                    checks[slot] = check
+                self._size += 1
+                return True
+            if found == key:
+                if checks is None or checks[slot] == check:
+                    return False
+                self.collisions += 1
+            slot = (slot + 1) & mask
+
+    def _find(self, key: int, check: int) -> bool:
+        keys, checks, mask = self._keys, self._checks, self._mask
+        slot = key & mask
+        while True:
+            found = keys[slot]
+            if found == EMPTY:
+                return False
+            if found == key and (checks is None or checks[slot] == check):
+                return True
+            slot = (slot + 1) & mask
+
+    def add_fingerprint(self, key: int, check: int = EMPTY) -> bool:
+        """add a fingerprint (and its check), returns True if it was new"""
+        if self._size >= self._limit:
+            self._grow()
+        return self._insert(key, check)
+
+    def has_fingerprint(self, key: int, check: int = EMPTY) -> bool:
+        return self._find(key, check)
+
+    @property
+    def capacity(self) -> int:
+        return len(self._keys)
+
+    def memory_usage(self) -> int:
+        """bytes used by the table's arrays"""
+        rv = self._keys.buffer_info()[1] * self._keys.itemsize
+        if self._checks is not None:
+            rv += self._checks.buffer_info()[1] * self._checks.itemsize
+        return rv
+
+    def __len__(self) -> int:
+        return self._size
+
+
+class FingerprintRegistry:
+    """
+    a lock-striped thread safe seen-set of urls kept as 64 bit fingerprints
+
+    has the same add_if_absent, add, in & len as URLRegistry but urls can't be
+    iterated over (only their fingerprints are kept)
+
+    :param links: (Iterable) any hyperlinks to start with
+    :param shards: (int) number of shards (tables and locks) to spread urls over
+    :param capacity: (int) number of slots to start each shard with
+    :param max_load: (float) fraction of slots used before a shard doubles in size
+    :param collisions: (str) "ignore" to treat urls with the same fingerprint as
+                       the same url, or "check" to tell them apart with a second
+                       fingerprint (double the memory)
+    """
+
+    def __init__(
+        self,
+        links=None,
+        shards: int = DEFAULT_SHARDS,
+        capacity: int = DEFAULT_CAPACITY,
+        max_load: float = DEFAULT_MAX_LOAD,
+        collisions: str = IGNORE_COLLISIONS,
+    ):
+        if shards < 1:
+            raise ValueError("shards must be at least 1")
+        if collisions not in COLLISION_MODES:
+            raise ValueError(f"collisions must be one of {COLLISION_MODES}")
+
+        self.collision_mode = collisions
+        check = collisions == CHECK_COLLISIONS
+        self._shards = [FingerprintTable(capacity, max_load, check) for _ in range(shards)]
+        self._locks = [threading.Lock() for _ in range(shards)]
+
+        for link in links or ():
+            self.add(link)
+
+    def _fingerprints(self, link):
+        """the shard index, fingerprint and check fingerprint of a link"""
+        key = fingerprint(link)
+        check = fingerprint(link, b"check") if self.collision_mode == CHECK_COLLISIONS else EMPTY
+        # the table slot comes from the low bits so take the shard from the high bits
+        return (key >> 32) % len(self._shards), key, check
+
+    def add_if_absent(self, link: Hyperlink) -> bool:
+        """
+        atomically add link if it isn't already registered
+
+        :param link: (Hyperlink) link to add
+        :return: (bool) True if the link was new, False if it was already registered
+        """
+        if not isinstance(link, Hyperlink):
+            raise TypeError("link must be a Hyperlink")
+
+        index, key, check = self._fingerprints(link)
+        with self._locks[index]:
+            return self._shards[index].add_fingerprint(key, check)
+
+    def add(self, link: Hyperlink) -> None:
+        self.add_if_absent(link)
+
+    def __contains__(self, item) -> bool:
+        index, key, check = self._fingerprints(item)
+        with self._locks[index]:
+            return self._shards[index].has_fingerprint(key, check)
+
+    def __len__(self) -> int:
+        return sum(len(shard) for shard in self._shards)
+
+    @property
+    def collisions(self) -> int:
+        """number of urls found sharing a fingerprint with another (only counted if checking)"""
+        return sum(shard.collisions for shard in self._shards)
+
+    def memory_usage(self) -> int:
+        """bytes used by the fingerprint tables"""
+        return sum(shard.memory_usage() for shard in self._shards)
+
+    def __repr__(self):
+        return (
+            f"FingerprintRegistry(urls={len(self)}, bytes={self.memory_usage()}, "
+            f"collisions={self.collision_mode!r})"
+        )
+
+    def is_empty(self) -> bool:
+        """check if registry is empty"""
+        return len(self) == 0
+
+    def is_not_empty(self) -> bool:
+        """check if registry is not empty"""
+        return not self.is_empty()
@@ -0,0 +1,315 @@
+"""
+module for the frontier, the queue of urls waiting to be crawled
+
+why?
+    a polite crawler waits between requests to the same host (e.g. when robots.txt
+    has a Crawl-delay) but there is no reason to wait before requesting a url from
+    any other host, so urls are queued per host (authority) and a host is only
+    eligible to hand out its next url once its politeness timer has expired and it
+    has fewer than max_per_host urls being crawled
+
+    a frontier can also be given a spill (e.g. CrawlState) to keep urls on disk
+    over a threshold, they are read back in batches as the frontier runs low
+
+    the urls of a host are kept in a heap ordered by a FrontierOrder (bfs by
+    default) and of the hosts that are eligible the one with the best url goes first
+
+    a url that failed can be handed back to be retried after a delay, it waits
+    here (still outstanding) rather than holding up a worker
+"""
+import heapq
+import itertools
+import queue
+import threading
+import time
+from typing import Dict
+from typing import Union
+
+from simple_crawler.hyperlink import Hyperlink
+from simple_crawler.hyperlink import make_hyperlink
+from simple_crawler.ordering import BreadthFirst
+from simple_crawler.ordering import FrontierOrder
+
+
+class Frontier:
+    """
+    a host partitioned, thread safe queue of urls with per host politeness
+
+    * put(url, depth) queues a url and counts it as outstanding
+    * get() blocks until a url is eligible (its host isn't cooling down or at
+      capacity), it gets the first url by order of the eligible host with the first url
+    * depth_of(url) is the depth a url from get() was put with
+    * task_done(url) must be called when a url from get() is finished with
+    * or retry(url, delay) to queue it again once delay seconds have passed
+    * get() returns None once every outstanding url is finished
+
+    :param max_per_host: (int) max number of urls per host handed out and not
+                         yet finished, None for no limit
+    :param default_delay: (float) seconds between handing out urls of the same
+                          host, unless set per host with set_delay
+    :param delays: (dict) delay per host to start with (this dict is used, not copied)
+    :param spill: (CrawlState) any store with push(url, depth) and pop_batch(size) to
+                  keep urls on when there are more than max_in_memory queued
+    :param max_in_memory: (int) max number of queued urls to keep in memory
+    :param order: (FrontierOrder) the order to hand out urls in, bfs if None
+    """
+
+    def __init__(
+        self,
+        max_per_host: int = None,
+        default_delay: float = 0,
+        delays: Dict[str, float] = None,
+        spill=None,
+        max_in_memory: int = None,
+        order: FrontierOrder = None,
+    ):
+        if max_per_host is not None and max_per_host < 1:
+            raise ValueError("max_per_host must be at least 1")
+
+        if (spill is None) != (max_in_memory is None):
+            raise ValueError("spill and max_in_memory must be given together")
+
+        self.max_per_host = max_per_host
+        self.default_delay = default_delay
+        self.spill = spill
+        self.max_in_memory = max_in_memory
+        self.order = order if order is not None else BreadthFirst()
+        self._spilled = 0
+
+        # heap of (key, url, depth) per host
+        self._queues: Dict[str, list] = {}
+        self._delays: Dict[str, float] = delays if delays is not None else {}
+        self._next_times: Dict[str, float] = {}
+        self._in_flight: Dict[str, int] = {}
+        # depth of each url handed out and not yet finished
+        self._depths: Dict[Hyperlink, int] = {}
+        # heap of (time host is eligible, tie breaker, host) for hosts cooling down
+        self._schedule = []
+        self._cooling = set()
+        # heap of (key of host's first url, tie breaker, host) for eligible hosts,
+        # an entry whose key isn't the host's key in _ready_keys is stale
+        self._ready = []
+        self._ready_keys = {}
+        # heap of (time url can be retried, tie breaker, url, depth) for urls waiting to be retried
+        self._retries = []
+        self._counter = itertools.count()
+        self._seq = itertools.count()
+        self._queued = 0
+        # number of urls queued or handed out and not finished
+        self.outstanding = 0
+        self._condition = threading.Condition()
+
+    @staticmethod
+    def host(url: Hyperlink) -> str:
+        """the key urls are partitioned by"""
+        return url.authority
+
+    def set_delay(self, host: str, delay: float) -> None:
+        """set the politeness delay (seconds) of a host"""
+        with self._condition:
+            self._delays[host] = delay
+
+    def delay(self, host: str) -> float:
+        return self._delays.get(host, self.default_delay)
+
+    def _has_capacity(self, host: str) -> bool:
+        return self.max_per_host is None or self._in_flight.get(host, 0) < self.max_per_host
+
+    def _schedule_host(self, host: str) -> None:
+        """
+        add host to the schedule if it is cooling down, else to the ready hosts
+        (if it has urls and capacity and isn't already there with as good a key)
+        """
+        urls = self._queues.get(host)
+        if not urls or not self._has_capacity(host) or host in self._cooling:
+            return
+
+        key = urls[0][0]
+        if host in self._ready_keys:
+            if self._ready_keys[host] <= key:
+                return
+        elif self._next_times.get(host, 0) > time.monotonic():
+            self._cooling.add(host)
+            heapq.heappush(self._schedule, (self._next_times[host], next(self._counter), host))
+            return
+
+        self._ready_keys[host] = key
+        heapq.heappush(self._ready, (key, next(self._counter), host))
+
+    def _append(self, url: Hyperlink, depth: int) -> None:
+        """add url to its host's queue (must hold the lock)"""
+        host = self.host(url)
+        key = self.order.key(url, depth, next(self._seq))
+        heapq.heappush(self._queues.setdefault(host, []), (key, url, depth))
+        self._queued += 1
+        self._schedule_host(host)
+
+    def _refill(self) -> None:
+        """read spilled urls back into memory when memory runs low (must hold the lock)"""
+        if not self._spilled or self._queued > self.max_in_memory // 2:
+            return
+        for url, depth in self.spill.pop_batch(self.max_in_memory - self._queued):
+            self._spilled -= 1
+            self._append(make_hyperlink(url), depth)
+
+    def put(self, url: Hyperlink, depth: int = 0) -> None:
+        """queue a url found depth links away from where the crawl started"""
+        with self._condition:
+            if self.spill is not None and (self._spilled or self._queued >= self.max_in_memory):
+                self.spill.push(url, depth)
+                self._spilled += 1
+            else:
+                self._append(url, depth)
+            self.outstanding += 1
+            self._condition.notify()
+
+    def task_done(self, url: Hyperlink) -> None:
+        """mark a url handed out by get as finished, freeing a slot for its host"""
+        host = self.host(url)
+        with self._condition:
+            self._in_flight[host] -= 1
+            self._depths.pop(url, None)
+            self.outstanding -= 1
+            self._schedule_host(host)
+            self._condition.notify_all()
+
+    def retry(self, url: Hyperlink, delay: float) -> None:
+        """
+        hand back a url from get to be queued again after delay seconds (at its
+        depth), it stays outstanding, so get won't return None meanwhile
+        """
+        host = self.host(url)
+        with self._condition:
+            self._in_flight[host] -= 1
+            depth = self._depths.pop(url, 0)
+            heapq.heappush(
+                self._retries, (time.monotonic() + delay, next(self._counter), url, depth)
+            )
+            self._schedule_host(host)
+            self._condition.notify_all()
+
+    def _next_wake(self) -> Union[float, None]:
+        """the time a host cools down or a url can be retried, whichever is first (must hold the lock)"""
+        times = [heap[0][0] for heap in (self._schedule, self._retries) if heap]
+        return min(times) if times else None
+
+    def _pop_first(self, urls: list) -> tuple:
+        """
+        pop the first url of a host's heap, if keys are dynamic a url whose key
+        got worse since it was queued is put back (must hold the lock)
+        """
+        while True:
+            key, url, depth = heapq.heappop(urls)
+            if not self.order.dynamic or not urls:
+                return url, depth
+
+            current = self.order.key(url, depth, key[-1])
+            if current <= urls[0][0]:
+                return url, depth
+            heapq.heappush(urls, (current, url, depth))
+
+    def _pop(self, now: float) -> Union[Hyperlink, None]:
+        """pop the first url of the eligible host with the first url if any (must hold the lock)"""
+        self._refill()
+        # urls whose retry delay is over are queued again
+        while self._retries and self._retries[0][0] <= now:
+            _, _, url, depth = heapq.heappop(self._retries)
+            self._append(url, depth)
+
+        # hosts that have cooled down are ready
+        while self._schedule and self._schedule[0][0] <= now:
+            _, _, host = heapq.heappop(self._schedule)
+            self._cooling.discard(host)
+            self._schedule_host(host)
+
+        while self._ready:
+            key, _, host = heapq.heappop(self._ready)
+            if self._ready_keys.get(host) != key:
+                continue
+            del self._ready_keys[host]
+            urls = self._queues.get(host)
+            if not urls or not self._has_capacity(host):
+                continue
+
+            url, depth = self._pop_first(urls)
+            if not urls:
+                del self._queues[host]
+            self._queued -= 1
+            self._depths[url] = depth
+            self._in_flight[host] = self._in_flight.get(host, 0) + 1
+            self._next_times[host] = now + self.delay(host)
+            self._schedule_host(host)
+            return url
+
+        return None
+
+    def in_flight(self) -> int:
+        """number of urls handed out by get and not yet finished (or handed back)"""
+        with self._condition:
+            return len(self._depths)
+
+    def depth_of(self, url: Hyperlink) -> int:
+        """the depth of a url handed out and not yet finished"""
+        with self._condition:
+            return self._depths.get(url, 0)
+
+    def next_ready_in(self) -> Union[float, None]:
+        """seconds until the next host is eligible, None if no host has queued urls"""
+        with self._condition:
+            if self._ready_keys or (self._spilled and not self._schedule):
+                return 0.0
+            wake = self._next_wake()
+            if wake is None:
+                return None
+            return max(0.0, wake - time.monotonic())
+
+    def get_nowait(self) -> Hyperlink:
+        """get an eligible url or raise queue.Empty"""
+        with self._condition:
+            url = self._pop(time.monotonic())
+        if url is None:
+            raise queue.Empty
+        return url
+
+    def get(self, timeout: float = None) -> Union[Hyperlink, None]:
+        """
+        block until a url is eligible
+
+        :param timeout: (float) max seconds to wait for any url to be put or
+                        finished while no host is cooling down, None to wait forever
+        :return: a url, or None if all urls are finished or if we timed out
+        """
+        with self._condition:
+            deadline = None if timeout is None else time.monotonic() + timeout
+            while True:
+                now = time.monotonic()
+                url = self._pop(now)
+                if url is not None:
+                    return url
+
+                if self.outstanding == 0:
+                    return None
+
+                wake = self._next_wake()
+                if wake is not None:
+                    # a host is cooling down or a url is waiting to be retried,
+                    # this isn't a hang so don't time out
+                    self._condition.wait(timeout=wake - now)
+                    deadline = None if timeout is None else time.monotonic() + timeout
+                    continue
+
+                if deadline is not None and now >= deadline:
+                    return None
+
+                if self._condition.wait(timeout=None if deadline is None else deadline - now):
+                    # something was put or finished, so reset the timeout
+                    deadline = None if timeout is None else time.monotonic() + timeout
+
+    def empty(self) -> bool:
+        """check if no urls are queued (there may still be urls being crawled)"""
+        with self._condition:
+            return self._queued == 0 and self._spilled == 0 and not self._retries
+
+    def __len__(self) -> int:
+        with self._condition:
+            return self._queued + self._spilled + len(self._retries)
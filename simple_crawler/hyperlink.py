@@ -1,10 +1,14 @@
 """
 module with components for url (link) manipulation
 """
+import sys
 import urllib.parse
 from typing import Iterable
+from typing import Iterator
 from typing import Union
 
+from simple_crawler.url_normalisation import is_canonical
+from simple_crawler.url_normalisation import LRUCache
 from simple_crawler.url_normalisation import normalise_authority
 from simple_crawler.url_normalisation import normalise_fragment
 from simple_crawler.url_normalisation import normalise_kwargs
@@ -13,43 +17,88 @@ from simple_crawler.url_normalisation import normalise_query
 from simple_crawler.url_normalisation import normalise_scheme
 from simple_crawler.url_normalisation import normalise_url
 
+# the links parsed by Hyperlink, so a link on every page of a site is parsed once
+LINK_CACHE = LRUCache()
+
+# the components of a url in the order of urlsplit, and their place in a tuple from parse_link
+COMPONENTS = ("scheme", "authority", "path", "query", "fragment")
+
+
+def parse_link(link: str) -> tuple:
+    """
+    the normalised url, scheme, authority, path, query & fragment of a link
+
+    >>> parse_link('HTTPS://www.EXAMPLE.com?b=2&a=1')
+    ('https://www.example.com/?a=1&b=2', 'https', 'www.example.com', '/', 'a=1&b=2', '')
+    """
+    scheme, authority, path, query, fragment = urllib.parse.urlsplit(link)
+    if is_canonical(link):
+        # nothing to normalise
+        return link, sys.intern(scheme), sys.intern(authority), path, query, fragment
+
+    components = (
+        # hosts & schemes repeat across links, so one copy of each is kept
+        sys.intern(normalise_scheme(scheme)),
+        sys.intern(normalise_authority(authority)),
+        normalise_path(path),
+        normalise_query(query),
+        normalise_fragment(fragment),
+    )
+    # a link with a scheme is normalised to its normalised components (see
+    # normalise_url) so it needn't be split again
+    url = urllib.parse.urlunsplit(components) if components[0] else normalise_url(link)
+    return (url,) + components
+
 
 class Hyperlink:
     """
     a representation of a Hyperlink REFerence (href)
+
+    it is immutable and parsed once: its normalised url and components
+    (scheme, authority, path, query, fragment) are worked out when it is made
+    (or taken from LINK_CACHE) and kept in slots, and it hashes as its url
+    (whose hash python keeps), so using it in sets and filtering by its
+    components doesn't parse it again
     """
 
-    __slots__ = "url", "_input_url"
+    __slots__ = "url", "_input_url", "scheme", "authority", "path", "query", "fragment"
 
     def __init__(self, link: str):
+        self._set_parsed(link, LINK_CACHE.get(link, parse_link))
+
+    @classmethod
+    def _from_parsed(cls, link: str, parsed: tuple) -> "Hyperlink":
+        """a Hyperlink of link from what parse_link made of it, so it isn't looked up again"""
+        href = cls.__new__(cls)
+        href._set_parsed(link, parsed)
+        return href
+
+    def _set_parsed(self, link: str, parsed: tuple) -> None:
+        set_attr = object.__setattr__
+        url, scheme, authority, path, query, fragment = parsed
         # set input url as raw value
-        self._input_url = link
+        set_attr(self, "_input_url", link)
         # set url as normalised value
-        self.url = normalise_url(link)
-
-    @property
-    def components(self) -> urllib.parse.SplitResult:
-        return urllib.parse.urlsplit(self._input_url)
-
-    @property
-    def scheme(self) -> str:
-        return normalise_scheme(self.components.scheme)
+        set_attr(self, "url", url)
+        set_attr(self, "scheme", scheme)
+        set_attr(self, "authority", authority)
+        set_attr(self, "path", path)
+        set_attr(self, "query", query)
+        set_attr(self, "fragment", fragment)
 
-    @property
-    def authority(self) -> str:
-        return normalise_authority(self.components.netloc)
+    def __setattr__(self, name, value):
+        raise AttributeError("Hyperlink is immutable")
 
-    @property
-    def path(self) -> str:
-        return normalise_path(self.components.path)
+    def __delattr__(self, name):
+        raise AttributeError("Hyperlink is immutable")
 
-    @property
-    def query(self) -> str:
-        return normalise_query(self.components.query)
+    def __reduce__(self):
+        # slots that can't be set don't pickle, so it is made again from its input
+        return self.__class__, (self._input_url,)
 
     @property
-    def fragment(self) -> str:
-        return normalise_fragment(self.components.fragment)
+    def components(self) -> urllib.parse.SplitResult:
+        return urllib.parse.urlsplit(self._input_url)
 
     @property
     def domain(self):
@@ -94,7 +143,7 @@ class Hyperlink:
         return isinstance(other, self.__class__) and self.url == other.url
 
     def __hash__(self):
-        return hash(repr(self))
+        return hash(self.url)
 
     def __add__(self, other):
         return Hyperlink(self._input_url + str(other))
@@ -204,7 +253,7 @@ class HyperlinkSet:
         kwargs = normalise_kwargs(**kwargs)
         results = set()
         for link in self.collection:
-            if all([getattr(link, k) == v for k, v in kwargs.items()]):
+            if all(getattr(link, k) == v for k, v in kwargs.items()):
                 results.add(link)
         return HyperlinkSet(results)
 
@@ -239,3 +288,98 @@ def make_hyperlink_set(links: Iterable = None) -> HyperlinkSet:
             results.add(make_hyperlink(link))
 
     return HyperlinkSet(results)
+
+
+class LinkPipeline:
+    """
+    the steps taken on the hrefs found on a page (trim, join & filter_by)
+    fused into one lazy pass over them
+
+    why?
+        chaining HyperlinkSet.trim, join_all and filter_by makes a new set of
+        new Hyperlinks at every step, so each href is parsed and normalised
+        three times over (and most are then thrown away by the filter), the
+        pipeline works on the href strings and only makes a Hyperlink of the
+        urls that get through every step, each url once
+
+    trim, join and filter_by each return a new pipeline with that step added,
+    so one can be built up and reused, and whatever order they are added in
+    the steps are done as a crawler does them: trim, then join, then filter
+    (then dedupe)
+
+    >>> pipeline = LinkPipeline().trim(query=True).join('https://www.example.com/blog/')
+    >>> pipeline = pipeline.filter_by(authority='www.EXAMPLE.com')
+    >>> list(pipeline(['post?page=2', '/blog/post', 'https://www.example.org/']))
+    [Hyperlink('https://www.example.com/blog/post')]
+    """
+
+    def __init__(self, trims: tuple = (False,) * 5, base: str = None, filters: tuple = ()):
+        self._trims = trims
+        self._base = base
+        self._filters = filters
+
+    def trim(
+        self,
+        scheme: bool = False,
+        authority: bool = False,
+        path: bool = False,
+        query: bool = False,
+        fragment: bool = False,
+    ) -> "LinkPipeline":
+        """trim one (or more) of the components off every href (as Hyperlink.trim)"""
+        trims = (scheme, authority, path, query, fragment)
+        trims = tuple(old or new for old, new in zip(self._trims, trims))
+        return LinkPipeline(trims, self._base, self._filters)
+
+    def join(self, base_url: Union[str, Hyperlink]) -> "LinkPipeline":
+        """bind every href to base_url (as Hyperlink.join)"""
+        return LinkPipeline(self._trims, make_hyperlink(base_url)._input_url, self._filters)
+
+    def filter_by(self, **kwargs) -> "LinkPipeline":
+        """
+        keep the urls whose components are as kwargs (as HyperlinkSet.filter_by)
+
+        :param kwargs: any of: scheme, authority, path, query, fragment = <some value>
+        """
+        filters = tuple(
+            # + 1 as the normalised url comes first from parse_link
+            (COMPONENTS.index(k) + 1, v)
+            for k, v in normalise_kwargs(**kwargs).items()
+        )
+        return LinkPipeline(self._trims, self._base, self._filters + filters)
+
+    def __call__(self, links: Iterable) -> Iterator[Hyperlink]:
+        """
+        lazily trim, join, filter and dedupe links
+
+        :param links: (iterable) of href strings (or Hyperlinks)
+        :return: (iterator) of a Hyperlink for each url left
+        """
+        trims = self._trims
+        base = self._base
+        filters = self._filters
+        seen = set()
+        for link in links:
+            if isinstance(link, Hyperlink):
+                link = link._input_url
+            elif not isinstance(link, str):
+                raise TypeError("links must all be Hyperlink objects")
+
+            # split & unsplit even if nothing is trimmed, as Hyperlink.trim does (e.g. # -> '')
+            components = urllib.parse.urlsplit(link)
+            link = urllib.parse.urlunsplit(
+                ["" if trim else component for trim, component in zip(trims, components)]
+            )
+            if base is not None:
+                link = urllib.parse.urljoin(base, link)
+
+            parsed = LINK_CACHE.get(link, parse_link)
+            url = parsed[0]
+            if url in seen or not all(parsed[i] == v for i, v in filters):
+                continue
+            seen.add(url)
+            yield Hyperlink._from_parsed(link, parsed)
+
+    def collect(self, links: Iterable) -> HyperlinkSet:
+        """all the urls left of links, as a HyperlinkSet"""
+        return HyperlinkSet(set(self(links)))
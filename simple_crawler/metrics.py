@@ -0,0 +1,354 @@
+"""
+module for live metrics of a crawl: counters, histograms and gauges, served in the Prometheus text format
+
+why?
+    all there is to see of a running crawl is its output scrolling by, here a
+    crawler keeps counts of pages, bytes & status codes and histograms of
+    fetch (per host) & parse times as it goes, each update is a dict lookup
+    and an add under a lock so they are always kept, they can be seen:
+    * as a dict with Crawler.stats() (including pages/sec & bytes/sec so far)
+    * by scraping http://127.0.0.1:PORT/metrics while a crawler with a
+      metrics_port crawls, served by MetricsServer from a background thread
+"""
+import bisect
+import http.server
+import socketserver
+import threading
+import time
+from typing import Callable
+from typing import Dict
+from typing import List
+from typing import Tuple
+from typing import Union
+
+DEFAULT_METRICS_HOST = "127.0.0.1"
+# upper bounds of the buckets of a histogram of seconds
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def escape_label(value) -> str:
+    r"""
+    a label value as it is written in the Prometheus text format
+
+    >>> escape_label('say "hi"\n')
+    'say \\"hi\\"\\n'
+    """
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_labels(labels: List[Tuple[str, str]]) -> str:
+    """
+    labels as they are written after a metric's name
+
+    >>> format_labels([('host', 'www.example.com'), ('le', '0.5')])
+    '{host="www.example.com",le="0.5"}'
+    >>> format_labels([])
+    ''
+    """
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{escape_label(value)}"' for name, value in labels) + "}"
+
+
+class Counter:
+    """
+    a number that only goes up, one per value of its label if it has one
+
+    :param name: (str) name of the metric
+    :param description: (str) what it counts
+    :param label: (str) name of the label it is split by, None for no label
+    """
+
+    type = "counter"
+
+    def __init__(self, name: str, description: str, label: str = None):
+        self.name = name
+        self.description = description
+        self.label = label
+        self._values: Dict[object, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, label=None) -> None:
+        with self._lock:
+            self._values[label] = self._values.get(label, 0) + amount
+
+    def value(self, label=None) -> float:
+        with self._lock:
+            return self._values.get(label, 0)
+
+    def values(self) -> dict:
+        """the value of each label value"""
+        with self._lock:
+            return dict(self._values)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+    def samples(self) -> List[Tuple[str, List[Tuple[str, str]], float]]:
+        """(name, labels, value) of each line of the metric"""
+        values = self.values()
+        if self.label is None:
+            return [(self.name, [], values.get(None, 0))]
+        return [(self.name, [(self.label, key)], value) for key, value in sorted(values.items())]
+
+
+class Gauge:
+    """
+    a number read when it is wanted (e.g. the size of a queue), so keeping it costs nothing
+
+    :param name: (str) name of the metric
+    :param description: (str) what it measures
+    :param read: (callable) gives the current value
+    """
+
+    type = "gauge"
+
+    def __init__(self, name: str, description: str, read: Callable[[], float]):
+        self.name = name
+        self.description = description
+        self.read = read
+
+    def value(self) -> float:
+        return self.read()
+
+    def reset(self) -> None:
+        pass
+
+    def samples(self) -> List[Tuple[str, List[Tuple[str, str]], float]]:
+        return [(self.name, [], self.read())]
+
+
+class Histogram:
+    """
+    counts of observations (e.g. seconds) in buckets, one set of counts per value of its label
+
+    :param name: (str) name of the metric
+    :param description: (str) what it observes
+    :param label: (str) name of the label it is split by, None for no label
+    :param buckets: (tuple) upper bounds of the buckets, ascending (+Inf is added)
+    """
+
+    type = "histogram"
+
+    def __init__(self, name: str, description: str, label: str = None, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.description = description
+        self.label = label
+        self.buckets = tuple(buckets)
+        # per label value: [count of each bucket (not cumulative) then of +Inf, sum]
+        self._values: Dict[object, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, label=None) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._values.get(label)
+            if counts is None:
+                counts = self._values[label] = [0] * (len(self.buckets) + 1) + [0.0]
+            counts[index] += 1
+            counts[-1] += value
+
+    def _counts(self) -> Dict[object, list]:
+        with self._lock:
+            return {key: list(counts) for key, counts in self._values.items()}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+    def quantile(self, q: float, counts: list) -> Union[float, None]:
+        """
+        estimate of the q quantile of counts (as kept per label value), interpolated
+        within its bucket as Prometheus does, None if nothing was observed
+
+        >>> histogram = Histogram('seconds', 'seconds', buckets=(1, 2, 4))
+        >>> for value in (0.5, 1.5, 1.5, 3):
+        ...     histogram.observe(value)
+        >>> histogram.quantile(0.5, histogram._counts()[None])
+        1.5
+        """
+        total = sum(counts[:-1])
+        if not total:
+            return None
+        rank, cumulative, lower = q * total, 0, 0.0
+        for bound, count in zip(self.buckets, counts):
+            if count and cumulative + count >= rank:
+                return lower + (bound - lower) * (rank - cumulative) / count
+            cumulative += count
+            lower = bound
+        # in the +Inf bucket, the best guess is its lower bound
+        return lower
+
+    def summary(self) -> dict:
+        """count, sum, p50 & p99 of each label value (of the one set of counts if no label)"""
+        rv = {}
+        for key, counts in self._counts().items():
+            rv[key] = {
+                "count": sum(counts[:-1]),
+                "sum": counts[-1],
+                "p50": self.quantile(0.5, counts),
+                "p99": self.quantile(0.99, counts),
+            }
+        if self.label is not None:
+            return rv
+        return rv.get(None, {"count": 0, "sum": 0.0, "p50": None, "p99": None})
+
+    def samples(self) -> List[Tuple[str, List[Tuple[str, str]], float]]:
+        rv = []
+        for key, counts in sorted(self._counts().items(), key=lambda item: str(item[0])):
+            labels = [] if self.label is None else [(self.label, key)]
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                rv.append((self.name + "_bucket", labels + [("le", bound)], cumulative))
+            rv.append((self.name + "_sum", labels, counts[-1]))
+            rv.append((self.name + "_count", labels, cumulative))
+        return rv
+
+
+class MetricsRegistry:
+    """the metrics of something, rendered together"""
+
+    def __init__(self):
+        self._metrics = []
+
+    def add(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, description: str, label: str = None) -> Counter:
+        return self.add(Counter(name, description, label))
+
+    def gauge(self, name: str, description: str, read: Callable[[], float]) -> Gauge:
+        return self.add(Gauge(name, description, read))
+
+    def histogram(self, name: str, description: str, label: str = None, **kwargs) -> Histogram:
+        return self.add(Histogram(name, description, label, **kwargs))
+
+    def reset(self) -> None:
+        """set every counter and histogram back to nothing"""
+        for metric in self._metrics:
+            metric.reset()
+
+    def render(self) -> str:
+        """
+        every metric in the Prometheus text format
+
+        >>> registry = MetricsRegistry()
+        >>> registry.counter('pages_total', 'pages crawled').inc(2)
+        >>> print(registry.render(), end='')
+        # HELP pages_total pages crawled
+        # TYPE pages_total counter
+        pages_total 2
+        """
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.description}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{format_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+
+class CrawlMetrics:
+    """
+    the metrics of a crawler
+
+    :param frontier_size: (callable) gives the number of urls waiting to be crawled
+    :param in_flight: (callable) gives the number of urls being crawled
+    """
+
+    def __init__(self, frontier_size: Callable[[], int], in_flight: Callable[[], int]):
+        self.registry = MetricsRegistry()
+        self.pages = self.registry.counter("crawler_pages_total", "urls crawled")
+        self.bytes = self.registry.counter("crawler_bytes_total", "bytes of responses downloaded")
+        self.responses = self.registry.counter(
+            "crawler_responses_total", "urls crawled by status code of their response", "status"
+        )
+        self.fetch_seconds = self.registry.histogram(
+            "crawler_fetch_seconds", "seconds to fetch a url, by host", "host"
+        )
+        self.parse_seconds = self.registry.histogram(
+            "crawler_parse_seconds", "seconds to get the hrefs of a response"
+        )
+        self.registry.gauge("crawler_frontier_urls", "urls waiting to be crawled", frontier_size)
+        self.registry.gauge("crawler_in_flight", "urls being crawled", in_flight)
+        self.frontier_size = frontier_size
+        self.in_flight = in_flight
+        self.started = None
+
+    def start(self) -> None:
+        """start counting a new crawl from nothing"""
+        self.registry.reset()
+        self.started = time.monotonic()
+
+    def stats(self) -> dict:
+        """a snapshot of every metric, with pages and bytes per second since the crawl started"""
+        elapsed = 0.0 if self.started is None else time.monotonic() - self.started
+        pages, size = self.pages.value(), self.bytes.value()
+        return {
+            "elapsed": elapsed,
+            "pages": pages,
+            "pages_per_sec": pages / elapsed if elapsed else 0.0,
+            "bytes": size,
+            "bytes_per_sec": size / elapsed if elapsed else 0.0,
+            "frontier": self.frontier_size(),
+            "in_flight": self.in_flight(),
+            "status_codes": self.responses.values(),
+            "fetch_seconds": self.fetch_seconds.summary(),
+            "parse_seconds": self.parse_seconds.summary(),
+        }
+
+
+class MetricsHandler(http.server.BaseHTTPRequestHandler):
+    """serves the metrics of the server's registry at /metrics"""
+
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = self.server.registry.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # scrapes aren't worth a line on stderr each
+        pass
+
+
+class MetricsServer(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    """
+    a HTTP server of the metrics of a registry, serving from a background thread until closed
+
+    :param registry: (MetricsRegistry) the metrics to serve
+    :param port: (int) port to listen on, 0 for any free port (see address)
+    :param host: (str) host to listen on
+    """
+
+    daemon_threads = True
+
+    def __init__(self, registry: MetricsRegistry, port: int, host: str = DEFAULT_METRICS_HOST):
+        self.registry = registry
+        super().__init__((host, port), MetricsHandler)
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+
+    @property
+    def address(self) -> Tuple[str, int]:
+        return self.server_address[:2]
+
+    def close(self) -> None:
+        """stop serving"""
+        self.shutdown()
+        self.server_close()
+        self._thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
@@ -0,0 +1,159 @@
+"""
+module for the order urls are taken from the frontier in
+
+why?
+    when a crawl is cut short by a budget, which urls got crawled depends on
+    the order they were taken in, each order here gives every queued url a key
+    and the frontier hands out the url with the lowest key first (per host heaps):
+    * bfs: shallowest first (the default, the first found first for the same depth)
+    * dfs: deepest first (the last found first for the same depth)
+    * depth-weighted: first found first but each level deeper counts as being
+      found weight urls later, a blend of first found first and bfs
+    * best-first: urls of the sections of a site (path patterns) that have
+      yielded the most new urls per fetch so far first
+"""
+import re
+import threading
+import urllib.parse
+from typing import Dict
+from typing import List
+from typing import Tuple
+
+DEFAULT_ORDER = "bfs"
+DEFAULT_DEPTH_WEIGHT = 10.0
+DEFAULT_PRIOR_YIELD = 1.0
+
+
+def path_pattern(url) -> str:
+    """
+    the section of a site a url is in: the directory of its path with numbers as #
+
+    >>> path_pattern('https://www.example.com/blog/2020/05/hello-world')
+    '/blog/#/#/'
+    >>> path_pattern('https://www.example.com/')
+    '/'
+    >>> path_pattern('/products/123?colour=red')
+    '/products/'
+    """
+    path = urllib.parse.urlsplit(str(url)).path or "/"
+    return re.sub(r"\d+", "#", path[: path.rfind("/") + 1])
+
+
+class FrontierOrder:
+    """
+    base class of frontier orders, subclasses give the key urls are sorted by
+
+    :attr dynamic: (bool) if keys can change after a url is queued (as what is
+                   learnt from record changes), the frontier then checks a url's
+                   key again before handing it out
+    """
+
+    name = None
+    dynamic = False
+
+    def key(self, url, depth: int, seq: int) -> tuple:
+        """
+        the key to sort a url by, lowest first
+
+        :param url: (Hyperlink) the url queued
+        :param depth: (int) the number of links from the url the crawl started from
+        :param seq: (int) increases with every url queued, so it gives the order urls were found in
+        """
+        raise NotImplementedError
+
+    def record(self, url, new_links: int) -> None:
+        """learn from a url that was crawled and the number of new urls it led to"""
+        pass
+
+
+class BreadthFirst(FrontierOrder):
+    """shallowest urls first"""
+
+    name = "bfs"
+
+    def key(self, url, depth: int, seq: int) -> tuple:
+        return depth, seq
+
+
+class DepthFirst(FrontierOrder):
+    """deepest urls first"""
+
+    name = "dfs"
+
+    def key(self, url, depth: int, seq: int) -> tuple:
+        return -depth, -seq
+
+
+class DepthWeighted(FrontierOrder):
+    """
+    first found first, but each level of depth counts as being found weight urls later
+
+    :param weight: (float) 0 for first found first, the higher the closer to bfs
+    """
+
+    name = "depth-weighted"
+
+    def __init__(self, weight: float = DEFAULT_DEPTH_WEIGHT):
+        self.weight = weight
+
+    def key(self, url, depth: int, seq: int) -> tuple:
+        return seq + self.weight * depth, seq
+
+
+class BestFirst(FrontierOrder):
+    """
+    urls of the path patterns with the highest link yield (new urls found per fetch) first
+
+    a pattern's yield is (new urls found + prior) / (fetches + 1), so patterns
+    not fetched yet are tried at prior and a pattern drops back as it runs dry
+
+    :param prior: (float) the yield of a pattern before any of its urls are fetched
+    :param depth_weight: (float) how much yield each level of depth costs
+    """
+
+    name = "best-first"
+    dynamic = True
+
+    def __init__(self, prior: float = DEFAULT_PRIOR_YIELD, depth_weight: float = 0.0):
+        self.prior = prior
+        self.depth_weight = depth_weight
+        # [fetches, new urls found] per path pattern
+        self._stats: Dict[str, List[int]] = {}
+        self._lock = threading.Lock()
+
+    def link_yield(self, pattern: str) -> float:
+        """the estimated number of new urls a fetch of a url of pattern finds"""
+        with self._lock:
+            fetches, found = self._stats.get(pattern, (0, 0))
+        return (found + self.prior) / (fetches + 1)
+
+    def key(self, url, depth: int, seq: int) -> tuple:
+        return self.depth_weight * depth - self.link_yield(path_pattern(url)), seq
+
+    def record(self, url, new_links: int) -> None:
+        with self._lock:
+            stats = self._stats.setdefault(path_pattern(url), [0, 0])
+            stats[0] += 1
+            stats[1] += new_links
+
+    def top_patterns(self, n: int = 10) -> List[Tuple[str, float]]:
+        """the n patterns with the highest yields so far"""
+        with self._lock:
+            patterns = list(self._stats)
+        yields = [(pattern, self.link_yield(pattern)) for pattern in patterns]
+        return sorted(yields, key=lambda item: item[1], reverse=True)[:n]
+
+
+ORDERS = {order.name: order for order in (BreadthFirst, DepthFirst, DepthWeighted, BestFirst)}
+
+
+def make_order(name: str = DEFAULT_ORDER) -> FrontierOrder:
+    """
+    make a frontier order from its name
+
+    >>> make_order('dfs').key('/hello', 1, 2)
+    (-1, -2)
+    """
+    if name not in ORDERS:
+        raise ValueError(f"order must be one of {tuple(ORDERS)}")
+    return ORDERS[name]()
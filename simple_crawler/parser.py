@@ -2,6 +2,7 @@
 module for parsing HTML and getting out the links
 """
 from html.parser import HTMLParser
+from typing import List
 
 from simple_crawler.hyperlink import HyperlinkSet
 from simple_crawler.hyperlink import make_hyperlink
@@ -42,6 +43,61 @@ class AnchorTagParser(HTMLParser):
         pass
 
 
+class HrefParser(HTMLParser):
+    """
+    Like AnchorTagParser but keeps the raw HREF values as strings (in order, no duplicates)
+    which are cheap to send between processes
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.found_hrefs = {}
+
+    def handle_starttag(self, tag: str, attrs: list) -> None:
+        if tag == "a":
+            for attr, value in attrs:
+                if attr == "href" and value is not None:
+                    self.found_hrefs[value] = None
+
+    def error(self, message: str) -> None:
+        pass
+
+
+def parse_hrefs(content: bytes, encoding: str = None) -> List[str]:
+    """
+    get all href values of <a> tags from raw html bytes, this is a top level function
+    so that it can be run in a process pool
+
+    :param content: (bytes) the html
+    :param encoding: (str) encoding of the html, defaults to utf-8
+    :return: (list) of href strings
+
+    >>> parse_hrefs(b'<a href="/hello">hi</a><a href="/world"></a><a href="/hello"></a>')
+    ['/hello', '/world']
+    """
+    try:
+        html = content.decode(encoding or "utf-8", errors="replace")
+    except LookupError:
+        html = content.decode("utf-8", errors="replace")
+
+    return get_raw_hrefs_from_html(html)
+
+
+def get_raw_hrefs_from_html(html: str) -> List[str]:
+    """
+    get all href values of <a> tags from a html snippet (via `HrefParser`), as they are found
+
+    :param html: (str) a html snippet
+    :return: (list) of href strings (in order, no duplicates)
+
+    >>> get_raw_hrefs_from_html('<a href="../hello">hi</a><a href="./hello"></a>')
+    ['../hello', './hello']
+    """
+    parser = HrefParser()
+    parser.feed(html)
+    return list(parser.found_hrefs)
+
+
 def get_hrefs_from_html(html: str) -> HyperlinkSet:
     """
     * This function will find all <a> tags in a HTML snippet (via `AnchorTagParser`)
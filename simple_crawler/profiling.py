@@ -0,0 +1,270 @@
+"""
+module for profiling a crawl: timed spans around each stage, and optional cProfile & tracemalloc
+
+why?
+    when a crawl slows down it isn't clear if the time goes on the network
+    (connecting & waiting, or transferring), on parsing html, on normalising
+    links, on deduping them or on the dispatcher waiting, here each stage of
+    crawling a url is a span (a name, a thread, a start and a duration) so:
+    * the spans are written as a Chrome trace (open it in chrome://tracing or
+      https://ui.perfetto.dev) to see what each thread did when
+    * the spans are added up per stage into a table
+    * cProfile (every thread of the crawl) and tracemalloc can be run for the
+      duration of the crawl too, for a whole picture to attach to a bug report
+
+    the stages:
+    * crawl_url: all of crawling a url, the stages below are within it
+    * fetch.headers: DNS, connecting and sending the request, up to its response headers
+    * fetch.body: downloading the body of the response (and any HEAD sent first)
+    * fetch: all of fetching a url, when there is no response to split it by
+    * parse: getting the hrefs out of the html (AnchorTagParser.feed)
+    * normalise: trimming, joining and filtering the hrefs of a page
+    * dedupe: checking the hrefs of a page against seen urls (and robots.txt) and queueing them
+    * robots: fetching a robots.txt
+    * dispatch.wait_worker: the dispatcher waiting for a free worker
+    * dispatch.wait_url: the dispatcher waiting for a url to be eligible
+"""
+import cProfile
+import io
+import json
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from typing import Dict
+from typing import List
+from typing import NamedTuple
+
+TRACE_FILE = "trace.json"
+STAGES_FILE = "stages.txt"
+CPROFILE_FILE = "crawl.prof"
+CPROFILE_TEXT_FILE = "cprofile.txt"
+TRACEMALLOC_FILE = "tracemalloc.txt"
+# number of functions / lines written to the text reports
+TOP = 40
+
+
+class Span(NamedTuple):
+    """
+    a stage of a crawl that took some time
+
+    :param name: (str) the stage
+    :param tid: (int) the thread (or task) it ran on
+    :param start: (float) perf_counter seconds it started at
+    :param duration: (float) seconds it took
+    """
+
+    name: str
+    tid: int
+    start: float
+    duration: float
+
+
+class _NoSpan:
+    """a span that isn't timed"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        pass
+
+
+NO_SPAN = _NoSpan()
+
+
+class NoTracer:
+    """a tracer that keeps nothing (used for when a crawl isn't profiled)"""
+
+    def span(self, name: str, tid: int = None):
+        return NO_SPAN
+
+    def add(self, name: str, start: float, duration: float, tid: int = None) -> None:
+        pass
+
+
+class _TimedSpan:
+    """a span that is added to its tracer when it exits"""
+
+    __slots__ = ("tracer", "name", "tid", "start")
+
+    def __init__(self, tracer: "Tracer", name: str, tid: int = None):
+        self.tracer = tracer
+        self.name = name
+        self.tid = tid
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.tracer.add(self.name, self.start, time.perf_counter() - self.start, self.tid)
+
+
+class Tracer:
+    """
+    keeps the spans of a crawl (thread safe, list.append is atomic)
+
+    How to use?
+        * with tracer.span('parse'): ...
+        * or tracer.add('fetch', start, duration) for a span timed elsewhere
+    """
+
+    def __init__(self):
+        self.spans: List[Span] = []
+        self.started = time.perf_counter()
+
+    def span(self, name: str, tid: int = None) -> _TimedSpan:
+        """a context manager timing a span, on tid (the current thread if None)"""
+        return _TimedSpan(self, name, tid)
+
+    def add(self, name: str, start: float, duration: float, tid: int = None) -> None:
+        tid = threading.get_ident() if tid is None else tid
+        self.spans.append(Span(name, tid, start, duration))
+
+    def chrome_trace(self) -> dict:
+        """the spans as Chrome trace events (complete events, times in microseconds)"""
+        pid = os.getpid()
+        events = [
+            {
+                "name": span.name,
+                "cat": "crawl",
+                "ph": "X",
+                "ts": (span.start - self.started) * 1e6,
+                "dur": span.duration * 1e6,
+                "pid": pid,
+                "tid": span.tid,
+            }
+            for span in self.spans
+        ]
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def stages(self) -> Dict[str, dict]:
+        """
+        count, total, mean & max seconds of each stage, by total (most first)
+
+        >>> tracer = Tracer()
+        >>> tracer.add('parse', 0.0, 0.25)
+        >>> tracer.add('parse', 1.0, 0.75)
+        >>> tracer.stages()['parse']
+        {'count': 2, 'total': 1.0, 'mean': 0.5, 'max': 0.75}
+        """
+        durations: Dict[str, List[float]] = {}
+        for span in list(self.spans):
+            durations.setdefault(span.name, []).append(span.duration)
+        rv = {
+            name: {
+                "count": len(values),
+                "total": sum(values),
+                "mean": sum(values) / len(values),
+                "max": max(values),
+            }
+            for name, values in durations.items()
+        }
+        return dict(sorted(rv.items(), key=lambda item: -item[1]["total"]))
+
+    def format_stages(self) -> str:
+        """the stages as a table"""
+        lines = [f"{'stage':<22} {'count':>8} {'total s':>10} {'mean ms':>10} {'max ms':>10}"]
+        for name, stage in self.stages().items():
+            lines.append(
+                f"{name:<22} {stage['count']:>8} {stage['total']:>10.3f} "
+                f"{stage['mean'] * 1e3:>10.3f} {stage['max'] * 1e3:>10.3f}"
+            )
+        return "\n".join(lines) + "\n"
+
+
+class Profiler:
+    """
+    profiles a crawl (as a context manager), writing to a directory:
+    * trace.json: the spans of the tracer as a Chrome trace
+    * stages.txt: the spans added up per stage
+    * crawl.prof & cprofile.txt: the cProfile stats of every thread (if cprofile)
+    * tracemalloc.txt: the lines that allocated the most memory still held at the end,
+      and the peak (if memory)
+
+    :param directory: (str) where to write to (made if it doesn't exist)
+    :param cprofile: (bool) run cProfile on every thread started during the crawl
+                     and the one it runs on
+    :param memory: (bool) trace memory allocations during the crawl with tracemalloc
+    """
+
+    def __init__(self, directory: str, cprofile: bool = False, memory: bool = False):
+        self.directory = directory
+        self.cprofile = cprofile
+        self.memory = memory
+        self.tracer = Tracer()
+        self._profiles: List[cProfile.Profile] = []
+        self._started_tracemalloc = False
+
+    def _profile_thread(self, *args) -> None:
+        """profile hook of new threads, which swaps itself for a cProfile of the thread"""
+        profile = cProfile.Profile()
+        self._profiles.append(profile)
+        profile.enable()
+
+    def start(self) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        self.tracer = Tracer()
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+        if self.cprofile:
+            self._profiles = []
+            threading.setprofile(self._profile_thread)
+            self._profile_thread()
+
+    def stop(self) -> None:
+        if self.cprofile:
+            threading.setprofile(None)
+            # only the profile of this thread can be disabled from here, the others
+            # are of threads that are done (as the crawl is)
+            self._profiles[0].disable()
+        # before the cProfile stats are written, so their memory isn't counted
+        if self.memory:
+            self._write_tracemalloc()
+            if self._started_tracemalloc:
+                tracemalloc.stop()
+                self._started_tracemalloc = False
+        if self.cprofile:
+            self._write_cprofile()
+
+        with open(self.path(TRACE_FILE), "w") as file:
+            json.dump(self.tracer.chrome_trace(), file)
+        with open(self.path(STAGES_FILE), "w") as file:
+            file.write(self.tracer.format_stages())
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def _write_cprofile(self) -> None:
+        stream = io.StringIO()
+        stats = pstats.Stats(self._profiles[0], stream=stream)
+        for profile in self._profiles[1:]:
+            profile.create_stats()
+            # a thread that never ran any python has nothing to add
+            if profile.stats:
+                stats.add(profile)
+        stats.dump_stats(self.path(CPROFILE_FILE))
+        stats.sort_stats("cumulative").print_stats(TOP)
+        with open(self.path(CPROFILE_TEXT_FILE), "w") as file:
+            file.write(stream.getvalue())
+
+    def _write_tracemalloc(self) -> None:
+        current, peak = tracemalloc.get_traced_memory()
+        snapshot = tracemalloc.take_snapshot().filter_traces(
+            [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__)]
+        )
+        top = snapshot.statistics("lineno")[:TOP]
+        with open(self.path(TRACEMALLOC_FILE), "w") as file:
+            file.write(f"current: {current / 1e6:.1f} MB, peak: {peak / 1e6:.1f} MB\n")
+            for stat in top:
+                file.write(f"{stat}\n")
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
@@ -0,0 +1,69 @@
+"""
+module for remembering where urls redirect to, so a redirect is only ever fetched once
+
+why?
+    a url that redirects (e.g. /old -> /new) costs a round trip every time a
+    page links to it, and with redirects followed the page it ends at is
+    fetched under the url that redirected, so a link straight to /new fetches
+    it a second time, here each redirect chain fetched is kept (source url ->
+    url it ends at) so that:
+    * links to a known source are taken as links to where it ends, with no request
+    * the url a chain ends at is registered as seen, so it isn't fetched again
+"""
+import threading
+from typing import Dict
+from typing import List
+from typing import Tuple
+
+from simple_crawler.hyperlink import Hyperlink
+
+# max number of redirects followed from one url when resolving it (as requests does)
+MAX_REDIRECTS = 30
+
+
+class RedirectCache:
+    """thread safe map of urls that redirect to the url they redirect to, keyed by normalised url"""
+
+    def __init__(self):
+        self._targets: Dict[Hyperlink, Hyperlink] = {}
+        self._lock = threading.Lock()
+
+    def put(self, source: Hyperlink, target: Hyperlink) -> None:
+        """keep that source redirects to target"""
+        if source != target:
+            with self._lock:
+                self._targets[source] = target
+
+    def resolve(self, url: Hyperlink) -> Hyperlink:
+        """
+        the url a chain of known redirects from url ends at, url itself if it
+        isn't known to redirect (or its chain loops)
+
+        >>> from simple_crawler.hyperlink import make_hyperlink
+        >>> cache = RedirectCache()
+        >>> cache.put(make_hyperlink('https://www.example.com/a'), make_hyperlink('https://www.example.com/b'))
+        >>> cache.put(make_hyperlink('https://www.example.com/b'), make_hyperlink('https://www.example.com/c'))
+        >>> cache.resolve(make_hyperlink('https://www.example.com/a'))
+        Hyperlink('https://www.example.com/c')
+        >>> cache.resolve(make_hyperlink('https://www.example.com/c'))
+        Hyperlink('https://www.example.com/c')
+        """
+        with self._lock:
+            target, visited = url, {url}
+            while target in self._targets and len(visited) <= MAX_REDIRECTS:
+                target = self._targets[target]
+                if target in visited:
+                    return url
+                visited.add(target)
+            return target
+
+    def edges(self) -> List[Tuple[str, str]]:
+        """every redirect kept, as (source, target) strings"""
+        with self._lock:
+            return [(str(source), str(target)) for source, target in self._targets.items()]
+
+    def __contains__(self, url: Hyperlink) -> bool:
+        return url in self._targets
+
+    def __len__(self) -> int:
+        return len(self._targets)
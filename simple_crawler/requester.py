@@ -1,17 +1,27 @@
 """
 module service that handles getting text data from web servers
 """
+import asyncio
+import ssl
+import urllib.parse
 from typing import Iterable
+from typing import Tuple
 
 import requests
+from requests.structures import CaseInsensitiveDict
 
 from simple_crawler.hyperlink import Hyperlink
 
+NOT_MODIFIED = 304
+REDIRECT_STATUS_CODES = (301, 302, 303, 307, 308)
+
 
 class RequesterError(Exception):
-    """Base exception for this service"""
+    """Base exception for this service, with the response that raised it (if any)"""
 
-    pass
+    def __init__(self, *args, response=None):
+        super().__init__(*args)
+        self.response = response
 
 
 class WrongMIMEType(RequesterError):
@@ -32,12 +42,55 @@ class ServerError(RequesterError):
     pass
 
 
+class BadResponse(RequesterError):
+    """a response cut short or that isn't HTTP (async requester only, requests raises its own)"""
+
+    pass
+
+
+def check_response(response, mime_types: Iterable):
+    """
+    check the status code and MIME type of any response (sync or async)
+
+    :param response: (requests.Response or AsyncResponse) the response to check
+    :param mime_types: (Iterable) a selection of mime-types that are acceptable
+    :return: the response if it passes
+
+    :raises: ClientError if 4xx from response
+    :raises: ServerError if 5xx from response
+    :raises: MimeTypeError if response MIME type doesn't match mime_types param
+    """
+    # a 304 Not Modified (to a conditional request) has no body to check and may have no Content-Type
+    if response.status_code == NOT_MODIFIED:
+        return response
+
+    # nor does a redirect that wasn't followed, its Location is all there is to it
+    if response.status_code in REDIRECT_STATUS_CODES and "Location" in response.headers:
+        return response
+
+    if str(response.status_code).startswith("4"):
+        raise ClientError(f"{response.status_code} {response.reason}", response=response)
+
+    if str(response.status_code).startswith("5"):
+        raise ServerError(f"{response.status_code} {response.reason}", response=response)
+
+    for mime_type in mime_types:
+        if mime_type.lower() in response.headers["Content-Type"].lower():
+            return response
+
+    raise WrongMIMEType(
+        f"{response.headers['Content-Type']} not in {mime_types}", response=response
+    )
+
+
 class Requester:
     """this class maintains a request session and handles all logic RE getting text"""
 
     def __init__(self, session: requests.Session = None, user_agent: str = None):
         self.session = session or requests.Session()
         self.user_agent = user_agent
+        # a WarcWriter that GET responses (and their redirects) are written to, if recording
+        self.recorder = None
 
         if user_agent is not None:
             self.session.headers["User-Agent"] = self.user_agent
@@ -48,6 +101,7 @@ class Requester:
         url: Hyperlink,
         mime_types: Iterable,
         follow_redirects: bool = True,
+        headers: dict = None,
     ) -> requests.Response:
         """
         wrapper function around requests.request that handles some internal logic
@@ -56,6 +110,7 @@ class Requester:
         :param url: (Hyperlink) a link to ping
         :param mime_types: (Iterable) a selection of mime-types that are acceptable
         :param follow_redirects (bool) whether or not to follow redirects
+        :param headers: (dict) any headers to send as well as the session's
         :return: (str) the response text (e.g. the html)
 
         :raises: ClientError if 4xx from response
@@ -63,20 +118,12 @@ class Requester:
         :raises: MimeTypeError if response MIME type doesn't match mime_types param
         """
         response = self.session.request(
-            method, str(url), timeout=(2, 15), allow_redirects=follow_redirects
+            method, str(url), headers=headers, timeout=(2, 15), allow_redirects=follow_redirects
         )
-
-        if str(response.status_code).startswith("4"):
-            raise ClientError(f"{response.status_code} {response.reason}")
-
-        if str(response.status_code).startswith("5"):
-            raise ServerError(f"{response.status_code} {response.reason}")
-
-        for mime_type in mime_types:
-            if mime_type.lower() in response.headers["Content-Type"].lower():
-                return response
-
-        raise WrongMIMEType(f"{response.headers['Content-Type']} not in {mime_types}")
+        if self.recorder is not None and method == "GET":
+            for resp in response.history + [response]:
+                self.recorder.write_response(resp)
+        return check_response(response, mime_types)
 
     def __call__(
         self,
@@ -84,6 +131,7 @@ class Requester:
         mime_types: Iterable = ("text/html",),
         check_head_first: bool = True,
         follow_redirects: bool = True,
+        headers: dict = None,
     ) -> requests.Response:
         """
         wrapper around self.request that allows the class to be callable
@@ -93,6 +141,8 @@ class Requester:
         :param mime_types: (Iterable) acceptable mime types for response, defaults to "text/html"
         :param check_head_first: (bool) whether make a HEAD HTTP request before GET to see if mime type is acceptable
         :param follow_redirects (bool) whether or not to follow redirects
+        :param headers: (dict) any headers to send as well as the session's
+                        (e.g. If-None-Match, when a 304 is returned as is)
         :return: (str) the text
 
         :raises: ClientError if 4xx from response
@@ -100,6 +150,182 @@ class Requester:
         :raises: MimeTypeError if response MIME type doesn't match mime_types param
         """
         if check_head_first:
-            self.request("HEAD", url, mime_types, follow_redirects=follow_redirects)
+            self.request("HEAD", url, mime_types, follow_redirects, headers)
+
+        return self.request("GET", url, mime_types, follow_redirects, headers)
+
+
+class AsyncResponse:
+    """the parts of a HTTP response the crawler needs, mirroring requests.Response"""
+
+    __slots__ = "url", "status_code", "reason", "headers", "content", "history"
+
+    def __init__(self, url: str, status_code: int, reason: str, headers, content: bytes):
+        self.url = url
+        self.status_code = status_code
+        self.reason = reason
+        self.headers = headers
+        self.content = content
+        # the redirect responses followed to get this one, first to last
+        self.history = []
+
+    @property
+    def encoding(self) -> str:
+        """charset from the Content-Type header, defaults to utf-8"""
+        for param in self.headers.get("Content-Type", "").split(";")[1:]:
+            key, _, value = param.strip().partition("=")
+            if key.lower() == "charset" and value:
+                return value.strip("\"'")
+        return "utf-8"
+
+    @property
+    def text(self) -> str:
+        try:
+            return self.content.decode(self.encoding, errors="replace")
+        except LookupError:
+            return self.content.decode("utf-8", errors="replace")
+
+
+class AsyncRequester:
+    """
+    asyncio counterpart of Requester built on asyncio streams so that thousands
+    of requests can be in flight on one event loop (one connection per request)
+    """
+
+    def __init__(
+        self,
+        user_agent: str = None,
+        headers: dict = None,
+        timeout: Tuple[float, float] = (2, 15),
+        max_redirects: int = 30,
+    ):
+        self.user_agent = user_agent
+        self.headers = dict(headers or {})
+        self.timeout = timeout
+        self.max_redirects = max_redirects
+        self._ssl_context = ssl.create_default_context()
+
+        if user_agent is not None:
+            self.headers["User-Agent"] = self.user_agent
+
+    async def _exchange(self, method: str, url: str, headers: dict = None) -> AsyncResponse:
+        """send a single HTTP/1.1 request and read the response (no redirects)"""
+        split = urllib.parse.urlsplit(url)
+        scheme, netloc, path, query, _ = split
+        if scheme not in ("http", "https"):
+            raise BadResponse(f"unsupported scheme {scheme!r}")
+
+        host, port = split.hostname, split.port or (443 if scheme == "https" else 80)
+        target = (path or "/") + (f"?{query}" if query else "")
+
+        connect_timeout, read_timeout = self.timeout
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(
+                host, port, ssl=self._ssl_context if scheme == "https" else None
+            ),
+            timeout=connect_timeout,
+        )
+        try:
+            headers = {
+                "Host": netloc.rpartition("@")[2],
+                "Accept-Encoding": "identity",
+                "Connection": "close",
+                **self.headers,
+                **(headers or {}),
+            }
+            lines = [f"{method} {target} HTTP/1.1"] + [f"{k}: {v}" for k, v in headers.items()]
+            writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+            await writer.drain()
+            return await asyncio.wait_for(self._read_response(method, url, reader), read_timeout)
+        # a body cut short (IncompleteReadError is an EOFError) or a bad status line or chunk size
+        except (asyncio.IncompleteReadError, ValueError) as exc:
+            raise BadResponse(f"{exc.__class__.__name__}: {exc}") from exc
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _read_response(method: str, url: str, reader: asyncio.StreamReader) -> AsyncResponse:
+        """read status line, headers and body (content-length, chunked or until close)"""
+        status_line = (await reader.readline()).decode("latin-1").rstrip("\r\n")
+        _, status_code, reason = (status_line.split(" ", 2) + [""])[:3]
+        status_code = int(status_code)
+
+        headers = CaseInsensitiveDict()
+        while True:
+            line = (await reader.readline()).decode("latin-1").rstrip("\r\n")
+            if not line:
+                break
+            key, _, value = line.partition(":")
+            headers[key.strip()] = value.strip()
+
+        if method == "HEAD" or status_code in (204, 304) or 100 <= status_code < 200:
+            content = b""
+        elif "chunked" in headers.get("Transfer-Encoding", "").lower():
+            chunks = []
+            while True:
+                size = int((await reader.readline()).split(b";")[0].strip() or b"0", 16)
+                if size == 0:
+                    break
+                chunks.append(await reader.readexactly(size))
+                await reader.readline()
+            content = b"".join(chunks)
+        elif "Content-Length" in headers:
+            content = await reader.readexactly(int(headers["Content-Length"]))
+        else:
+            content = await reader.read()
+
+        return AsyncResponse(url, status_code, reason, headers, content)
+
+    async def request(
+        self,
+        method: str,
+        url: Hyperlink,
+        mime_types: Iterable,
+        follow_redirects: bool = True,
+        headers: dict = None,
+    ) -> AsyncResponse:
+        """
+        async version of Requester.request
+
+        :param method: (str) GET, HEAD, etc (any HTTP method)
+        :param url: (Hyperlink) a link to ping
+        :param mime_types: (Iterable) a selection of mime-types that are acceptable
+        :param follow_redirects (bool) whether or not to follow redirects
+        :param headers: (dict) any headers to send as well as the requester's
+        :return: (AsyncResponse) the response
+
+        :raises: ClientError if 4xx from response
+        :raises: ServerError if 5xx from response
+        :raises: MimeTypeError if response MIME type doesn't match mime_types param
+        :raises: BadResponse if a response is cut short or isn't HTTP, or redirects to a non HTTP url
+        """
+        url = str(url)
+        response = await self._exchange(method, url, headers)
+        history = []
+
+        for _ in range(self.max_redirects):
+            if not follow_redirects or response.status_code not in REDIRECT_STATUS_CODES:
+                break
+            if "Location" not in response.headers:
+                break
+            url = urllib.parse.urljoin(url, response.headers["Location"])
+            method = "GET" if response.status_code == 303 and method != "HEAD" else method
+            history.append(response)
+            response = await self._exchange(method, url, headers)
+
+        response.history = history
+        return check_response(response, mime_types)
+
+    async def __call__(
+        self,
+        url: Hyperlink,
+        mime_types: Iterable = ("text/html",),
+        check_head_first: bool = True,
+        follow_redirects: bool = True,
+        headers: dict = None,
+    ) -> AsyncResponse:
+        """async version of Requester.__call__"""
+        if check_head_first:
+            await self.request("HEAD", url, mime_types, follow_redirects, headers)
 
-        return self.request("GET", url, mime_types, follow_redirects=follow_redirects)
+        return await self.request("GET", url, mime_types, follow_redirects, headers)
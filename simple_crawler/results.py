@@ -0,0 +1,66 @@
+"""
+module for the records of crawled urls, streamed as a crawl goes by Crawler.iter_crawl
+
+why?
+    Crawler.crawl only returns once every url is crawled, so anything using
+    the results waits for the whole crawl and then holds all of them at once,
+    iter_crawl hands over each url's result as soon as it is crawled through a
+    bounded buffer, so when the consumer falls behind the crawl waits for it
+"""
+import queue
+from typing import NamedTuple
+from typing import Union
+
+DEFAULT_BUFFER_SIZE = 100
+
+
+class CrawlResult(NamedTuple):
+    """
+    the result of crawling a url
+
+    :param url: (str) the url crawled
+    :param status: (int) HTTP status code, None if there was no response
+    :param content_type: (str) Content-Type of the response, None if there was no response
+    :param depth: (int) number of links followed from the url the crawl started from
+    :param elapsed: (float) seconds taken to fetch and parse the url
+    :param error: (str) why the url wasn't crawled, None if it was
+    :param size: (int) bytes of the response body
+    :param new_links: (int) number of urls found on the url that weren't seen before
+    :param redirect: (str) the url the url redirected to, None if it didn't redirect
+    """
+
+    url: str
+    status: Union[int, None]
+    content_type: Union[str, None]
+    depth: int
+    elapsed: float
+    error: Union[str, None] = None
+    size: int = 0
+    new_links: int = 0
+    redirect: Union[str, None] = None
+
+    @property
+    def ok(self) -> bool:
+        """check if url was crawled (and so is one of the found urls)"""
+        return self.error is None
+
+
+class NoResults:
+    """a buffer of results that keeps nothing (used for when results aren't streamed)"""
+
+    def put(self, result: CrawlResult) -> None:
+        pass
+
+    def full(self) -> bool:
+        return False
+
+
+class ResultBuffer(queue.Queue):
+    """
+    a bounded buffer of results, put blocks while it is full
+
+    :param maxsize: (int) max number of results waiting to be taken
+    """
+
+    def __init__(self, maxsize: int = DEFAULT_BUFFER_SIZE):
+        super().__init__(maxsize=maxsize)
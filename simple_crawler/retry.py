@@ -0,0 +1,170 @@
+"""
+module for retrying urls that failed with a transient error, and for keeping count of errors
+
+why?
+    a 429 Too Many Requests or a 503 Service Unavailable (or a dropped
+    connection) from a busy server says nothing about the url, dropping the
+    url loses the page and everything only linked from it, here:
+    * RetryPolicy gives how long to wait before trying a url again, backing off
+      exponentially with jitter (so retries of many urls don't arrive together)
+      and honouring Retry-After, None once a url has had its retries
+    * the url waits in the frontier (see Frontier.retry) rather than in a
+      worker, so other urls are crawled meanwhile
+    * ErrorLog keeps the errors of each url and counts them per host
+"""
+import random
+import threading
+import time
+from collections import Counter
+from email.utils import parsedate_to_datetime
+from typing import Dict
+from typing import List
+from typing import Tuple
+from typing import Union
+
+from simple_crawler.hyperlink import Hyperlink
+
+# status codes that say the server is busy or briefly down, not that the url is bad
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+DEFAULT_MAX_RETRIES = 0
+DEFAULT_BACKOFF = 0.5
+DEFAULT_MAX_BACKOFF = 60.0
+
+
+def parse_retry_after(value: Union[str, None], now: float = None) -> Union[float, None]:
+    """
+    the seconds to wait given by a Retry-After header (seconds or a HTTP date), None if invalid
+
+    >>> parse_retry_after('120')
+    120.0
+    >>> parse_retry_after('Wed, 21 Oct 2015 07:28:00 GMT', now=1445412470.0)
+    10.0
+    >>> parse_retry_after('Wed, 21 Oct 2015 07:28:00 GMT', now=1445412490.0)
+    0.0
+    >>> parse_retry_after('soon') is None
+    True
+    """
+    if value is None:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        date = parsedate_to_datetime(value)
+    except (TypeError, ValueError, IndexError):
+        return None
+    if date is None:
+        return None
+    now = time.time() if now is None else now
+    return max(0.0, date.timestamp() - now)
+
+
+class RetryPolicy:
+    """
+    when (and if) to try a url that failed again
+
+    the n-th retry waits a random time between half and all of
+    backoff * 2 ** (n - 1) (at most max_backoff), or as long as Retry-After
+    says if that is longer, a url whose Retry-After is longer than max_backoff
+    isn't retried
+
+    :param max_retries: (int) max number of times to try a url again, 0 to never retry
+    :param backoff: (float) seconds to wait before the first retry (before jitter)
+    :param max_backoff: (float) max seconds to wait before any retry
+    :param status_codes: (tuple) the status codes that are retried (connection errors always are)
+    :param rng: (random.Random) source of jitter
+    """
+
+    def __init__(
+        self,
+        max_retries: int = DEFAULT_MAX_RETRIES,
+        backoff: float = DEFAULT_BACKOFF,
+        max_backoff: float = DEFAULT_MAX_BACKOFF,
+        status_codes: Tuple[int, ...] = RETRY_STATUS_CODES,
+        rng: random.Random = None,
+    ):
+        if max_retries < 0:
+            raise ValueError("max_retries can't be negative")
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.status_codes = status_codes
+        self._rng = rng or random.Random()
+        self._lock = threading.Lock()
+
+    def backoff_for(self, retry: int) -> float:
+        """
+        the seconds to wait before the retry-th retry (from 1), with jitter
+
+        >>> policy = RetryPolicy(backoff=1, max_backoff=4, rng=random.Random(0))
+        >>> [1 <= policy.backoff_for(2) <= 2, 2 <= policy.backoff_for(5) <= 4]
+        [True, True]
+        """
+        delay = min(self.max_backoff, self.backoff * 2 ** (retry - 1))
+        with self._lock:
+            return self._rng.uniform(delay / 2, delay)
+
+    def delay(
+        self, attempts: int, status: Union[int, None], retry_after: Union[str, None] = None
+    ) -> Union[float, None]:
+        """
+        seconds to wait before trying a url again, None if it isn't to be tried again
+
+        :param attempts: (int) number of times the url was tried so far
+        :param status: (int) status code of the last try, None if there was no response
+        :param retry_after: (str) Retry-After header of the last try, if it had one
+        """
+        if attempts > self.max_retries:
+            return None
+        if status is not None and status not in self.status_codes:
+            return None
+
+        delay = self.backoff_for(attempts)
+        wait = parse_retry_after(retry_after)
+        if wait is not None:
+            if wait > self.max_backoff:
+                return None
+            delay = max(delay, wait)
+        return delay
+
+
+class ErrorLog:
+    """
+    thread safe record of the errors of each url of a crawl, and counts of them per host
+
+    an error is the status code of a response (e.g. 503) or, with no response,
+    the name of the exception (e.g. "ConnectionError")
+    """
+
+    def __init__(self):
+        self._errors: Dict[Hyperlink, List[Union[int, str]]] = {}
+        self._hosts: Dict[str, Counter] = {}
+        self._lock = threading.Lock()
+
+    def record(self, url: Hyperlink, error: Union[int, str]) -> int:
+        """record an error of url, the number of errors of url so far"""
+        with self._lock:
+            errors = self._errors.setdefault(url, [])
+            errors.append(error)
+            self._hosts.setdefault(url.authority, Counter())[error] += 1
+            return len(errors)
+
+    def errors_of(self, url: Hyperlink) -> List[Union[int, str]]:
+        """the errors of url, in order"""
+        with self._lock:
+            return list(self._errors.get(url, []))
+
+    def by_host(self) -> Dict[str, Dict[Union[int, str], int]]:
+        """the number of each error per host"""
+        with self._lock:
+            return {host: dict(counts) for host, counts in self._hosts.items()}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._errors.clear()
+            self._hosts.clear()
+
+    def __len__(self) -> int:
+        """number of errors of every url"""
+        with self._lock:
+            return sum(len(errors) for errors in self._errors.values())
@@ -0,0 +1,267 @@
+"""
+module for robots.txt rules and caching them per host
+
+why?
+    urllib.robotparser checks every rule of a group in turn on every call to
+    can_fetch and only supports plain path prefixes, here the rules of each
+    group are compiled into a single regex (with support for * and $ wildcards)
+    ordered so that the first alternative to match is the most specific rule
+
+    a crawl can touch many hosts, so robots.txt is fetched lazily the first time
+    a host is seen and kept for a while (ttl) in a bounded cache
+"""
+import re
+import threading
+import time
+import urllib.parse
+from collections import OrderedDict
+from typing import Callable
+from typing import List
+from typing import Tuple
+from typing import Union
+from urllib.robotparser import RequestRate
+
+from simple_crawler.hyperlink import Hyperlink
+
+DEFAULT_TTL = 24 * 60 * 60
+DEFAULT_MAX_SIZE = 1024
+
+# characters that don't need to be quoted when normalising paths and rules
+SAFE_PATH_CHARS = "/*$?=&;:@+,!~'()%"
+
+
+def normalise_robots_path(path: str) -> str:
+    """
+    normalise percent encoding of a path (or rule) so they can be compared
+
+    >>> normalise_robots_path('/hello world')
+    '/hello%20world'
+    >>> normalise_robots_path('/hello%20world')
+    '/hello%20world'
+    >>> normalise_robots_path('/*.php$')
+    '/*.php$'
+    """
+    return urllib.parse.quote(urllib.parse.unquote(path), safe=SAFE_PATH_CHARS)
+
+
+def compile_rule(rule: str) -> str:
+    """
+    compile a robots.txt path rule into a regex pattern (matched from the start of a path)
+
+    >>> compile_rule('/hello')
+    '/hello'
+    >>> compile_rule('/*.php$')
+    '/.*\\\\.php\\\\Z'
+    """
+    rule = normalise_robots_path(rule)
+    end = rule.endswith("$")
+    if end:
+        rule = rule[:-1]
+    pattern = ".*".join(re.escape(part) for part in rule.split("*"))
+    return pattern + ("\\Z" if end else "")
+
+
+class RobotsGroup:
+    """a group of robots.txt rules for one or more user agents"""
+
+    def __init__(self, agents: List[str]):
+        self.agents = agents
+        self.rules: List[Tuple[bool, str]] = []
+        self.delay: Union[float, None] = None
+        self.req_rate: Union[RequestRate, None] = None
+        self._regex = None
+        self._allowances: List[bool] = []
+
+    def compile(self) -> None:
+        """compile every rule into one regex, most specific (longest) rules first, allow wins ties"""
+        rules = sorted(self.rules, key=lambda rule: (len(rule[1]), rule[0]), reverse=True)
+        self._allowances = [allow for allow, _ in rules]
+        if rules:
+            self._regex = re.compile("|".join(f"({compile_rule(path)})" for _, path in rules))
+
+    def applies_to(self, useragent: str) -> bool:
+        """same agent matching as urllib.robotparser"""
+        useragent = useragent.split("/")[0].lower()
+        return any(agent != "*" and agent.lower() in useragent for agent in self.agents)
+
+    def allowance(self, path: str) -> bool:
+        if self._regex is None:
+            return True
+        match = self._regex.match(path)
+        if match is None:
+            return True
+        return self._allowances[match.lastindex - 1]
+
+
+class RobotsRules:
+    """
+    parsed robots.txt, with the same query methods as urllib.robotparser.RobotFileParser
+
+    :param text: (str) the robots.txt
+    """
+
+    def __init__(self, text: str = ""):
+        self.groups: List[RobotsGroup] = []
+        self.default_group: Union[RobotsGroup, None] = None
+        self.parse(text.splitlines())
+
+    def parse(self, lines: List[str]) -> None:
+        group = None
+        # user-agent lines that follow each other belong to the same group
+        collecting_agents = False
+        for line in lines:
+            line = line.split("#", 1)[0].strip()
+            key, sep, value = line.partition(":")
+            if not sep:
+                continue
+            key, value = key.strip().lower(), value.strip()
+
+            if key == "user-agent":
+                if not collecting_agents:
+                    group = RobotsGroup([])
+                    self.groups.append(group)
+                    collecting_agents = True
+                group.agents.append(value)
+                continue
+
+            collecting_agents = False
+            if group is None:
+                continue
+
+            if key in ("allow", "disallow") and value:
+                group.rules.append((key == "allow", value))
+            elif key == "crawl-delay":
+                try:
+                    group.delay = float(value)
+                except ValueError:
+                    pass
+            elif key == "request-rate":
+                requests, _, seconds = value.partition("/")
+                try:
+                    group.req_rate = RequestRate(int(requests), int(seconds))
+                except ValueError:
+                    pass
+
+        for group in self.groups:
+            group.compile()
+            if "*" in group.agents and self.default_group is None:
+                self.default_group = group
+
+    def _group(self, useragent: str) -> Union[RobotsGroup, None]:
+        for group in self.groups:
+            if group.applies_to(useragent):
+                return group
+        return self.default_group
+
+    def can_fetch(self, useragent: str, url: str) -> bool:
+        """check if useragent may fetch url (or path)"""
+        _, _, path, query, _ = urllib.parse.urlsplit(str(url))
+        path = normalise_robots_path((path or "/") + (f"?{query}" if query else ""))
+        if path == "/robots.txt":
+            return True
+
+        group = self._group(useragent)
+        return True if group is None else group.allowance(path)
+
+    def crawl_delay(self, useragent: str) -> Union[float, None]:
+        group = self._group(useragent)
+        return None if group is None else group.delay
+
+    def request_rate(self, useragent: str) -> Union[RequestRate, None]:
+        group = self._group(useragent)
+        return None if group is None else group.req_rate
+
+
+class RobotsCache:
+    """
+    thread safe cache of RobotsRules per scheme and authority
+
+    * rules of a host are fetched the first time the host is seen
+    * hosts are fetched concurrently but each host is only fetched once at a time
+    * entries expire after ttl seconds and the least recently used are evicted
+      when there are more than max_size
+
+    :param fetch: (Callable) gets the robots.txt text from the url of a robots.txt
+    :param ttl: (float) seconds before rules are fetched again
+    :param max_size: (int) max number of hosts to cache rules for
+    :param on_load: (Callable) called with the url and the rules each time rules are loaded
+    """
+
+    def __init__(
+        self,
+        fetch: Callable[[Hyperlink], str],
+        ttl: float = DEFAULT_TTL,
+        max_size: int = DEFAULT_MAX_SIZE,
+        on_load: Callable[[Hyperlink, RobotsRules], None] = None,
+    ):
+        self.fetch = fetch
+        self.ttl = ttl
+        self.max_size = max_size
+        self.on_load = on_load
+        self._entries = OrderedDict()
+        self._fetching = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(url: Hyperlink) -> str:
+        return f"{url.scheme}://{url.authority}"
+
+    def _lookup(self, key: str) -> Union[RobotsRules, None]:
+        """get rules if cached and not expired (must hold the lock)"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires, rules = entry
+        if expires <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return rules
+
+    def put(self, url: Hyperlink, rules: RobotsRules) -> None:
+        """cache rules for the host of url"""
+        with self._lock:
+            key = self.key(url)
+            self._entries[key] = (time.monotonic() + self.ttl, rules)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+        if self.on_load is not None:
+            self.on_load(url, rules)
+
+    def get(self, url: Hyperlink) -> RobotsRules:
+        """get the rules for the host of url, fetching them if needed"""
+        key = self.key(url)
+        while True:
+            with self._lock:
+                rules = self._lookup(key)
+                if rules is not None:
+                    return rules
+
+                event = self._fetching.get(key)
+                if event is None:
+                    event = self._fetching[key] = threading.Event()
+                    break
+
+            # another thread is fetching this host, wait for it then look again
+            event.wait()
+
+        try:
+            robots_url = url.domain.with_path("robots.txt")
+            rules = RobotsRules(self.fetch(robots_url))
+            self.put(url, rules)
+            return rules
+        finally:
+            with self._lock:
+                del self._fetching[key]
+            event.set()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def __contains__(self, url: Hyperlink) -> bool:
+        """check if rules for the host of url are cached and not expired"""
+        with self._lock:
+            return self._lookup(self.key(url)) is not None
@@ -0,0 +1,363 @@
+"""
+module for crawling with several processes on one machine, each owning a shard of the urls
+
+why?
+    a Crawler is one process, so normalising urls and parsing html (pure
+    python) is capped by one GIL however many workers it has, here N crawler
+    processes each own the urls whose hash (of the url or of its host) falls
+    in their shard:
+    * a process crawls only its own urls, links it finds that belong to
+      another shard are sent to that shard's inbox (a multiprocessing.Queue)
+    * a shared count of urls queued, in flight or in an inbox anywhere tells
+      every process when the crawl as a whole is finished
+    * results of every process are merged into one stream (or set) at the end
+"""
+import multiprocessing
+import queue
+import threading
+import time
+import zlib
+from typing import Iterator
+from typing import Set
+from typing import Union
+
+from simple_crawler.budget import FINISHED
+from simple_crawler.budget import STOPPED
+from simple_crawler.budget import TIMED_OUT
+from simple_crawler.crawler import Crawler
+from simple_crawler.hyperlink import Hyperlink
+from simple_crawler.hyperlink import make_hyperlink
+from simple_crawler.results import CrawlResult
+from simple_crawler.results import DEFAULT_BUFFER_SIZE
+from simple_crawler.retry import ErrorLog
+
+SHARD_BY_URL = "url"
+SHARD_BY_HOST = "host"
+SHARD_BY = (SHARD_BY_URL, SHARD_BY_HOST)
+
+# seconds a shard with nothing queued waits for its inbox before checking if the crawl is done
+POLL_INTERVAL = 0.05
+
+
+def shard_of(url: Hyperlink, shards: int, by: str = SHARD_BY_URL) -> int:
+    """
+    the shard that owns a url, the same in every process (unlike hash())
+
+    >>> shard_of(make_hyperlink('https://www.example.com/hello'), 1)
+    0
+    >>> a = shard_of(make_hyperlink('https://www.example.com/a'), 8, by='host')
+    >>> a == shard_of(make_hyperlink('https://www.example.com/b'), 8, by='host')
+    True
+    """
+    key = url.authority if by == SHARD_BY_HOST else str(url)
+    return zlib.crc32(key.encode("utf-8")) % shards
+
+
+class SharedCounter:
+    """an integer shared between processes"""
+
+    def __init__(self, context):
+        self._value = context.Value("q", 0)
+
+    def add(self, n: int) -> None:
+        with self._value.get_lock():
+            self._value.value += n
+
+    @property
+    def value(self) -> int:
+        return self._value.value
+
+
+class ShardCrawler(Crawler):
+    """
+    the Crawler run by each process of a ShardedCrawler, it crawls only the urls of its shard
+
+    :param shard: (int) the shard this process owns
+    :param shards: (int) the number of shards (processes)
+    :param shard_by: (str) "url" or "host", what urls are hashed by
+    :param inboxes: (list) a multiprocessing.Queue of (url, depth) per shard
+    :param pending: (SharedCounter) urls queued, in flight or in an inbox in any shard
+    :param progress: (SharedCounter) urls finished in any shard
+    :param stop: (multiprocessing.Event) set to stop every shard
+    """
+
+    def __init__(
+        self,
+        shard: int,
+        shards: int,
+        shard_by: str,
+        inboxes: list,
+        pending: SharedCounter,
+        progress: SharedCounter,
+        stop,
+        **kwargs,
+    ):
+        # with urls of a host in every shard, each shard takes its share of the host's capacity
+        if shard_by == SHARD_BY_URL and kwargs.get("max_per_host") is not None:
+            kwargs["max_per_host"] = -(-kwargs["max_per_host"] // shards)
+        super().__init__(**kwargs)
+        self.shard = shard
+        self.shards = shards
+        self.shard_by = shard_by
+        self._inboxes = inboxes
+        self._pending = pending
+        self._progress = progress
+        self._global_stop = stop
+        self._received = threading.Event()
+
+    def _add_url(self, url: Hyperlink, depth: int = 0) -> bool:
+        """add a url of this shard, or send it to the shard that owns it"""
+        owner = shard_of(url, self.shards, self.shard_by)
+        if owner == self.shard:
+            return super()._add_url(url, depth)
+
+        # the seen urls of a shard are its own urls and the urls it sent, so
+        # a url is only sent to its owner once by each shard
+        if self._budget.allows_depth(depth) and self._seen_urls.add_if_absent(url):
+            self._pending.add(1)
+            self._inboxes[owner].put((str(url), depth))
+            return True
+        return False
+
+    def _enqueue(self, url: Hyperlink, depth: int = 0) -> bool:
+        """put url on the queue if robots.txt allows it, counting it as pending in every shard"""
+        if not self._can_crawl(url):
+            return False
+        # count before putting, so pending can't reach 0 while url is crawled
+        self._pending.add(1)
+        self._queue.put(url, depth)
+        return True
+
+    def _finish(self, url: Hyperlink) -> None:
+        super()._finish(url)
+        self._progress.add(1)
+        self._pending.add(-1)
+
+    def _receive(self) -> None:
+        """add urls sent by other shards until None is received"""
+        inbox = self._inboxes[self.shard]
+        while True:
+            item = inbox.get()
+            if item is None:
+                return
+            url, depth = item
+            super()._add_url(make_hyperlink(url), depth)
+            self._pending.add(-1)
+            self._received.set()
+
+    def _set_host_delay(self, url: Hyperlink, robots) -> None:
+        """with urls of a host in every shard, each shard waits shards times as long"""
+        super()._set_host_delay(url, robots)
+        if self.shard_by == SHARD_BY_URL:
+            host = self._queue.host(url)
+            self._queue.set_delay(host, self._queue.delay(host) * self.shards)
+
+    def _stop_reason(self) -> Union[str, None]:
+        if self._global_stop.is_set():
+            return STOPPED
+        return super()._stop_reason()
+
+    def _next_url(self) -> Union[Hyperlink, None]:
+        """
+        wait for a url to be eligible, None once no shard has any url pending or
+        if no shard finished a url within timeout
+        """
+        last_progress, last_time = self._progress.value, time.monotonic()
+        while True:
+            self._received.clear()
+            url = self._queue.get(timeout=self._budget.wait_timeout(POLL_INTERVAL))
+            if url is not None or self._pending.value == 0 or self._stop_reason() is not None:
+                return url
+
+            now = time.monotonic()
+            if self._progress.value != last_progress:
+                last_progress, last_time = self._progress.value, now
+            elif now - last_time >= self.timeout and not self._results.full():
+                return None
+
+            # nothing queued here, wait for another shard to send a url
+            if self._queue.outstanding == 0:
+                self._received.wait(POLL_INTERVAL)
+
+    def _end_reason(self) -> str:
+        if self._pending.value == 0:
+            return self._budget.finished_reason()
+        return TIMED_OUT
+
+    def crawl_shard(self) -> None:
+        """crawl this shard's urls (the url to start from is sent to the inbox of its shard)"""
+        receiver = threading.Thread(target=self._receive, daemon=True)
+        receiver.start()
+        try:
+            self._budget.start()
+            with self._events:
+                self._dispatch()
+        finally:
+            self._inboxes[self.shard].put(None)
+            receiver.join()
+
+        # a budget used up in one shard stops every shard
+        if self.stop_reason not in (FINISHED, TIMED_OUT, STOPPED):
+            self._global_stop.set()
+
+
+def run_shard(shard: int, results, reasons, shard_kwargs: dict, config: dict):
+    """the target of each process of a ShardedCrawler"""
+    crawler = ShardCrawler(shard=shard, **shard_kwargs, **config)
+    crawler._results = results
+    try:
+        crawler.crawl_shard()
+    finally:
+        reasons.put((shard, crawler.stop_reason))
+        # None marks the end of this shard's results
+        results.put(None)
+
+
+class ShardedCrawler:
+    """
+    crawls with several processes, each crawling the urls of its own shard
+
+    How to use?
+        * crawler = ShardedCrawler(processes=4, max_workers=8)
+        * found_urls = crawler.crawl(some_url)
+        * or: for result in crawler.iter_crawl(some_url): ...
+
+    :param processes: (int) number of crawler processes (shards)
+    :param shard_by: (str) "url" to spread the urls of each host over every
+                     process (each process then waits processes times any
+                     Crawl-delay of a host, so a host sees the same rate) or
+                     "host" to keep each host in one process
+    :param kwargs: the params of each process's Crawler (except session),
+                   budgets apply to each process and one used up stops them all
+    """
+
+    def __init__(self, processes: int = 2, shard_by: str = SHARD_BY_URL, **kwargs):
+        if processes < 1:
+            raise ValueError("processes must be at least 1")
+        if shard_by not in SHARD_BY:
+            raise ValueError(f"shard_by must be one of {SHARD_BY}")
+        if kwargs.get("state_dir") is not None:
+            raise ValueError("a sharded crawl can't keep state in a state_dir")
+        if kwargs.get("warc_out") is not None:
+            raise ValueError("a sharded crawl can't record to a WARC file")
+        if kwargs.get("validators_dir") is not None:
+            raise ValueError("a sharded crawl can't keep validators in a validators_dir")
+        if kwargs.get("metrics_port") is not None:
+            raise ValueError("a sharded crawl can't serve metrics on one port")
+        if kwargs.get("events_jsonl") is not None:
+            raise ValueError("a sharded crawl can't write events to a JSON lines file")
+        if kwargs.get("profile_dir") is not None:
+            raise ValueError("a sharded crawl can't profile to one profile_dir")
+
+        self.processes = processes
+        self.shard_by = shard_by
+        self._crawler = Crawler(**kwargs)
+        self.stop_reason = None
+        # the errors urls were given up on with (retries happen in each process, unseen here)
+        self.errors = ErrorLog()
+
+    @property
+    def config(self) -> dict:
+        rv = dict(self._crawler.config)
+        rv["processes"] = self.processes
+        rv["shard_by"] = self.shard_by
+        return rv
+
+    def iter_crawl(
+        self, domain: str, resume: bool = False, buffer_size: int = DEFAULT_BUFFER_SIZE
+    ) -> Iterator[CrawlResult]:
+        """
+        crawl any site, yielding the result of each url as soon as any process crawls it
+
+        :param domain: (str) url to start crawling from
+        :param resume: (bool) not supported by a sharded crawl
+        :param buffer_size: (int) max number of results waiting to be taken
+        :return: (Iterator) of CrawlResult, one for each url crawled
+        """
+        if resume:
+            raise ValueError("a sharded crawl can't be resumed")
+        self.errors.clear()
+
+        context = multiprocessing.get_context()
+        results = context.Queue(buffer_size)
+        reasons = context.Queue()
+        stop = context.Event()
+        shard_kwargs = {
+            "shards": self.processes,
+            "shard_by": self.shard_by,
+            "inboxes": [context.Queue() for _ in range(self.processes)],
+            "pending": SharedCounter(context),
+            "progress": SharedCounter(context),
+            "stop": stop,
+        }
+        # send the url to start from to its shard, counted as pending so
+        # no shard finishes before it is received
+        seed = make_hyperlink(domain)
+        shard_kwargs["pending"].add(1)
+        shard_kwargs["inboxes"][shard_of(seed, self.processes, self.shard_by)].put((str(seed), 0))
+
+        config = dict(self._crawler.config)
+        processes = [
+            context.Process(target=run_shard, args=(shard, results, reasons, shard_kwargs, config))
+            for shard in range(self.processes)
+        ]
+        for process in processes:
+            process.start()
+
+        try:
+            running = len(processes)
+            while running:
+                try:
+                    result = results.get(timeout=POLL_INTERVAL)
+                except queue.Empty:
+                    # a process that died can't mark the end of its results
+                    if not any(process.is_alive() for process in processes):
+                        break
+                    continue
+
+                if result is None:
+                    running -= 1
+                    continue
+                if not result.ok:
+                    error = result.status or "RequestException"
+                    self.errors.record(make_hyperlink(result.url), error)
+                yield result
+
+        finally:
+            stop.set()
+            # keep taking results so processes waiting on a full buffer can finish
+            while any(process.is_alive() for process in processes):
+                try:
+                    results.get(timeout=POLL_INTERVAL)
+                except queue.Empty:
+                    pass
+            for process in processes:
+                process.join()
+            self.stop_reason = self._merge_reasons(reasons, len(processes))
+
+    @staticmethod
+    def _merge_reasons(reasons, processes: int) -> Union[str, None]:
+        """why the crawl stopped: a budget any process used up, else why the processes stopped"""
+        merged = []
+        for _ in range(processes):
+            try:
+                merged.append(reasons.get(timeout=1)[1])
+            except queue.Empty:
+                merged.append(None)
+
+        for reason in merged:
+            if reason not in (FINISHED, TIMED_OUT, STOPPED, None):
+                return reason
+        for reason in (None, TIMED_OUT, STOPPED):
+            if reason in merged:
+                return reason
+        return FINISHED
+
+    def crawl(self, domain: str, resume: bool = False) -> Set[str]:
+        """
+        crawl any site for all urls
+
+        :param domain: (str) url to start crawling from
+        :return: (set) of all urls found by every process
+        """
+        return {result.url for result in self.iter_crawl(domain, resume=resume) if result.ok}
@@ -0,0 +1,189 @@
+"""
+module for keeping the state of a crawl on disk (sqlite in WAL mode)
+
+why?
+    a crawl of a large site can take hours and can have more urls waiting to
+    be crawled than fit in memory, with a state store:
+    * every url seen and its status (queued, done or failed) is checkpointed
+      to disk periodically so a crawl that stopped can be resumed from there
+    * urls over a threshold are spilled from the frontier to disk and read
+      back when the frontier runs low
+"""
+import os
+import sqlite3
+import threading
+from typing import List
+from typing import Set
+from typing import Tuple
+
+from simple_crawler.hyperlink import Hyperlink
+
+STATE_FILE = "crawl.sqlite3"
+DEFAULT_CHECKPOINT_INTERVAL = 30.0
+
+QUEUED = 0
+DONE = 1
+FAILED = 2
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS urls (
+    url TEXT PRIMARY KEY, status INTEGER NOT NULL, depth INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS spill (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, url TEXT NOT NULL, depth INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+
+class StateError(Exception):
+    """Base exception for crawl state"""
+
+    pass
+
+
+class NoCrawlState:
+    """a state store that keeps nothing (used for when there is no state_dir)"""
+
+    def start(self, seed: Hyperlink) -> None:
+        pass
+
+    def load(self) -> Tuple[str, Set[str], Set[str], List[Tuple[str, int]]]:
+        raise StateError("there is no crawl state to resume")
+
+    def seen(self, url: Hyperlink, depth: int = 0) -> None:
+        pass
+
+    def finish(self, url: Hyperlink, done: bool) -> None:
+        pass
+
+    def checkpoint(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+class CrawlState(NoCrawlState):
+    """
+    sqlite backed store of a crawl's seen urls, their status and spilled frontier urls
+
+    * status changes are buffered in memory and written on checkpoint, which
+      happens every checkpoint_interval seconds on a background thread and on close
+    * also works as the spill of a Frontier (push & pop_batch)
+
+    :param state_dir: (str) directory to keep the state in, created if needed
+    :param checkpoint_interval: (float) seconds between checkpoints
+    """
+
+    def __init__(self, state_dir: str, checkpoint_interval: float = DEFAULT_CHECKPOINT_INTERVAL):
+        self.state_dir = state_dir
+        self.checkpoint_interval = checkpoint_interval
+
+        os.makedirs(state_dir, exist_ok=True)
+        self._db = sqlite3.connect(
+            os.path.join(state_dir, STATE_FILE), check_same_thread=False, isolation_level=None
+        )
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+
+        self._lock = threading.Lock()
+        self._seen = []
+        self._finished = []
+        self._stop = threading.Event()
+        self._thread = None
+
+    @classmethod
+    def exists(cls, state_dir: str) -> bool:
+        return os.path.exists(os.path.join(state_dir, STATE_FILE))
+
+    def _start_checkpointing(self) -> None:
+        self._thread = threading.Thread(target=self._checkpoint_loop, daemon=True)
+        self._thread.start()
+
+    def _checkpoint_loop(self) -> None:
+        while not self._stop.wait(self.checkpoint_interval):
+            self.checkpoint()
+
+    def start(self, seed: Hyperlink) -> None:
+        """start a new crawl from seed, dropping any state from before"""
+        with self._lock:
+            self._db.execute("BEGIN")
+            self._db.execute("DELETE FROM meta")
+            self._db.execute("DELETE FROM urls")
+            self._db.execute("DELETE FROM spill")
+            self._db.execute("INSERT INTO meta VALUES ('seed', ?)", (str(seed),))
+            self._db.execute("COMMIT")
+        self._start_checkpointing()
+
+    def load(self) -> Tuple[str, Set[str], Set[str], List[Tuple[str, int]]]:
+        """
+        load the state of a crawl to resume it
+
+        :return: (tuple) of the seed url, all urls seen, urls done, and (url, depth)
+                 of urls still to crawl
+        """
+        with self._lock:
+            row = self._db.execute("SELECT value FROM meta WHERE key = 'seed'").fetchone()
+            if row is None:
+                raise StateError(f"there is no crawl state to resume in {self.state_dir}")
+
+            seen, done, pending = set(), set(), []
+            rows = self._db.execute("SELECT url, status, depth FROM urls ORDER BY rowid")
+            for url, status, depth in rows:
+                seen.add(url)
+                if status == DONE:
+                    done.add(url)
+                elif status == QUEUED:
+                    pending.append((url, depth))
+
+            # spilled urls are all in urls as QUEUED so they are in pending
+            self._db.execute("DELETE FROM spill")
+
+        self._start_checkpointing()
+        return row[0], seen, done, pending
+
+    def seen(self, url: Hyperlink, depth: int = 0) -> None:
+        """record a newly seen url (queued to crawl)"""
+        with self._lock:
+            self._seen.append((str(url), QUEUED, depth))
+
+    def finish(self, url: Hyperlink, done: bool) -> None:
+        """record a url as crawled, done if it is a result else failed"""
+        with self._lock:
+            self._finished.append((DONE if done else FAILED, str(url)))
+
+    def checkpoint(self) -> None:
+        """write all buffered status changes to disk in one transaction"""
+        with self._lock:
+            seen, self._seen = self._seen, []
+            finished, self._finished = self._finished, []
+            self._db.execute("BEGIN")
+            self._db.executemany("INSERT OR IGNORE INTO urls VALUES (?, ?, ?)", seen)
+            self._db.executemany("UPDATE urls SET status = ? WHERE url = ?", finished)
+            self._db.execute("COMMIT")
+
+    def push(self, url: Hyperlink, depth: int = 0) -> None:
+        """spill a frontier url to disk"""
+        with self._lock:
+            self._db.execute("INSERT INTO spill (url, depth) VALUES (?, ?)", (str(url), depth))
+
+    def pop_batch(self, size: int) -> List[Tuple[str, int]]:
+        """take up to size of the oldest spilled (url, depth) back off disk"""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT id, url, depth FROM spill ORDER BY id LIMIT ?", (size,)
+            ).fetchall()
+            if rows:
+                self._db.execute("DELETE FROM spill WHERE id <= ?", (rows[-1][0],))
+        return [(url, depth) for _, url, depth in rows]
+
+    def close(self) -> None:
+        """stop checkpointing, write a last checkpoint and close the database"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.checkpoint()
+        with self._lock:
+            self._db.close()
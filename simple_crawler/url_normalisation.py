@@ -12,9 +12,34 @@ why?
     these are the same and although many web devs building hrefs won't be
     make these mistakes, they can be encountered and need to be handled
 
+    the same hrefs (e.g. of a nav or footer) are on every page of a site, so
+    normalise_url keeps the urls it normalised in a bounded LRU cache, and a
+    url that is already normalised (e.g. https://www.example.com/hello) is
+    spotted by a regex and returned as it is
+
 """
 import doctest
+import re
+import threading
 import urllib.parse
+from collections import OrderedDict
+from typing import Callable
+
+DEFAULT_CACHE_SIZE = 1 << 14
+
+# a url (or a path) whose every component is as normalise_url leaves it: a lower
+# case http(s) scheme and host (no userinfo, no dots at the ends) and a path,
+# query & fragment of characters that aren't quoted, the order of the query
+# params and dot segments of a path are checked by is_canonical
+# NB: ~ is left out of the path & query as python < 3.7 quotes it there
+CANONICAL_URL = re.compile(
+    r"(?:https?://[a-z0-9-]+(?:\.[a-z0-9-]+)*(?::[0-9]+)?)?"
+    r"(/[A-Za-z0-9._%/-]*)"
+    r"(?:\?([A-Za-z0-9._:=&-]+))?"
+    r"(?:#[A-Za-z0-9._~:-]+)?\Z"
+)
+
+_MISSING = object()
 
 
 def normalise_scheme(scheme: str) -> str:
@@ -207,26 +232,136 @@ def normalise_fragment(fragment: str) -> str:
     return fragment
 
 
+class LRUCache:
+    """
+    a bounded, thread safe cache of the values of a function of a key (e.g. a
+    url), the least recently used are dropped first
+
+    :param max_size: (int) max number of values kept, 0 to keep none
+    """
+
+    def __init__(self, max_size: int = DEFAULT_CACHE_SIZE):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, compute: Callable):
+        """
+        the value of key, computing it with compute(key) if it isn't cached
+
+        >>> cache = LRUCache(max_size=2)
+        >>> for key in ('a', 'b', 'a', 'c'):
+        ...     _ = cache.get(key, str.upper)
+        >>> list(cache._entries), cache.hits, cache.misses
+        (['a', 'c'], 1, 3)
+        """
+        with self._lock:
+            value = self._entries.get(key, _MISSING)
+            if value is not _MISSING:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+            self.misses += 1
+
+        # computed without the lock, so another thread may compute it too
+        value = compute(key)
+        with self._lock:
+            if self.max_size > 0:
+                self._entries[key] = value
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+        return value
+
+    def clear(self) -> None:
+        """drop every value and reset the counts"""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+    def stats(self) -> dict:
+        """size, max size, hits, misses and the fraction of lookups that were hits"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+
+# the urls normalised by normalise_url
+URL_CACHE = LRUCache()
+
+
+def is_canonical(url: str) -> bool:
+    """
+    check if a url is certainly as normalise_url would leave it (False if not sure)
+
+    >>> is_canonical('https://www.example.com/hello?a=b&c=d#top')
+    True
+    >>> is_canonical('/hello/world')
+    True
+    >>> is_canonical('https://www.example.com')
+    False
+    >>> is_canonical('https://www.example.com/?c=d&a=b')
+    False
+    >>> is_canonical('/hello/../world')
+    False
+    """
+    match = CANONICAL_URL.match(url)
+    if match is None:
+        return False
+
+    path, query = match.groups()
+    # a relative url is joined to / which drops empty and dot segments
+    if not url.startswith("http") and ("//" in path or "/." in path):
+        return False
+    if query is not None:
+        params = query.split("&")
+        return params == sorted(params)
+    return True
+
+
 def normalise_url(url: str) -> str:
+    """
+    normalise any url, from URL_CACHE if it was normalised recently (see _normalise_url)
+
+    >>> normalise_url('HTTPS://www.EXAMPLE.com?b=2&a=1') == _normalise_url('HTTPS://www.EXAMPLE.com?b=2&a=1')
+    True
+    """
+    if is_canonical(url):
+        return url
+    return URL_CACHE.get(url, _normalise_url)
+
+
+def _normalise_url(url: str) -> str:
     """
     normalise any url
 
     :param url: (str) any url to normalise
     :return: (str) normalised url
 
-    >>> normalise_url('')
+    >>> _normalise_url('')
     '/'
-    >>> normalise_url('www.EXAMPLE.com?hello=world')
+    >>> _normalise_url('www.EXAMPLE.com?hello=world')
     '/www.EXAMPLE.com?hello=world'
-    >>> normalise_url('http://www.EXAMPLE.com?hello=world')
+    >>> _normalise_url('http://www.EXAMPLE.com?hello=world')
     'http://www.example.com/?hello=world'
-    >>> normalise_url('http://@example.com#hello')
+    >>> _normalise_url('http://@example.com#hello')
     'http://example.com/#hello'
-    >>> normalise_url('http://hello:@example.com/hello/world?hello=world&world=hello#hi')
+    >>> _normalise_url('http://hello:@example.com/hello/world?hello=world&world=hello#hi')
     'http://hello@example.com/hello/world?hello=world&world=hello#hi'
-    >>> normalise_url("HTTPS://HELLO.WORLD@EXAMPLE.CO.UK/ hi there")
+    >>> _normalise_url("HTTPS://HELLO.WORLD@EXAMPLE.CO.UK/ hi there")
     'https://HELLO.WORLD@example.co.uk/%20hi%20there'
-    >>> normalise_url('?world=hello&hello=world')
+    >>> _normalise_url('?world=hello&hello=world')
     '/?hello=world&world=hello'
     """
     # split is the core element we want to build class around
@@ -242,6 +377,16 @@ def normalise_url(url: str) -> str:
     return urllib.parse.urlunsplit(components)
 
 
+# the normaliser of each component of a url, by name
+NORMALISERS = {
+    "scheme": normalise_scheme,
+    "authority": normalise_authority,
+    "path": normalise_path,
+    "query": normalise_query,
+    "fragment": normalise_fragment,
+}
+
+
 def normalise_kwargs(**kwargs) -> dict:
     """
     simple helper to normalise dict of kwargs (e.g. {'scheme': 'HTTPS', 'query': 'a=b')
@@ -252,15 +397,7 @@ def normalise_kwargs(**kwargs) -> dict:
     >>> normalise_kwargs(scheme="HTTPS", authority="@example.com", fragment='hi')
     {'scheme': 'https', 'authority': 'example.com', 'fragment': 'hi'}
     """
-    # python magic to get above funcs for normalisation
-    # __import__(__name__).url_normalisation get this file
-    # getattr will get any variable in this scope (basically locals())
-    # we find the function f"normalise_{k}" where k is scheme, authority, etc
-    kwargs = {
-        k: getattr(__import__(__name__).url_normalisation, f"normalise_{k}")(v)
-        for k, v in kwargs.items()
-    }
-    return kwargs
+    return {k: NORMALISERS[k](v) for k, v in kwargs.items()}
 
 
 if __name__ == "__main__":
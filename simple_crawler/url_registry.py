@@ -0,0 +1,96 @@
+"""
+module for a thread safe registry of urls (e.g. the seen & done urls of a crawl)
+
+why?
+    many worker threads check if a url has been seen and then add it, if this
+    is done on a plain set then two workers can both find a url unseen and both
+    queue it (check-then-act race), this registry makes that one atomic step
+
+    the urls are spread over many shards each with its own lock (lock striping)
+    so that workers adding different urls rarely wait on each other
+"""
+import threading
+from typing import Iterable
+from typing import Iterator
+
+from simple_crawler.hyperlink import Hyperlink
+from simple_crawler.hyperlink import HyperlinkSet
+
+DEFAULT_SHARDS = 64
+
+
+class URLRegistry:
+    """
+    a lock-striped thread safe set of hyperlinks
+
+    :param links: (Iterable) any hyperlinks to start with
+    :param shards: (int) number of shards (and locks) to spread urls over
+    """
+
+    def __init__(self, links: Iterable = None, shards: int = DEFAULT_SHARDS):
+        if shards < 1:
+            raise ValueError("shards must be at least 1")
+
+        self._shards = [set() for _ in range(shards)]
+        self._locks = [threading.Lock() for _ in range(shards)]
+
+        for link in links or ():
+            self.add(link)
+
+    def _index(self, link: Hyperlink) -> int:
+        """the shard a link belongs to"""
+        return hash(link) % len(self._shards)
+
+    def add_if_absent(self, link: Hyperlink) -> bool:
+        """
+        atomically add link if it isn't already registered
+
+        :param link: (Hyperlink) link to add
+        :return: (bool) True if the link was new, False if it was already registered
+        """
+        if not isinstance(link, Hyperlink):
+            raise TypeError("link must be a Hyperlink")
+
+        index = self._index(link)
+        with self._locks[index]:
+            shard = self._shards[index]
+            if link in shard:
+                return False
+            shard.add(link)
+            return True
+
+    def add(self, link: Hyperlink) -> None:
+        self.add_if_absent(link)
+
+    def __contains__(self, item) -> bool:
+        index = self._index(item)
+        with self._locks[index]:
+            return item in self._shards[index]
+
+    def __len__(self) -> int:
+        return sum(len(shard) for shard in self._shards)
+
+    def __iter__(self) -> Iterator[Hyperlink]:
+        """iterate over a snapshot of each shard"""
+        for index, shard in enumerate(self._shards):
+            with self._locks[index]:
+                links = list(shard)
+            yield from links
+
+    def __eq__(self, other):
+        if isinstance(other, URLRegistry):
+            return set(self) == set(other)
+        if isinstance(other, HyperlinkSet):
+            return set(self) == other.collection
+        return False
+
+    def __repr__(self):
+        return f"URLRegistry({set(self)!r})"
+
+    def is_empty(self) -> bool:
+        """check if registry is empty"""
+        return len(self) == 0
+
+    def is_not_empty(self) -> bool:
+        """check if registry is not empty"""
+        return not self.is_empty()
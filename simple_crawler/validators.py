@@ -0,0 +1,181 @@
+"""
+module for keeping the validators of crawled urls on disk, so a re-crawl only downloads what changed
+
+why?
+    every crawl fetches every page in full, even when a site hasn't changed
+    since the last crawl, here the validators of each url crawled (ETag,
+    Last-Modified, a hash of the content and the hrefs found on it) are kept
+    between crawls (sqlite in WAL mode) so the next crawl can:
+    * send If-None-Match / If-Modified-Since and on a 304 Not Modified reuse
+      the hrefs kept, without downloading or parsing the page
+    * skip parsing a page whose content hash is unchanged even if the server
+      sends no validators
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from typing import Dict
+from typing import NamedTuple
+from typing import Tuple
+from typing import Union
+
+from simple_crawler.hyperlink import Hyperlink
+
+VALIDATORS_FILE = "validators.sqlite3"
+# number of validators buffered in memory before they are written to disk
+DEFAULT_FLUSH_SIZE = 500
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS validators (
+    url TEXT PRIMARY KEY,
+    etag TEXT,
+    last_modified TEXT,
+    content_hash TEXT NOT NULL,
+    links TEXT NOT NULL
+);
+"""
+
+
+def content_hash(content: bytes) -> str:
+    """
+    a hash of the body of a response
+
+    >>> content_hash(b'<html></html>') == content_hash(b'<html></html>')
+    True
+    >>> content_hash(b'<html></html>') == content_hash(b'<html> </html>')
+    False
+    """
+    return hashlib.blake2b(content, digest_size=16).hexdigest()
+
+
+class Validators(NamedTuple):
+    """
+    what is kept of a url between crawls
+
+    :param etag: (str) the ETag header of the response, None if there wasn't one
+    :param last_modified: (str) the Last-Modified header of the response, None if there wasn't one
+    :param content_hash: (str) content_hash of the body of the response
+    :param links: (tuple) the hrefs found on the url (as found, before trimming & joining)
+    """
+
+    etag: Union[str, None]
+    last_modified: Union[str, None]
+    content_hash: str
+    links: Tuple[str, ...]
+
+    @classmethod
+    def from_response(cls, resp, links) -> "Validators":
+        """the validators of a (sync or async) response and the hrefs found on it"""
+        return cls(
+            etag=resp.headers.get("ETag"),
+            last_modified=resp.headers.get("Last-Modified"),
+            content_hash=content_hash(resp.content),
+            links=tuple(sorted(str(link) for link in links)),
+        )
+
+    def headers(self) -> Dict[str, str]:
+        """
+        the headers of a conditional request, the server answers 304 if the url is unchanged
+
+        >>> Validators('"abc"', None, 'hash', ()).headers()
+        {'If-None-Match': '"abc"'}
+        """
+        rv = {}
+        if self.etag is not None:
+            rv["If-None-Match"] = self.etag
+        if self.last_modified is not None:
+            rv["If-Modified-Since"] = self.last_modified
+        return rv
+
+
+class NoValidatorStore:
+    """a validator store that keeps nothing (used for when there is no validators_dir)"""
+
+    def get(self, url: Hyperlink) -> Union[Validators, None]:
+        return None
+
+    def put(self, url: Hyperlink, validators: Validators) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+class ValidatorStore(NoValidatorStore):
+    """
+    sqlite backed store of the validators of urls, keyed by normalised url
+
+    validators put are buffered in memory and written every flush_size urls and on close
+
+    :param validators_dir: (str) directory to keep the validators in, created if needed
+    :param flush_size: (int) max number of validators to buffer before writing them
+    """
+
+    def __init__(self, validators_dir: str, flush_size: int = DEFAULT_FLUSH_SIZE):
+        self.validators_dir = validators_dir
+        self.flush_size = flush_size
+
+        os.makedirs(validators_dir, exist_ok=True)
+        self._db = sqlite3.connect(
+            os.path.join(validators_dir, VALIDATORS_FILE),
+            check_same_thread=False,
+            isolation_level=None,
+        )
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+
+        self._lock = threading.Lock()
+        self._buffer: Dict[str, Validators] = {}
+
+    def get(self, url: Hyperlink) -> Union[Validators, None]:
+        """the validators kept of url, None if it wasn't crawled before"""
+        key = str(url)
+        with self._lock:
+            if key in self._buffer:
+                return self._buffer[key]
+            row = self._db.execute(
+                "SELECT etag, last_modified, content_hash, links FROM validators WHERE url = ?",
+                (key,),
+            ).fetchone()
+
+        if row is None:
+            return None
+        etag, last_modified, hashed, links = row
+        return Validators(etag, last_modified, hashed, tuple(json.loads(links)))
+
+    def put(self, url: Hyperlink, validators: Validators) -> None:
+        """keep the validators of url, replacing any kept before"""
+        with self._lock:
+            self._buffer[str(url)] = validators
+            if len(self._buffer) >= self.flush_size:
+                self._flush()
+
+    def _flush(self) -> None:
+        """write all buffered validators to disk in one transaction (must hold the lock)"""
+        rows = [
+            (url, v.etag, v.last_modified, v.content_hash, json.dumps(v.links))
+            for url, v in self._buffer.items()
+        ]
+        self._buffer = {}
+        self._db.execute("BEGIN")
+        self._db.executemany("INSERT OR REPLACE INTO validators VALUES (?, ?, ?, ?, ?)", rows)
+        self._db.execute("COMMIT")
+
+    def flush(self) -> None:
+        """write all buffered validators to disk"""
+        with self._lock:
+            self._flush()
+
+    def __len__(self) -> int:
+        self.flush()
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM validators").fetchone()[0]
+
+    def close(self) -> None:
+        """write the validators buffered and close the database"""
+        with self._lock:
+            self._flush()
+            self._db.close()
@@ -0,0 +1,251 @@
+"""
+module for recording responses to a WARC file and replaying a crawl from one with no network
+
+why?
+    a crawl depends on the network and on sites that change, so a change to
+    scoping or url normalisation can't be checked against the same pages
+    twice and timings of parsing, normalising & deduping are drowned out by
+    fetching, here:
+    * WarcWriter writes every response fetched by a Requester to a WARC file
+      (a gzip member per record, as other WARC tools expect)
+    * WarcReplayAdapter is a requests transport adapter that answers every
+      request from a WARC file, so the same Crawler runs over a capture
+      offline and deterministically (urls not in the capture are 404s)
+
+NB: requests decodes Content-Encoding (e.g. gzip) so the payloads recorded
+    are the decoded bodies, without Content-Encoding and with their Content-Length
+"""
+import io
+import threading
+import uuid
+import zlib
+from datetime import datetime
+from datetime import timezone
+from typing import Dict
+from typing import Iterator
+from typing import Tuple
+
+import requests
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+WARC_VERSION = "WARC/1.1"
+# headers of a recorded response that no longer apply to its (decoded) body
+DROPPED_HEADERS = ("Content-Encoding", "Transfer-Encoding", "Content-Length")
+CHUNK_SIZE = 1 << 16
+
+
+class WarcError(Exception):
+    """Base exception for WARC files"""
+
+    pass
+
+
+def make_record(warc_type: str, headers: Dict[str, str], block: bytes) -> bytes:
+    """a WARC record (not yet compressed) of type warc_type with block as its content"""
+    lines = [
+        WARC_VERSION,
+        f"WARC-Type: {warc_type}",
+        f"WARC-Record-ID: <urn:uuid:{uuid.uuid4()}>",
+        f"WARC-Date: {datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')}",
+    ]
+    lines += [f"{key}: {value}" for key, value in headers.items()]
+    lines.append(f"Content-Length: {len(block)}")
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("utf-8") + block + b"\r\n\r\n"
+
+
+def http_block(resp) -> bytes:
+    """the HTTP status line, headers and body of a (requests like) response"""
+    lines = [f"HTTP/1.1 {resp.status_code} {resp.reason}"]
+    lines += [
+        f"{key}: {value}"
+        for key, value in resp.headers.items()
+        if key.title() not in DROPPED_HEADERS
+    ]
+    lines.append(f"Content-Length: {len(resp.content)}")
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + resp.content
+
+
+def parse_headers(block: bytes) -> Tuple[str, CaseInsensitiveDict]:
+    """the first line and the headers of a header block"""
+    first, *lines = block.decode("latin-1").split("\r\n")
+    headers = CaseInsensitiveDict()
+    for line in lines:
+        key, _, value = line.partition(":")
+        headers[key.strip()] = value.strip()
+    return first, headers
+
+
+def parse_record(record: bytes) -> Tuple[CaseInsensitiveDict, bytes]:
+    """the WARC headers and content block of a (decompressed) record"""
+    head, sep, rest = record.partition(b"\r\n\r\n")
+    version, headers = parse_headers(head)
+    if not sep or not version.startswith("WARC/"):
+        raise WarcError(f"not a WARC record: {record[:20]!r}")
+    return headers, rest[: int(headers.get("Content-Length", len(rest)))]
+
+
+def parse_response(block: bytes) -> Tuple[int, str, CaseInsensitiveDict, bytes]:
+    """the status code, reason, headers and body of a HTTP response block"""
+    head, _, body = block.partition(b"\r\n\r\n")
+    status_line, headers = parse_headers(head)
+    _, status_code, reason = (status_line.split(" ", 2) + [""])[:3]
+    return int(status_code), reason, headers, body
+
+
+def gzip_member(data: bytes) -> bytes:
+    """data compressed as one gzip member"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+    return compressor.compress(data) + compressor.flush()
+
+
+def read_members(stream, offset: int = 0) -> Iterator[Tuple[int, bytes]]:
+    """the offset and decompressed bytes of each gzip member of a stream, from offset"""
+    stream.seek(offset)
+    buffer = b""
+    while True:
+        if not buffer:
+            buffer = stream.read(CHUNK_SIZE)
+            if not buffer:
+                return
+
+        start = offset
+        decompressor = zlib.decompressobj(zlib.MAX_WBITS | 16)
+        chunks = []
+        while True:
+            chunks.append(decompressor.decompress(buffer))
+            if decompressor.eof:
+                offset += len(buffer) - len(decompressor.unused_data)
+                buffer = decompressor.unused_data
+                break
+            offset += len(buffer)
+            buffer = stream.read(CHUNK_SIZE)
+            if not buffer:
+                raise WarcError(f"truncated gzip member at offset {start}")
+        yield start, b"".join(chunks)
+
+
+class WarcWriter:
+    """
+    thread safe writer of responses to a WARC file, appended to if it exists
+
+    :param path: (str) the WARC file to write (e.g. crawl.warc.gz)
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.records = 0
+        self._lock = threading.Lock()
+        self._file = open(path, "ab")
+        self._write(make_record("warcinfo", {"Content-Type": "application/warc-fields"}, b""))
+
+    def _write(self, record: bytes) -> None:
+        data = gzip_member(record)
+        with self._lock:
+            self._file.write(data)
+
+    def write_response(self, resp) -> None:
+        """write a (requests like) response as a response record"""
+        headers = {
+            "WARC-Target-URI": resp.url,
+            "Content-Type": "application/http; msgtype=response",
+        }
+        self._write(make_record("response", headers, http_block(resp)))
+        self.records += 1
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class WarcArchive:
+    """
+    the response records of a WARC file by url, indexed (by reading the whole file) on first use
+
+    :param path: (str) the WARC file to read
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._index = None
+        self._lock = threading.Lock()
+
+    def _build_index(self) -> Dict[str, int]:
+        """the offset of the last response record of each url"""
+        index = {}
+        with open(self.path, "rb") as stream:
+            for offset, record in read_members(stream):
+                headers, _ = parse_record(record)
+                if headers.get("WARC-Type") == "response":
+                    index[headers["WARC-Target-URI"]] = offset
+        return index
+
+    @property
+    def index(self) -> Dict[str, int]:
+        with self._lock:
+            if self._index is None:
+                self._index = self._build_index()
+            return self._index
+
+    def get(self, url: str) -> Tuple[int, str, CaseInsensitiveDict, bytes]:
+        """
+        the status code, reason, headers and body recorded for url
+
+        :raises: KeyError if url wasn't recorded
+        """
+        offset = self.index[url]
+        with open(self.path, "rb") as stream:
+            _, record = next(read_members(stream, offset))
+        _, block = parse_record(record)
+        return parse_response(block)
+
+    def __contains__(self, url: str) -> bool:
+        return url in self.index
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+
+class WarcReplayAdapter(BaseAdapter):
+    """
+    a requests transport adapter that answers requests from a WARC file instead of the network
+
+    How to use?
+        * session.mount("http://", WarcReplayAdapter(WarcArchive(path)))
+        * session.mount("https://", ...)
+
+    :param archive: (WarcArchive) the responses to replay
+    """
+
+    def __init__(self, archive: WarcArchive):
+        super().__init__()
+        self.archive = archive
+
+    def send(self, request, **kwargs) -> requests.Response:
+        try:
+            status_code, reason, headers, body = self.archive.get(request.url)
+        except KeyError:
+            status_code, reason, body = 404, "Not In Archive", b""
+            headers = CaseInsensitiveDict({"Content-Type": "text/plain"})
+
+        resp = requests.Response()
+        resp.status_code = status_code
+        resp.reason = reason
+        resp.headers = headers
+        resp._content = b"" if request.method == "HEAD" else body
+        resp.raw = io.BytesIO(resp._content)
+        resp.encoding = get_encoding_from_headers(headers)
+        resp.url = request.url
+        resp.request = request
+        resp.connection = self
+        return resp
+
+    def close(self) -> None:
+        pass
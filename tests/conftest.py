@@ -1,4 +1,5 @@
 import logging
+import socketserver
 import threading
 from contextlib import contextmanager
 from typing import Iterable
@@ -7,6 +8,7 @@ import pytest
 from flask import Flask
 from werkzeug.serving import make_server
 
+from simple_crawler.events import EventSink
 from simple_crawler.hyperlink import make_hyperlink
 
 
@@ -61,6 +63,60 @@ class WebServer:
         return make_hyperlink(self.url)
 
 
+class RawServer:
+    """
+    a server that answers a request for each path with the raw bytes of
+    responses (a 404 if there are none) then closes the connection, to send
+    responses a web framework won't (e.g. cut short)
+    """
+
+    def __init__(self, responses: dict):
+        self.responses = responses
+
+    @contextmanager
+    def run(self):
+        responses = self.responses
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                path = self.rfile.readline().decode("latin-1").split(" ")[1]
+                while self.rfile.readline().strip():
+                    pass
+                self.wfile.write(
+                    responses.get(path, b"HTTP/1.1 404 Not Found\r\nContent-Length: 0\r\n\r\n")
+                )
+
+        server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), Handler)
+        server.daemon_threads = True
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            self.url = "http://127.0.0.1:{}".format(server.server_address[1])
+            yield self
+        finally:
+            server.shutdown()
+            server.server_close()
+            thread.join()
+
+
+class ListSink(EventSink):
+    """a sink keeping every event, as (kind, url, detail)"""
+
+    def __init__(self):
+        self.events = []
+        self._lock = threading.Lock()
+
+    def wants(self, kind: str) -> bool:
+        return True
+
+    def emit(self, kind: str, url, **detail) -> None:
+        with self._lock:
+            self.events.append((kind, str(url), detail))
+
+    def of(self, kind: str) -> list:
+        return [event for event in self.events if event[0] == kind]
+
+
 @pytest.fixture(scope="function")
 def server():
     app = Flask("test")
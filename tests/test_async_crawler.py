@@ -0,0 +1,143 @@
+import asyncio
+
+import pytest
+
+from simple_crawler.async_crawler import AsyncCrawler
+from simple_crawler.hyperlink import make_hyperlink_set
+from tests.conftest import RawServer
+from tests.test_crawler import conditional_site
+from tests.test_crawler import crawler_server  # noqa: F401
+from tests.test_crawler import flaky_site
+from tests.test_crawler import redirect_site
+
+
+@pytest.mark.parametrize("max_workers", [1, 100])
+def test_async_crawler_crawl_find_all_links(crawler_server, max_workers):  # noqa: F811
+    crawler = AsyncCrawler(max_workers=max_workers, timeout=5)
+    found_links = crawler.crawl(crawler_server.url)
+    assert found_links == crawler_server.links
+
+
+def test_async_crawler_crawl_async(crawler_server):  # noqa: F811
+    async def main():
+        crawler = AsyncCrawler(max_workers=10, timeout=5)
+        return await crawler.crawl_async(crawler_server.url)
+
+    loop = asyncio.new_event_loop()
+    try:
+        assert loop.run_until_complete(main()) == crawler_server.links
+    finally:
+        loop.close()
+
+
+def test_async_crawler_crawl_url(crawler_server):  # noqa: F811
+    crawler = AsyncCrawler(timeout=5)
+    loop = asyncio.new_event_loop()
+    try:
+        result = loop.run_until_complete(crawler._crawl_url_async(crawler_server.href / "hello"))
+    finally:
+        loop.close()
+    assert (result.url, result.status, result.error) == (crawler_server.url + "/hello", 200, None)
+    assert crawler._queue.get() == crawler_server.href / "world"
+    assert crawler._seen_urls == make_hyperlink_set([crawler_server.href / "world"])
+    assert crawler._done_urls == make_hyperlink_set([crawler_server.href / "hello"])
+
+
+@pytest.mark.parametrize("path", ["/error/404", "/error/500"])
+def test_async_crawler_crawl_url_error(crawler_server, path):  # noqa: F811
+    crawler = AsyncCrawler(timeout=5)
+    assert crawler.crawl(crawler_server.url + path) == set()
+
+
+def test_async_crawler_crawl_with_parse_workers(crawler_server):  # noqa: F811
+    crawler = AsyncCrawler(max_workers=10, parse_workers=2, timeout=5)
+    assert crawler.crawl(crawler_server.url) == crawler_server.links
+
+
+def test_async_crawler_iter_crawl(crawler_server):  # noqa: F811
+    crawler = AsyncCrawler(max_workers=10, timeout=5)
+    results = list(crawler.iter_crawl(crawler_server.url, buffer_size=2))
+    assert {result.url for result in results if result.ok} == crawler_server.links
+    assert {result.status for result in results if not result.ok} == {400, 500}
+
+
+@pytest.mark.parametrize(
+    "budget, stop_reason, found",
+    [({}, "finished", 6), ({"max_pages": 1}, "max_pages", 1), ({"max_depth": 0}, "max_depth", 1)],
+)
+def test_async_crawler_crawl_budget(crawler_server, budget, stop_reason, found):  # noqa: F811
+    crawler = AsyncCrawler(max_workers=10, timeout=5, **budget)
+    assert len(crawler.crawl(crawler_server.url)) == found
+    assert crawler.stop_reason == stop_reason
+
+
+def test_async_crawler_recrawl_with_validators_dir(tmp_path):
+    server, sent, _ = conditional_site()
+    with server.run():
+        found_urls = AsyncCrawler(max_workers=10, timeout=5, validators_dir=str(tmp_path)).crawl(
+            server.url
+        )
+        assert len(found_urls) == 5
+
+        sent.clear()
+        crawler = AsyncCrawler(max_workers=10, timeout=5, validators_dir=str(tmp_path))
+        assert crawler.crawl(server.url) == found_urls
+        assert sorted(sent) == ["/", "/page/modified", "/page/v1"]
+
+
+def test_async_crawler_crawl_follows_redirect_once():
+    server, sent = redirect_site()
+    with server.run():
+        crawler = AsyncCrawler(max_workers=10, timeout=5)
+        results = {result.url: result for result in crawler.iter_crawl(server.url)}
+
+    assert len(results) == 5
+    assert sent.count("/new") == 1
+    assert results[server.url + "/old"].status == 302
+    assert results[server.url + "/old"].redirect == server.url + "/new"
+
+
+def test_async_crawler_crawl_retries():
+    server, sent = flaky_site()
+    crawler = AsyncCrawler(max_workers=10, timeout=5, max_retries=2, retry_backoff=0.01)
+    with server.run():
+        found_urls = crawler.crawl(server.url)
+
+    assert found_urls == {server.url + path for path in ["/", "/flaky", "/page"]}
+    assert len(sent) == 3
+    assert crawler.errors.by_host() == {"0.0.0.0:9998": {503: 2, 404: 1}}
+
+
+def test_async_crawler_crawl_response_cut_short():
+    cut_short = b"HTTP/1.1 200 OK\r\nContent-Type: text/html\r\nContent-Length: 100\r\n\r\n<html>"
+    crawler = AsyncCrawler(timeout=5, max_retries=2, retry_backoff=0.01)
+    with RawServer({"/": cut_short}).run() as server:
+        results = list(crawler.iter_crawl(server.url))
+
+    (result,) = results
+    assert result.url == server.url + "/"
+    assert result.error.startswith("IncompleteReadError")
+    # tried 3 times, as the threads engine does (where it is a ChunkedEncodingError)
+    assert crawler.errors.by_host() == {server.url[7:]: {"BadResponse": 3}}
+
+
+def test_async_crawler_crawl_redirect_to_unsupported_scheme():
+    redirect = (
+        b"HTTP/1.1 302 Found\r\nLocation: ftp://example.com/file\r\nContent-Length: 0\r\n\r\n"
+    )
+    crawler = AsyncCrawler(timeout=5)
+    with RawServer({"/": redirect}).run() as server:
+        results = list(crawler.iter_crawl(server.url))
+
+    (result,) = results
+    assert result.url == server.url + "/"
+    assert result.error == "unsupported scheme 'ftp'"
+    assert crawler.errors.by_host() == {server.url[7:]: {"BadResponse": 1}}
+
+
+def test_async_crawler_profile_dir(crawler_server, tmpdir):  # noqa: F811
+    crawler = AsyncCrawler(max_workers=10, timeout=5, profile_dir=str(tmpdir))
+    crawler.crawl(crawler_server.url)
+    # fetches of tasks overlap on the one thread, so they are a span each per task
+    assert crawler.profile.stages()["fetch"]["count"] == 8
+    assert "fetch.headers" not in crawler.profile.stages()
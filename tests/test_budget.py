@@ -0,0 +1,62 @@
+import time
+
+from simple_crawler.budget import CrawlBudget
+
+
+def test_crawl_budget_no_limits():
+    budget = CrawlBudget()
+    for _ in range(100):
+        budget.page()
+        budget.add_bytes(1000)
+    assert budget.allows_depth(1000)
+    assert budget.exceeded() is None
+    assert budget.time_left() is None
+    assert budget.wait_timeout(10) == 10
+    assert budget.finished_reason() == "finished"
+
+
+def test_crawl_budget_max_depth():
+    budget = CrawlBudget(max_depth=1)
+    assert budget.allows_depth(0)
+    assert budget.allows_depth(1)
+    assert budget.finished_reason() == "finished"
+    assert not budget.allows_depth(2)
+    assert budget.finished_reason() == "max_depth"
+    # depth only prunes urls, it doesn't stop the crawl
+    assert budget.exceeded() is None
+
+
+def test_crawl_budget_max_pages_and_bytes():
+    budget = CrawlBudget(max_pages=2, max_bytes=100)
+    budget.page()
+    budget.add_bytes(99)
+    assert budget.exceeded() is None
+    budget.add_bytes(1)
+    assert budget.exceeded() == "max_bytes"
+    budget.page()
+    assert budget.exceeded() == "max_pages"
+
+    budget.start()
+    assert (budget.pages, budget.bytes) == (0, 0)
+    assert budget.exceeded() is None
+
+
+def test_crawl_budget_counts_retried_url_once():
+    budget = CrawlBudget(max_pages=2)
+    budget.page()
+    budget.retry()
+    budget.page()
+    assert (budget.pages, budget.exceeded()) == (1, None)
+    budget.page()
+    assert budget.exceeded() == "max_pages"
+
+
+def test_crawl_budget_deadline():
+    budget = CrawlBudget(deadline_seconds=0.1)
+    assert 0 < budget.time_left() <= 0.1
+    assert budget.wait_timeout(10) <= 0.1
+    assert budget.exceeded() is None
+    time.sleep(0.1)
+    assert budget.time_left() == 0
+    assert budget.wait_timeout(10) == 0
+    assert budget.exceeded() == "deadline"
@@ -1,15 +1,46 @@
+import json
+import threading
+
 import pytest
 from click.testing import CliRunner
 from flask import abort
+from flask import redirect
 
 from simple_crawler.cli import crawl
+from simple_crawler.cli import DEFAULT_BACKOFF
 from simple_crawler.cli import DEFAULT_CHECK_HEAD
+from simple_crawler.cli import DEFAULT_COMPACT_SEEN
+from simple_crawler.cli import DEFAULT_CPROFILE
+from simple_crawler.cli import DEFAULT_DEADLINE
 from simple_crawler.cli import DEFAULT_DISOBEY_ROBOTS
+from simple_crawler.cli import DEFAULT_EVENTS_JSONL
+from simple_crawler.cli import DEFAULT_FOUND_SAMPLE
+from simple_crawler.cli import DEFAULT_MAX_BACKOFF
+from simple_crawler.cli import DEFAULT_MAX_BYTES
+from simple_crawler.cli import DEFAULT_MAX_DEPTH
+from simple_crawler.cli import DEFAULT_MAX_FRONTIER_MEMORY
+from simple_crawler.cli import DEFAULT_MAX_PAGES
+from simple_crawler.cli import DEFAULT_MAX_PER_HOST
+from simple_crawler.cli import DEFAULT_MAX_RETRIES
 from simple_crawler.cli import DEFAULT_MAX_WORKERS
+from simple_crawler.cli import DEFAULT_METRICS_PORT
+from simple_crawler.cli import DEFAULT_PARSE_WORKERS
+from simple_crawler.cli import DEFAULT_PROFILE_DIR
+from simple_crawler.cli import DEFAULT_RECORD_REDIRECTS
+from simple_crawler.cli import DEFAULT_REPLAY
+from simple_crawler.cli import DEFAULT_SEEN_COLLISIONS
+from simple_crawler.cli import DEFAULT_STATE_DIR
 from simple_crawler.cli import DEFAULT_TIMEOUT
+from simple_crawler.cli import DEFAULT_TRACEMALLOC
+from simple_crawler.cli import DEFAULT_VALIDATORS_DIR
+from simple_crawler.cli import DEFAULT_VERBOSITY
+from simple_crawler.cli import DEFAULT_WARC_OUT
 from simple_crawler.cli import DEFAULT_WITH_FRAGMENT
 from simple_crawler.cli import DEFAULT_WITH_QUERY
 from simple_crawler.crawler import DEFAULT_USER_AGENT
+from simple_crawler.distributed import CrawlWorker
+from simple_crawler.ordering import DEFAULT_ORDER
+from simple_crawler.state import DEFAULT_CHECKPOINT_INTERVAL
 from tests.conftest import make_html_from_links
 
 
@@ -31,6 +62,32 @@ def test_crawl_default(runner):
         f"check head: {DEFAULT_CHECK_HEAD}\n"
         f"trim query: {not DEFAULT_WITH_QUERY}\n"
         f"trim fragment: {not DEFAULT_WITH_FRAGMENT}\n"
+        f"max per host: {DEFAULT_MAX_PER_HOST}\n"
+        f"parse workers: {DEFAULT_PARSE_WORKERS}\n"
+        f"state dir: {DEFAULT_STATE_DIR}\n"
+        f"checkpoint interval: {DEFAULT_CHECKPOINT_INTERVAL}\n"
+        f"max frontier memory: {DEFAULT_MAX_FRONTIER_MEMORY}\n"
+        f"compact seen: {DEFAULT_COMPACT_SEEN}\n"
+        f"seen collisions: {DEFAULT_SEEN_COLLISIONS}\n"
+        f"max depth: {DEFAULT_MAX_DEPTH}\n"
+        f"max pages: {DEFAULT_MAX_PAGES}\n"
+        f"max bytes: {DEFAULT_MAX_BYTES}\n"
+        f"deadline seconds: {DEFAULT_DEADLINE}\n"
+        f"order: {DEFAULT_ORDER}\n"
+        f"validators dir: {DEFAULT_VALIDATORS_DIR}\n"
+        f"warc out: {DEFAULT_WARC_OUT}\n"
+        f"replay: {DEFAULT_REPLAY}\n"
+        f"record redirects: {DEFAULT_RECORD_REDIRECTS}\n"
+        f"max retries: {DEFAULT_MAX_RETRIES}\n"
+        f"retry backoff: {DEFAULT_BACKOFF}\n"
+        f"retry max backoff: {DEFAULT_MAX_BACKOFF}\n"
+        f"verbosity: {DEFAULT_VERBOSITY}\n"
+        f"found sample: {DEFAULT_FOUND_SAMPLE}\n"
+        f"events jsonl: {DEFAULT_EVENTS_JSONL}\n"
+        f"metrics port: {DEFAULT_METRICS_PORT}\n"
+        f"profile dir: {DEFAULT_PROFILE_DIR}\n"
+        f"profile cprofile: {DEFAULT_CPROFILE}\n"
+        f"profile memory: {DEFAULT_TRACEMALLOC}\n"
     )
 
 
@@ -73,6 +130,32 @@ def test_crawl_options_debug(
         f"check head: {bool(check_head)}\n"
         f"trim query: {not bool(with_query)}\n"
         f"trim fragment: {not bool(with_fragment)}\n"
+        f"max per host: {DEFAULT_MAX_PER_HOST}\n"
+        f"parse workers: {DEFAULT_PARSE_WORKERS}\n"
+        f"state dir: {DEFAULT_STATE_DIR}\n"
+        f"checkpoint interval: {DEFAULT_CHECKPOINT_INTERVAL}\n"
+        f"max frontier memory: {DEFAULT_MAX_FRONTIER_MEMORY}\n"
+        f"compact seen: {DEFAULT_COMPACT_SEEN}\n"
+        f"seen collisions: {DEFAULT_SEEN_COLLISIONS}\n"
+        f"max depth: {DEFAULT_MAX_DEPTH}\n"
+        f"max pages: {DEFAULT_MAX_PAGES}\n"
+        f"max bytes: {DEFAULT_MAX_BYTES}\n"
+        f"deadline seconds: {DEFAULT_DEADLINE}\n"
+        f"order: {DEFAULT_ORDER}\n"
+        f"validators dir: {DEFAULT_VALIDATORS_DIR}\n"
+        f"warc out: {DEFAULT_WARC_OUT}\n"
+        f"replay: {DEFAULT_REPLAY}\n"
+        f"record redirects: {DEFAULT_RECORD_REDIRECTS}\n"
+        f"max retries: {DEFAULT_MAX_RETRIES}\n"
+        f"retry backoff: {DEFAULT_BACKOFF}\n"
+        f"retry max backoff: {DEFAULT_MAX_BACKOFF}\n"
+        f"verbosity: {DEFAULT_VERBOSITY}\n"
+        f"found sample: {DEFAULT_FOUND_SAMPLE}\n"
+        f"events jsonl: {DEFAULT_EVENTS_JSONL}\n"
+        f"metrics port: {DEFAULT_METRICS_PORT}\n"
+        f"profile dir: {DEFAULT_PROFILE_DIR}\n"
+        f"profile cprofile: {DEFAULT_CPROFILE}\n"
+        f"profile memory: {DEFAULT_TRACEMALLOC}\n"
     )
 
 
@@ -141,3 +224,345 @@ def test_crawl(server, runner):
 
         assert "ERROR: 500 Internal Server Error on http://0.0.0.0:9999/error\n"
         assert "VISITED: http://0.0.0.0:9999/hello.pdf"
+        assert result.output.endswith("STOPPED: finished\n")
+
+
+def test_crawl_async_engine(server, runner):
+    @server.app.route("/")
+    def index():
+        return make_html_from_links(["/", "/hello"])
+
+    @server.app.route("/hello")
+    def hello():
+        return make_html_from_links(["/"])
+
+    with server.run():
+        result = runner.invoke(crawl, [server.url, "-t", "1", "-w", "10", "-e", "async"])
+        assert result.exit_code == 0
+        assert "CRAWLING: http://0.0.0.0:9999/hello\n" in result.output
+        assert "FOUND: http://0.0.0.0:9999/hello\n" in result.output
+
+
+def test_crawl_parse_workers(server, runner):
+    @server.app.route("/")
+    def index():
+        return make_html_from_links(["/", "/hello"])
+
+    @server.app.route("/hello")
+    def hello():
+        return make_html_from_links(["/"])
+
+    with server.run():
+        result = runner.invoke(crawl, [server.url, "-t", "5", "-w", "4", "--parse-workers", "2"])
+        assert result.exit_code == 0
+        assert "FOUND: http://0.0.0.0:9999/\n" in result.output
+        assert "FOUND: http://0.0.0.0:9999/hello\n" in result.output
+
+
+def test_crawl_requires_url_or_resume(runner):
+    result = runner.invoke(crawl, [])
+    assert result.exit_code != 0
+    assert "URL is required" in result.output
+
+
+def test_crawl_state_dir_and_resume(server, runner, tmp_path):
+    @server.app.route("/")
+    def index():
+        return make_html_from_links(["/", "/hello"])
+
+    @server.app.route("/hello")
+    def hello():
+        return make_html_from_links(["/"])
+
+    state_dir = str(tmp_path / "state")
+    with server.run():
+        result = runner.invoke(crawl, [server.url, "-t", "5", "--state-dir", state_dir])
+        assert result.exit_code == 0
+        assert "FOUND: http://0.0.0.0:9999/hello\n" in result.output
+
+        result = runner.invoke(crawl, ["--resume", state_dir, "-t", "5"])
+        assert result.exit_code == 0
+        assert result.output.startswith(f"resuming crawl in: {state_dir}\n")
+        assert "\nCRAWLING: " not in result.output
+        assert "RESUMING: http://0.0.0.0:9999/ with 2 done and 0 to crawl\n" in result.output
+        # urls found before resuming aren't found again
+        assert "\nFOUND: " not in result.output
+
+
+def test_crawl_max_pages(server, runner):
+    @server.app.route("/")
+    def index():
+        return make_html_from_links(["/", "/hello", "/world"])
+
+    with server.run():
+        result = runner.invoke(crawl, [server.url, "-t", "1", "--max-pages", "1"])
+        assert result.exit_code == 0
+        assert "FOUND: http://0.0.0.0:9999/\n" in result.output
+        assert "CRAWLING: http://0.0.0.0:9999/hello\n" not in result.output
+        assert result.output.endswith("STOPPED: max_pages\n")
+
+
+@pytest.mark.parametrize("order", ["bfs", "dfs", "depth-weighted", "best-first"])
+def test_crawl_order(server, runner, order):
+    @server.app.route("/")
+    def index():
+        return make_html_from_links(["/", "/hello"])
+
+    @server.app.route("/hello")
+    def hello():
+        return make_html_from_links(["/hello/world"])
+
+    @server.app.route("/hello/world")
+    def hello_world():
+        return make_html_from_links(["/"])
+
+    with server.run():
+        result = runner.invoke(crawl, [server.url, "-t", "1", "-o", order])
+        assert result.exit_code == 0
+        assert "FOUND: http://0.0.0.0:9999/hello/world\n" in result.output
+
+
+@pytest.mark.parametrize("shard_by", ["url", "host"])
+def test_crawl_processes(server, runner, shard_by):
+    @server.app.route("/")
+    def index():
+        return make_html_from_links(["/", "/hello", "/world"])
+
+    @server.app.route("/hello")
+    def hello():
+        return make_html_from_links(["/"])
+
+    @server.app.route("/world")
+    def world():
+        return make_html_from_links(["/hello"])
+
+    with server.run():
+        result = runner.invoke(crawl, [server.url, "-t", "5", "-p", "2", "--shard-by", shard_by])
+        assert result.exit_code == 0
+        assert "FOUND: http://0.0.0.0:9999/\n" in result.output
+        assert "FOUND: http://0.0.0.0:9999/hello\n" in result.output
+        assert "FOUND: http://0.0.0.0:9999/world\n" in result.output
+        assert result.output.endswith("STOPPED: finished\n")
+
+
+@pytest.mark.parametrize("args", [["-p", "2", "-e", "async"], ["-p", "2", "--state-dir", "state"]])
+def test_crawl_processes_invalid(runner, args):
+    result = runner.invoke(crawl, ["https://www.example.com"] + args)
+    assert result.exit_code != 0
+    assert "--processes" in result.output
+
+
+def test_crawl_listen(server, runner):
+    @server.app.route("/")
+    def index():
+        return make_html_from_links(["/", "/hello"])
+
+    @server.app.route("/hello")
+    def hello():
+        return make_html_from_links(["/"])
+
+    worker = CrawlWorker("127.0.0.1:9997", timeout=5)
+    thread = threading.Thread(target=worker.work, daemon=True)
+    thread.start()
+    with server.run():
+        result = runner.invoke(crawl, [server.url, "-t", "5", "--listen", "127.0.0.1:9997"])
+        assert result.exit_code == 0
+        assert result.output.startswith(
+            f"crawling URL: {server.url}\ncoordinating workers on: 127.0.0.1:9997\n"
+        )
+        assert "FOUND: http://0.0.0.0:9999/hello\n" in result.output
+        assert result.output.endswith("STOPPED: finished\n")
+    thread.join(timeout=5)
+    assert not thread.is_alive()
+
+
+def test_crawl_warc_out_and_replay(server, runner, tmp_path):
+    @server.app.route("/")
+    def index():
+        return make_html_from_links(["/", "/hello"])
+
+    @server.app.route("/hello")
+    def hello():
+        return make_html_from_links(["/"])
+
+    warc = str(tmp_path / "crawl.warc.gz")
+    with server.run():
+        recorded = runner.invoke(crawl, [server.url, "-t", "5", "--warc-out", warc])
+        assert recorded.exit_code == 0
+
+    # the server is down, so every response comes from the archive
+    result = runner.invoke(crawl, [server.url, "-t", "5", "--replay", warc])
+    assert result.exit_code == 0
+    assert "FOUND: http://0.0.0.0:9999/hello\n" in result.output
+    assert result.output.endswith("STOPPED: finished\n")
+    found = sorted(line for line in result.output.splitlines() if line.startswith("FOUND: "))
+    assert found == sorted(
+        line for line in recorded.output.splitlines() if line.startswith("FOUND: ")
+    )
+
+
+@pytest.mark.parametrize(
+    "args",
+    [
+        ["--warc-out", "crawl.warc.gz", "-e", "async"],
+        ["--warc-out", "crawl.warc.gz", "-p", "2"],
+        ["--replay", __file__, "-e", "async"],
+        ["--replay", "no-such-file.warc.gz"],
+        ["--replay", __file__, "--listen", "127.0.0.1:0"],
+        ["--validators-dir", "validators", "-p", "2"],
+        ["--validators-dir", "validators", "--listen", "127.0.0.1:0"],
+    ],
+)
+def test_crawl_warc_invalid(runner, args):
+    result = runner.invoke(crawl, ["https://www.example.com"] + args)
+    assert result.exit_code != 0
+
+
+def test_crawl_record_redirects(server, runner):
+    @server.app.route("/")
+    def index():
+        return make_html_from_links(["/old"])
+
+    @server.app.route("/old")
+    def old():
+        return redirect("/new")
+
+    @server.app.route("/new")
+    def new():
+        return make_html_from_links(["/"])
+
+    with server.run():
+        result = runner.invoke(crawl, [server.url, "-t", "5", "--record-redirects"])
+        assert result.exit_code == 0
+        assert "REDIRECT: http://0.0.0.0:9999/old -> http://0.0.0.0:9999/new\n" in result.output
+        assert "FOUND: http://0.0.0.0:9999/new\n" in result.output
+
+
+def test_crawl_retries(server, runner):
+    failures = []
+
+    @server.app.route("/")
+    def index():
+        return make_html_from_links(["/flaky", "/missing"])
+
+    @server.app.route("/flaky")
+    def flaky():
+        failures.append(1)
+        if len(failures) == 1:
+            return "", 429
+        return make_html_from_links([])
+
+    with server.run():
+        result = runner.invoke(
+            crawl, [server.url, "-t", "5", "--max-retries", "1", "--retry-backoff", "0.01"]
+        )
+        assert result.exit_code == 0
+        assert "FOUND: http://0.0.0.0:9999/flaky\n" in result.output
+        assert "RETRYING: http://0.0.0.0:9999/flaky IN " in result.output
+        assert "ERRORS ON 0.0.0.0:9999: 404 x1, 429 x1\n" in result.output
+
+
+def test_crawl_worker_debug(runner):
+    result = runner.invoke(crawl, ["worker", "-c", "127.0.0.1:8765", "-w", "4", "--debug"])
+    assert result.exit_code == 0
+    assert result.output.startswith(
+        "working for coordinator: 127.0.0.1:8765\ndebug mode is on: worker not running\n"
+    )
+    assert "max workers: 4\n" in result.output
+    assert "lease size: 4\n" in result.output
+
+
+@pytest.mark.parametrize(
+    "args",
+    [
+        ["worker"],
+        ["worker", "-c", "127.0.0.1"],
+        ["https://www.example.com", "--listen", "8765"],
+        ["https://www.example.com", "--listen", "127.0.0.1:0", "-e", "async"],
+    ],
+)
+def test_crawl_distributed_invalid(runner, args):
+    result = runner.invoke(crawl, args)
+    assert result.exit_code != 0
+
+
+def test_crawl_verbosity(server, runner):
+    @server.app.route("/")
+    def index():
+        return make_html_from_links(["/hello"])
+
+    @server.app.route("/hello")
+    def hello():
+        return make_html_from_links(["/missing"])
+
+    with server.run():
+        result = runner.invoke(crawl, [server.url, "-t", "5", "-v", "1"])
+        assert result.exit_code == 0
+        assert "FOUND: http://0.0.0.0:9999/hello\n" in result.output
+        assert "ERROR: 404 NOT FOUND ON http://0.0.0.0:9999/missing\n" in result.output
+        assert "\nCRAWLING: " not in result.output
+        assert " ON http://0.0.0.0:9999/\n" not in result.output
+
+
+def test_crawl_events_jsonl(server, runner, tmp_path):
+    @server.app.route("/")
+    def index():
+        return make_html_from_links(["/hello"])
+
+    path = str(tmp_path / "events.jsonl")
+    with server.run():
+        result = runner.invoke(
+            crawl, [server.url, "-t", "5", "--events-jsonl", path, "--found-sample", "0"]
+        )
+        assert result.exit_code == 0
+        assert "\nCRAWLING: " not in result.output
+
+    events = [json.loads(line)["event"] for line in open(path)]
+    assert "CRAWLING" in events
+    assert "FOUND" not in events
+
+
+@pytest.mark.parametrize(
+    "args",
+    [
+        ["-v", "4"],
+        ["--found-sample", "1.5"],
+        ["--events-jsonl", "events.jsonl", "-p", "2"],
+        ["--metrics-port", "-1"],
+        ["--metrics-port", "9000", "-p", "2"],
+    ],
+)
+def test_crawl_events_invalid(runner, args):
+    result = runner.invoke(crawl, ["https://www.example.com"] + args)
+    assert result.exit_code != 0
+
+
+def test_crawl_metrics_port(server, runner):
+    @server.app.route("/")
+    def index():
+        return make_html_from_links([])
+
+    with server.run():
+        result = runner.invoke(crawl, [server.url, "-t", "5", "--metrics-port", "9995"])
+        assert result.exit_code == 0
+        assert "serving metrics on: http://127.0.0.1:9995/metrics\n" in result.output
+        assert "FOUND: http://0.0.0.0:9999/\n" in result.output
+
+
+def test_crawl_profile(server, runner, tmpdir):
+    @server.app.route("/")
+    def index():
+        return make_html_from_links([])
+
+    with server.run():
+        result = runner.invoke(crawl, [server.url, "-t", "5", "--profile", str(tmpdir)])
+        assert result.exit_code == 0
+        assert f"PROFILE IN {tmpdir}:\n" in result.output
+        assert "\ncrawl_url " in result.output
+        assert tmpdir.join("trace.json").exists()
+
+
+@pytest.mark.parametrize("args", [["--cprofile"], ["--tracemalloc"], ["--profile", "p", "-p", "2"]])
+def test_crawl_profile_invalid(runner, args):
+    result = runner.invoke(crawl, ["https://www.example.com"] + args)
+    assert result.exit_code != 0
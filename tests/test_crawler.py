@@ -1,16 +1,32 @@
+import json
+import time
+from datetime import datetime
+
 import pytest
+import requests
 from flask import abort
 from flask import Flask
+from flask import make_response
 from flask import redirect
 from flask import request
 
 from simple_crawler.crawler import Crawler
 from simple_crawler.crawler import NoThreadExecutor
+from simple_crawler.events import CRAWLING
+from simple_crawler.events import FOUND
+from simple_crawler.events import VISITED
+from simple_crawler.fingerprint import FingerprintRegistry
 from simple_crawler.hyperlink import make_hyperlink
 from simple_crawler.hyperlink import make_hyperlink_set
+from simple_crawler.profiling import STAGES_FILE
+from simple_crawler.profiling import TRACE_FILE
 from simple_crawler.requester import ClientError
 from simple_crawler.requester import ServerError
 from simple_crawler.requester import WrongMIMEType
+from simple_crawler.state import CrawlState
+from simple_crawler.state import DEFAULT_CHECKPOINT_INTERVAL
+from simple_crawler.state import StateError
+from tests.conftest import ListSink
 from tests.conftest import make_html_from_links
 from tests.conftest import WebServer
 
@@ -111,6 +127,8 @@ def test_crawler_user_agent_success(crawler_server, user_agent):
 @pytest.mark.parametrize("check_head", [True, False])
 @pytest.mark.parametrize("trim_query", [True, False])
 @pytest.mark.parametrize("trim_fragment", [True, False])
+@pytest.mark.parametrize("max_per_host", [None, 2])
+@pytest.mark.parametrize("parse_workers", [0, 2])
 def test_crawler_config(
     user_agent,
     max_workers,
@@ -119,6 +137,8 @@ def test_crawler_config(
     check_head,
     trim_query,
     trim_fragment,
+    max_per_host,
+    parse_workers,
 ):
     crawler = Crawler(
         user_agent=user_agent,
@@ -128,6 +148,8 @@ def test_crawler_config(
         check_head=check_head,
         trim_query=trim_query,
         trim_fragment=trim_fragment,
+        max_per_host=max_per_host,
+        parse_workers=parse_workers,
     )
 
     assert crawler.config == dict(
@@ -138,6 +160,32 @@ def test_crawler_config(
         check_head=check_head,
         trim_query=trim_query,
         trim_fragment=trim_fragment,
+        max_per_host=max_per_host,
+        parse_workers=parse_workers,
+        state_dir=None,
+        checkpoint_interval=DEFAULT_CHECKPOINT_INTERVAL,
+        max_frontier_memory=None,
+        compact_seen=False,
+        seen_collisions="ignore",
+        max_depth=None,
+        max_pages=None,
+        max_bytes=None,
+        deadline_seconds=None,
+        order="bfs",
+        validators_dir=None,
+        warc_out=None,
+        replay=None,
+        record_redirects=False,
+        max_retries=0,
+        retry_backoff=0.5,
+        retry_max_backoff=60.0,
+        verbosity=3,
+        found_sample=1.0,
+        events_jsonl=None,
+        metrics_port=None,
+        profile_dir=None,
+        profile_cprofile=False,
+        profile_memory=False,
     )
 
 
@@ -152,9 +200,8 @@ def test_crawler_executor(crawler):
 def test_crawler_get_hrefs(crawler_server, crawler, record_redirects, found_link):
     crawler.record_redirects = record_redirects
     found_link = found_link.format(host=crawler_server.url)
-    assert crawler._get_hrefs(crawler_server.href + "/redirect/hello") == make_hyperlink_set(
-        [found_link]
-    )
+    # the hrefs as they are found, not yet made into Hyperlinks
+    assert crawler._get_hrefs(crawler_server.href + "/redirect/hello") == [found_link]
 
 
 @pytest.mark.parametrize("code, exc", [("404", ClientError), ("500", ServerError)])
@@ -196,9 +243,23 @@ def test_crawler_parse_hrefs(crawler):
     )
 
 
+def test_crawler_visit_raw_hrefs():
+    crawler = Crawler(timeout=0, obey_robots=False)
+    url = make_hyperlink("https://www.example.com/a/b/c")
+    # ../d and ./d are the same link until they are joined to url
+    assert crawler._visit(url, ["../d", "./d", "./d#top", "https://www.example.org/"]) == 2
+    assert crawler._seen_urls == make_hyperlink_set(
+        ["https://www.example.com/a/d", "https://www.example.com/a/b/d"]
+    )
+
+
 def test_crawler_crawl_url(crawler_server, crawler):
-    crawler._crawl_url(crawler_server.href / "hello")
+    result = crawler._crawl_url(crawler_server.href / "hello", depth=2)
+    assert result.url == crawler_server.url + "/hello"
+    assert (result.status, result.depth, result.error) == (200, 2, None)
+    assert result.content_type.startswith("text/html")
     assert crawler._queue.get() == crawler_server.href / "world"
+    assert crawler._queue.depth_of(crawler_server.href / "world") == 3
     assert crawler._seen_urls == make_hyperlink_set([crawler_server.href / "world"])
     assert crawler._done_urls == make_hyperlink_set([crawler_server.href / "hello"])
 
@@ -234,6 +295,20 @@ def test_crawler_get_robots(crawler_server, crawler):
     assert robots.can_fetch("NotAnyOtherAgent", "/") is False
 
 
+def test_crawler_crawl_robots_connection_error(crawler_server):
+    crawler = Crawler(timeout=5)
+    requester = crawler._requester
+
+    def refuse_robots(url, *args, **kwargs):
+        if str(url).endswith("/robots.txt"):
+            raise requests.ConnectionError("connection refused")
+        return requester(url, *args, **kwargs)
+
+    crawler._requester = refuse_robots
+    # a robots.txt that can't be fetched allows everything
+    assert crawler.crawl(crawler_server.url) == crawler_server.links
+
+
 def test_crawler_crawl_find_all_links(crawler_server, crawler):
     found_links = crawler.crawl(crawler_server.url)
     assert found_links == crawler_server.links
@@ -244,7 +319,7 @@ def test_crawler_render_results(crawler):
     assert crawler._seen_urls == make_hyperlink_set()
     assert crawler._done_urls == make_hyperlink_set()
 
-    crawler._queue.put("job")
+    crawler._queue.put(make_hyperlink("/job"))
     crawler._seen_urls = make_hyperlink_set(["/hello", "world"])
     crawler._done_urls = make_hyperlink_set(["/this", "/that"])
 
@@ -259,3 +334,552 @@ def test_crawler_multi_threading(crawler_server):
     crawler = Crawler(max_workers=10, timeout=1)
     found_urls = crawler.crawl(crawler_server.url + "/")
     assert found_urls == crawler_server.links
+
+
+def test_crawler_crawl_returns_without_waiting_for_timeout(crawler_server):
+    crawler = Crawler(max_workers=10, timeout=60)
+    start = time.monotonic()
+    found_urls = crawler.crawl(crawler_server.url + "/")
+    assert found_urls == crawler_server.links
+    # links to /error/400 and /error/500 never get done but must not stall the crawl
+    assert time.monotonic() - start < 30
+
+
+class OtherPortWebServer(WebServer):
+    """web server that can run alongside crawler_server"""
+
+    PORT = 9998
+
+
+def test_crawler_crawl_obeys_request_rate():
+    server = OtherPortWebServer(Flask("delay"))
+
+    @server.app.route("/robots.txt")
+    def robots_txt():
+        return "User-agent: *\nRequest-rate: 5/1\n", 200, {"Content-Type": "text/plain"}
+
+    @server.app.route("/")
+    def index():
+        return make_html_from_links(["/a", "/b", "/c"])
+
+    @server.app.route("/<name>")
+    def page(name):
+        return make_html_from_links(["/"])
+
+    with server.run():
+        crawler = Crawler(max_workers=10, timeout=5)
+        start = time.monotonic()
+        found_urls = crawler.crawl(server.url)
+        # 4 pages of one host, each 0.2s apart
+        assert time.monotonic() - start >= 0.6
+        assert found_urls == {server.url + path for path in ["/", "/a", "/b", "/c"]}
+
+
+@pytest.mark.parametrize("obey_robots, cached_hosts", [(True, 1), (False, 0)])
+def test_crawler_crawl_only_fetches_robots_if_obeyed(crawler_server, obey_robots, cached_hosts):
+    crawler = Crawler(obey_robots=obey_robots, timeout=5)
+    assert crawler.crawl(crawler_server.url) == crawler_server.links
+    assert len(crawler._robots) == cached_hosts
+
+
+@pytest.mark.parametrize("max_workers", [1, 10])
+def test_crawler_crawl_with_parse_workers(crawler_server, max_workers):
+    crawler = Crawler(max_workers=max_workers, parse_workers=2, timeout=5)
+    assert crawler.crawl(crawler_server.url) == crawler_server.links
+    assert crawler._parse_pool is None
+
+
+def test_crawler_max_frontier_memory_needs_state_dir():
+    with pytest.raises(ValueError):
+        Crawler(max_frontier_memory=10)
+
+
+@pytest.mark.parametrize("max_frontier_memory", [None, 1])
+def test_crawler_crawl_with_state_dir(crawler_server, tmp_path, max_frontier_memory):
+    state_dir = str(tmp_path)
+    crawler = Crawler(timeout=5, state_dir=state_dir, max_frontier_memory=max_frontier_memory)
+    assert crawler.crawl(crawler_server.url) == crawler_server.links
+
+    seed, seen, done, pending = CrawlState(state_dir).load()
+    assert seed == crawler_server.url + "/"
+    assert done == crawler_server.links
+    assert pending == []
+
+    crawler = Crawler(timeout=5, state_dir=state_dir)
+    assert crawler.resume() == crawler_server.links
+
+
+def test_crawler_resume_crawls_pending_urls(crawler_server, tmp_path, capsys):
+    state = CrawlState(str(tmp_path))
+    state.start(crawler_server.href)
+    for url in [crawler_server.href, crawler_server.href / "hello"]:
+        state.seen(url)
+    state.finish(crawler_server.href, True)
+    state.close()
+
+    crawler = Crawler(timeout=5, state_dir=str(tmp_path))
+    found_urls = crawler.crawl(crawler_server.url, resume=True)
+    # "/" isn't crawled again so only what /hello links to is found
+    assert found_urls == {crawler_server.url + path for path in ["/", "/hello", "/world"]}
+    out = capsys.readouterr().out
+    assert f"CRAWLING: {crawler_server.url}/\n" not in out
+    assert f"CRAWLING: {crawler_server.url}/hello\n" in out
+
+
+def test_crawler_resume_other_seed_fails(crawler_server, tmp_path):
+    state = CrawlState(str(tmp_path))
+    state.start(make_hyperlink("https://www.example.com/"))
+    state.close()
+    with pytest.raises(StateError):
+        Crawler(state_dir=str(tmp_path)).crawl(crawler_server.url, resume=True)
+
+
+@pytest.mark.parametrize("seen_collisions", ["ignore", "check"])
+def test_crawler_crawl_with_compact_seen(crawler_server, seen_collisions):
+    crawler = Crawler(max_workers=10, timeout=5, compact_seen=True, seen_collisions=seen_collisions)
+    assert isinstance(crawler._seen_urls, FingerprintRegistry)
+    assert crawler.crawl(crawler_server.url) == crawler_server.links
+    assert isinstance(crawler._seen_urls, FingerprintRegistry)
+    assert crawler._seen_urls.is_empty()
+
+
+@pytest.mark.parametrize("max_workers", [1, 10])
+def test_crawler_iter_crawl(crawler_server, max_workers):
+    crawler = Crawler(max_workers=max_workers, timeout=5)
+    results = {result.url: result for result in crawler.iter_crawl(crawler_server.url)}
+    assert {url for url, result in results.items() if result.ok} == crawler_server.links
+
+    assert results[crawler_server.url + "/"].depth == 0
+    assert results[crawler_server.url + "/world"].depth == 1
+    assert results[crawler_server.url + "/mime/image/png"].content_type == "image/png"
+    error = results[crawler_server.url + "/error/500"]
+    assert (error.status, error.ok) == (500, False)
+    assert all(result.elapsed >= 0 for result in results.values())
+
+
+def test_crawler_iter_crawl_waits_for_slow_consumer(crawler_server):
+    crawler = Crawler(max_workers=4, timeout=0.5)
+    found_urls = set()
+    for result in crawler.iter_crawl(crawler_server.url, buffer_size=1):
+        # a consumer slower than the timeout must not be taken for a hung crawl
+        if not found_urls:
+            time.sleep(1)
+        if result.ok:
+            found_urls.add(result.url)
+    assert found_urls == crawler_server.links
+
+
+def test_crawler_iter_crawl_close_stops_crawl(crawler_server):
+    crawler = Crawler(max_workers=4, timeout=5)
+    results = crawler.iter_crawl(crawler_server.url, buffer_size=1)
+    assert next(results).url == crawler_server.url + "/"
+    results.close()
+    # the crawler is reset and can crawl again
+    assert crawler._queue.empty()
+    assert crawler.crawl(crawler_server.url) == crawler_server.links
+
+
+@pytest.mark.parametrize("max_workers", [1, 10])
+@pytest.mark.parametrize(
+    "budget, stop_reason, paths",
+    [
+        ({}, "finished", None),
+        ({"max_depth": 0}, "max_depth", ["/"]),
+        ({"max_depth": 2}, "finished", None),
+        ({"max_pages": 1}, "max_pages", ["/"]),
+        ({"max_bytes": 1}, "max_bytes", ["/"]),
+        ({"deadline_seconds": 0}, "deadline", []),
+    ],
+)
+def test_crawler_crawl_budget(crawler_server, max_workers, budget, stop_reason, paths):
+    crawler = Crawler(max_workers=max_workers, timeout=5, **budget)
+    found_urls = crawler.crawl(crawler_server.url)
+    assert crawler.stop_reason == stop_reason
+    if paths is None:
+        assert found_urls == crawler_server.links
+    else:
+        assert found_urls == {crawler_server.url + path for path in paths}
+
+
+def test_crawler_crawl_deadline_returns_partial_results():
+    server = OtherPortWebServer(Flask("deadline"))
+
+    @server.app.route("/robots.txt")
+    def robots_txt():
+        return "User-agent: *\nRequest-rate: 1/1\n", 200, {"Content-Type": "text/plain"}
+
+    @server.app.route("/")
+    def index():
+        return make_html_from_links(["/a", "/b", "/c"])
+
+    @server.app.route("/<name>")
+    def page(name):
+        return make_html_from_links(["/"])
+
+    with server.run():
+        crawler = Crawler(max_workers=10, timeout=5, deadline_seconds=1.5)
+        start = time.monotonic()
+        found_urls = crawler.crawl(server.url)
+        assert time.monotonic() - start < 3
+        assert crawler.stop_reason == "deadline"
+        assert server.url + "/" in found_urls
+        assert len(found_urls) < 4
+
+
+def test_crawler_iter_crawl_close_stop_reason(crawler_server):
+    crawler = Crawler(max_workers=4, timeout=5)
+    results = crawler.iter_crawl(crawler_server.url, buffer_size=1)
+    next(results)
+    results.close()
+    assert crawler.stop_reason == "stopped"
+
+
+@pytest.mark.parametrize("order", ["bfs", "dfs", "depth-weighted", "best-first"])
+def test_crawler_crawl_order(crawler_server, order):
+    crawler = Crawler(max_workers=4, timeout=5, order=order)
+    results = list(crawler.iter_crawl(crawler_server.url))
+    assert {result.url for result in results if result.ok} == crawler_server.links
+    assert results[0].new_links == 7
+
+
+def test_crawler_crawl_best_first_learns_yield(crawler_server):
+    crawler = Crawler(timeout=5, order="best-first")
+    crawler.crawl(crawler_server.url)
+    # "/" found every link, "/mime/..." and "/error/..." found none
+    assert crawler._order.link_yield("/") > crawler._order.link_yield("/mime/image/")
+
+
+def conditional_site():
+    """
+    a server with pages that answer conditional requests, the list of paths
+    whose bodies were sent and the dict of the ETag of /etag
+    """
+    server = OtherPortWebServer(Flask("conditional"))
+    sent, version = [], {"etag": "v1"}
+
+    @server.app.route("/")
+    def index():
+        return make_html_from_links(["/etag", "/modified"])
+
+    @server.app.route("/etag")
+    def etag():
+        response = make_response(make_html_from_links([f"/page/{version['etag']}"]))
+        response.set_etag(version["etag"])
+        return response.make_conditional(request)
+
+    @server.app.route("/modified")
+    def modified():
+        response = make_response(make_html_from_links(["/page/modified"]))
+        response.last_modified = datetime(2020, 1, 1)
+        return response.make_conditional(request)
+
+    @server.app.route("/page/<name>")
+    def page(name):
+        return make_html_from_links([])
+
+    @server.app.after_request
+    def record(response):
+        if request.method == "GET" and response.status_code == 200:
+            sent.append(request.path)
+        return response
+
+    return server, sent, version
+
+
+def test_crawler_recrawl_with_validators_dir(tmp_path):
+    server, sent, version = conditional_site()
+    paths = ["/", "/etag", "/modified", "/page/modified", "/page/v1"]
+    with server.run():
+        found_urls = Crawler(timeout=5, validators_dir=str(tmp_path)).crawl(server.url)
+        assert found_urls == {server.url + path for path in paths}
+
+        sent.clear()
+        crawler = Crawler(timeout=5, validators_dir=str(tmp_path))
+        results = {result.url: result for result in crawler.iter_crawl(server.url)}
+        assert set(results) == found_urls
+        # pages with an ETag or Last-Modified aren't sent again, but what was found on them is
+        assert sorted(sent) == ["/", "/page/modified", "/page/v1"]
+        for path in ["/etag", "/modified"]:
+            assert results[server.url + path][1:3] == (304, None)
+            assert results[server.url + path].size == 0
+            assert results[server.url + path].new_links == 1
+
+        # a page that changed is sent and parsed again
+        version["etag"] = "v2"
+        found_urls = Crawler(timeout=5, validators_dir=str(tmp_path)).crawl(server.url)
+        assert server.url + "/page/v2" in found_urls
+        assert server.url + "/page/v1" not in found_urls
+
+
+def test_crawler_recrawl_skips_parsing_unchanged_content(tmp_path, monkeypatch):
+    server, _, _ = conditional_site()
+    parsed = []
+    hrefs_from_response = Crawler._hrefs_from_response
+
+    def record_parse(self, resp):
+        parsed.append(resp.url)
+        return hrefs_from_response(self, resp)
+
+    monkeypatch.setattr(Crawler, "_hrefs_from_response", record_parse)
+    with server.run():
+        first = Crawler(timeout=5, validators_dir=str(tmp_path)).crawl(server.url)
+        assert len(parsed) == 5
+
+        parsed.clear()
+        assert Crawler(timeout=5, validators_dir=str(tmp_path)).crawl(server.url) == first
+        # pages without validators are sent, but with the same content hash they aren't parsed
+        assert parsed == []
+
+
+def redirect_site():
+    """a server where /old redirects to /new, and the list of paths of every GET"""
+    server = OtherPortWebServer(Flask("redirects"))
+    sent = []
+
+    @server.app.route("/")
+    def index():
+        return make_html_from_links(["/old"])
+
+    @server.app.route("/old")
+    def old():
+        return redirect("/new")
+
+    @server.app.route("/new")
+    def new():
+        return make_html_from_links(["/", "/other", "page"])
+
+    @server.app.route("/other")
+    def other():
+        return make_html_from_links(["/old", "/new"])
+
+    @server.app.route("/page")
+    def page():
+        return make_html_from_links([])
+
+    @server.app.before_request
+    def record():
+        if request.method == "GET":
+            sent.append(request.path)
+
+    return server, sent
+
+
+def test_crawler_crawl_follows_redirect_once():
+    server, sent = redirect_site()
+    with server.run():
+        results = {result.url: result for result in Crawler(timeout=5).iter_crawl(server.url)}
+
+    paths = ["/", "/old", "/new", "/other", "/page"]
+    assert set(results) == {server.url + path for path in paths}
+    # /new is crawled as itself when /old redirects to it, so the link on /other isn't fetched
+    assert sent.count("/new") == 1
+    old, new = results[server.url + "/old"], results[server.url + "/new"]
+    assert (old.status, old.redirect, old.new_links) == (302, server.url + "/new", 1)
+    assert (new.status, new.redirect, new.new_links) == (200, None, 2)
+
+
+def test_crawler_crawl_skips_known_redirects():
+    server, sent = redirect_site()
+    crawler = Crawler(timeout=5)
+    with server.run():
+        crawler.crawl(server.url)
+        sent.clear()
+        found_urls = crawler.crawl(server.url)
+
+    # links to /old are taken as links to /new without fetching /old again
+    assert found_urls == {server.url + path for path in ["/", "/new", "/other", "/page"]}
+    assert "/old" not in sent
+    assert crawler._redirects.edges() == [(server.url + "/old", server.url + "/new")]
+
+
+def test_crawler_crawl_record_redirects():
+    server, sent = redirect_site()
+    with server.run():
+        crawler = Crawler(timeout=5, record_redirects=True)
+        results = {result.url: result for result in crawler.iter_crawl(server.url)}
+
+    old = results[server.url + "/old"]
+    assert (old.status, old.redirect, old.new_links) == (302, server.url + "/new", 1)
+    assert results[server.url + "/new"].status == 200
+    assert sent.count("/new") == 1
+
+
+def flaky_site(failures: int = 2, retry_after: str = "0"):
+    """a server whose /flaky is 503 (with a Retry-After) failures times, then fine"""
+    server = OtherPortWebServer(Flask("flaky"))
+    sent = []
+
+    @server.app.route("/")
+    def index():
+        return make_html_from_links(["/flaky", "/missing"])
+
+    @server.app.route("/flaky")
+    def flaky():
+        sent.append("/flaky")
+        if len(sent) <= failures:
+            return "", 503, {"Retry-After": retry_after}
+        return make_html_from_links(["/page"])
+
+    @server.app.route("/page")
+    def page():
+        return make_html_from_links([])
+
+    return server, sent
+
+
+def test_crawler_crawl_retries():
+    server, sent = flaky_site()
+    crawler = Crawler(timeout=5, max_retries=2, retry_backoff=0.01)
+    with server.run():
+        found_urls = crawler.crawl(server.url)
+
+    assert found_urls == {server.url + path for path in ["/", "/flaky", "/page"]}
+    assert len(sent) == 3
+    assert crawler.errors.errors_of(make_hyperlink(server.url + "/flaky")) == [503, 503]
+    assert crawler.errors.by_host() == {"0.0.0.0:9998": {503: 2, 404: 1}}
+
+
+def test_crawler_crawl_retries_count_once_against_max_pages():
+    server, sent = flaky_site()
+    crawler = Crawler(timeout=5, max_retries=2, retry_backoff=0.01, max_pages=4)
+    with server.run():
+        results = {result.url: result for result in crawler.iter_crawl(server.url)}
+
+    # 6 tries of 4 urls
+    assert len(sent) == 3
+    assert set(results) == {server.url + path for path in ["/", "/flaky", "/missing", "/page"]}
+    assert crawler.stop_reason == "max_pages"
+
+
+def test_crawler_crawl_gives_up_retrying():
+    server, sent = flaky_site(failures=5)
+    crawler = Crawler(timeout=5, max_retries=1, retry_backoff=0.01)
+    with server.run():
+        results = {result.url: result for result in crawler.iter_crawl(server.url)}
+
+    # only the last try of a url is a result
+    assert len(sent) == 2
+    assert results[server.url + "/flaky"].status == 503
+    assert server.url + "/page" not in results
+
+
+def test_crawler_crawl_no_retries():
+    server, sent = flaky_site()
+    crawler = Crawler(timeout=5)
+    with server.run():
+        assert crawler.crawl(server.url) == {server.url + "/"}
+    assert len(sent) == 1
+    assert len(crawler.errors) == 2
+
+
+def test_crawler_crawl_retry_after_too_long():
+    server, sent = flaky_site(retry_after="3600")
+    crawler = Crawler(timeout=5, max_retries=2, retry_backoff=0.01)
+    with server.run():
+        crawler.crawl(server.url)
+    assert len(sent) == 1
+
+
+def test_crawler_crawl_retries_connection_errors():
+    crawler = Crawler(timeout=5, max_retries=2, retry_backoff=0.01, obey_robots=False)
+    # nothing is listening on this port
+    assert crawler.crawl("http://127.0.0.1:9997") == set()
+    assert crawler.errors.by_host() == {"127.0.0.1:9997": {"ConnectionError": 3}}
+
+
+def test_crawler_crawl_events(crawler_server):
+    sink = ListSink()
+    url = crawler_server.url + "/hello"
+    Crawler(timeout=5, max_pages=1, events=sink).crawl(url)
+    assert sink.events == [
+        (CRAWLING, url, {}),
+        (VISITED, url, {}),
+        (FOUND, url, {"href": make_hyperlink("/world")}),
+    ]
+
+
+@pytest.mark.parametrize("verbosity, lines", [(0, 0), (1, 0), (2, 2), (3, 3)])
+def test_crawler_crawl_verbosity(crawler_server, capsys, verbosity, lines):
+    Crawler(timeout=5, max_pages=1, verbosity=verbosity).crawl(crawler_server.url + "/hello")
+    assert len(capsys.readouterr().out.splitlines()) == lines
+
+
+def test_crawler_crawl_events_jsonl(crawler_server, tmp_path, capsys):
+    path = str(tmp_path / "events.jsonl")
+    Crawler(timeout=5, max_pages=1, events_jsonl=path).crawl(crawler_server.url + "/hello")
+    assert capsys.readouterr().out == ""
+    events = [json.loads(line) for line in open(path)]
+    assert [event["event"] for event in events] == [CRAWLING, VISITED, FOUND]
+    assert events[2]["href"] == "/world"
+
+
+def test_crawler_stats(crawler_server):
+    crawler = Crawler(timeout=5)
+    stats = crawler.stats()
+    assert (stats["pages"], stats["frontier"], stats["in_flight"]) == (0, 0, 0)
+
+    crawler.crawl(crawler_server.url)
+    stats = crawler.stats()
+    assert stats["pages"] == 8
+    assert stats["pages_per_sec"] > 0
+    assert stats["bytes"] > 0
+    assert stats["status_codes"] == {200: 6, 400: 1, 500: 1}
+    assert stats["errors"] == 2
+    assert (stats["frontier"], stats["in_flight"]) == (0, 0)
+    fetches = stats["fetch_seconds"]["0.0.0.0:9999"]
+    assert fetches["count"] == 8
+    assert 0 < fetches["p50"] <= fetches["p99"]
+    # pages that aren't html aren't parsed
+    assert stats["parse_seconds"]["count"] == 3
+
+
+def test_crawler_metrics_port():
+    server = OtherPortWebServer(Flask("metrics"))
+    crawler = Crawler(timeout=5, metrics_port=0)
+    scraped = []
+
+    @server.app.route("/")
+    def index():
+        return make_html_from_links(["/page"])
+
+    @server.app.route("/page")
+    def page():
+        # scrape the metrics while the crawl is running
+        host, port = crawler._metrics_server.address
+        scraped.append(requests.get(f"http://{host}:{port}/metrics").text)
+        return make_html_from_links([])
+
+    with server.run():
+        crawler.crawl(server.url)
+
+    assert "# TYPE crawler_pages_total counter\ncrawler_pages_total 1\n" in scraped[0]
+    assert 'crawler_responses_total{status="200"} 1\n' in scraped[0]
+    assert "crawler_in_flight 1\n" in scraped[0]
+    # /page is still being fetched, so only / was timed
+    assert 'crawler_fetch_seconds_count{host="0.0.0.0:9998"} 1\n' in scraped[0]
+    assert crawler._metrics_server is None
+
+
+def test_crawler_profile_dir(crawler_server, tmpdir):
+    crawler = Crawler(timeout=5, profile_dir=str(tmpdir))
+    crawler.crawl(crawler_server.url)
+
+    stages = crawler.profile.stages()
+    for stage in ("crawl_url", "fetch.headers", "fetch.body", "parse", "normalise", "dedupe"):
+        assert stage in stages
+    assert stages["crawl_url"]["count"] == 8
+    assert stages["dispatch.wait_url"]["count"] >= 8
+    # the profile of a crawl is only kept while it runs
+    assert crawler._tracer.__class__.__name__ == "NoTracer"
+
+    with open(tmpdir.join(TRACE_FILE)) as file:
+        events = json.load(file)["traceEvents"]
+    assert {event["name"] for event in events} >= set(stages)
+    assert "crawl_url" in tmpdir.join(STAGES_FILE).read()
+
+
+def test_crawler_profile_dir_invalid():
+    with pytest.raises(ValueError):
+        Crawler(profile_cprofile=True)
+    with pytest.raises(ValueError):
+        Crawler(profile_memory=True)
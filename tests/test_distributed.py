@@ -0,0 +1,216 @@
+import multiprocessing
+import socket
+import threading
+
+import pytest
+
+from simple_crawler.budget import FINISHED
+from simple_crawler.budget import MAX_PAGES
+from simple_crawler.budget import TIMED_OUT
+from simple_crawler.distributed import Coordinator
+from simple_crawler.distributed import CrawlWorker
+from simple_crawler.distributed import parse_address
+from simple_crawler.distributed import read_message
+from simple_crawler.distributed import send_message
+from tests.test_crawler import crawler_server  # noqa: F401
+from tests.test_crawler import flaky_site
+from tests.test_crawler import redirect_site
+
+
+@pytest.fixture
+def coordinator():
+    with Coordinator(port=0, timeout=5) as coordinator:
+        yield coordinator
+
+
+def coordinator_address(coordinator: Coordinator) -> str:
+    return "{}:{}".format(*coordinator.address)
+
+
+def run_worker(address: str, **kwargs) -> int:
+    return CrawlWorker(address, timeout=5, **kwargs).work()
+
+
+def start_workers(address: str, n: int, **kwargs) -> list:
+    threads = [
+        threading.Thread(target=run_worker, args=(address,), kwargs=kwargs, daemon=True)
+        for _ in range(n)
+    ]
+    for thread in threads:
+        thread.start()
+    return threads
+
+
+class FakeWorker:
+    """a worker that leases urls over a raw connection and never reports them"""
+
+    def __init__(self, address):
+        self.sock = socket.create_connection(address, timeout=5)
+        self.stream = self.sock.makefile("rwb")
+
+    def send(self, message: dict) -> dict:
+        send_message(self.stream, message)
+        return read_message(self.stream)
+
+    def lease(self, size: int = 100) -> dict:
+        while True:
+            reply = self.send({"op": "lease", "size": size})
+            if "wait" not in reply:
+                return reply
+
+    def close(self):
+        self.stream.close()
+        self.sock.close()
+
+
+@pytest.mark.parametrize("address", ["localhost", "localhost:", ":80", "localhost:http"])
+def test_parse_address_invalid(address):
+    with pytest.raises(ValueError):
+        parse_address(address)
+
+
+@pytest.mark.parametrize("kwarg", ["validators_dir", "replay"])
+def test_coordinator_invalid(tmpdir, kwarg):
+    with pytest.raises(ValueError):
+        Coordinator(port=0, **{kwarg: str(tmpdir)})
+
+
+@pytest.mark.parametrize("workers", [1, 3])
+def test_coordinator_crawl_find_all_links(crawler_server, coordinator, workers):  # noqa: F811
+    threads = start_workers(coordinator_address(coordinator), workers, max_workers=2)
+    assert coordinator.crawl(crawler_server.url) == crawler_server.links
+    assert coordinator.stop_reason == FINISHED
+    for thread in threads:
+        thread.join(timeout=5)
+        assert not thread.is_alive()
+
+
+def test_coordinator_crawl_worker_processes(crawler_server, coordinator):  # noqa: F811
+    address = coordinator_address(coordinator)
+    processes = [
+        multiprocessing.Process(target=run_worker, args=(address,), kwargs={"max_workers": 2})
+        for _ in range(2)
+    ]
+    for process in processes:
+        process.start()
+
+    assert coordinator.crawl(crawler_server.url) == crawler_server.links
+    for process in processes:
+        process.join(timeout=5)
+        assert process.exitcode == 0
+
+
+def test_coordinator_iter_crawl(crawler_server, coordinator):  # noqa: F811
+    start_workers(coordinator_address(coordinator), 2)
+    results = list(coordinator.iter_crawl(crawler_server.url))
+    assert {result.url for result in results if result.ok} == crawler_server.links
+    # each url is leased until it is reported once
+    assert len(results) == len({result.url for result in results})
+    found = {result.url: result for result in results}
+    assert found[crawler_server.url + "/"].new_links == 7
+    assert found[crawler_server.url + "/error/500"].status == 500
+
+
+def test_coordinator_lease_expires(crawler_server):  # noqa: F811
+    with Coordinator(port=0, timeout=5, lease_ttl=0.2) as coordinator:
+        thread = threading.Thread(target=coordinator.crawl, args=(crawler_server.url,))
+        thread.start()
+
+        # a worker that leases the first url and then hangs
+        fake = FakeWorker(coordinator.address)
+        lease = fake.lease()
+        assert lease["urls"] == [[crawler_server.url + "/", 0]]
+
+        start_workers(coordinator_address(coordinator), 1)
+        thread.join(timeout=10)
+        assert coordinator.stop_reason == FINISHED
+
+        # a report of an expired lease is turned down
+        assert fake.send({"op": "report", "lease": lease["lease"], "results": []}) == {"ok": False}
+        assert fake.lease() == {"done": True}
+        fake.close()
+
+
+def test_coordinator_worker_disconnects(crawler_server, coordinator):  # noqa: F811
+    thread = threading.Thread(target=coordinator.crawl, args=(crawler_server.url,))
+    thread.start()
+
+    # a worker that leases the first url and dies, long before its lease would expire
+    fake = FakeWorker(coordinator.address)
+    assert fake.lease()["urls"] == [[crawler_server.url + "/", 0]]
+    fake.close()
+
+    start_workers(coordinator_address(coordinator), 1)
+    thread.join(timeout=10)
+    assert coordinator.stop_reason == FINISHED
+
+
+def test_coordinator_unknown_op(coordinator):
+    fake = FakeWorker(coordinator.address)
+    assert fake.send({"op": "hello"}) == {"error": "unknown op 'hello'"}
+    fake.close()
+
+
+def test_coordinator_max_pages(crawler_server):  # noqa: F811
+    with Coordinator(port=0, timeout=5, max_pages=2) as coordinator:
+        start_workers(coordinator_address(coordinator), 2)
+        results = list(coordinator.iter_crawl(crawler_server.url))
+        # which url is crawled second depends on the order of the set of links
+        # found, but not how many urls are crawled (found or not)
+        assert len(results) == 2
+        assert results[0].url == crawler_server.url + "/"
+        assert coordinator.stop_reason == MAX_PAGES
+
+
+def test_coordinator_retries():
+    server, sent = flaky_site()
+    with server.run(), Coordinator(
+        port=0, timeout=5, max_retries=2, retry_backoff=0.01
+    ) as coordinator:
+        start_workers(coordinator_address(coordinator), 2)
+        found_urls = coordinator.crawl(server.url)
+
+    assert found_urls == {server.url + path for path in ["/", "/flaky", "/page"]}
+    assert len(sent) == 3
+    assert coordinator.errors.by_host() == {"0.0.0.0:9998": {503: 2, 404: 1}}
+
+
+def test_coordinator_follows_redirect_once():
+    server, sent = redirect_site()
+    with server.run(), Coordinator(port=0, timeout=5) as coordinator:
+        start_workers(coordinator_address(coordinator), 2)
+        results = {result.url: result for result in coordinator.iter_crawl(server.url)}
+
+    paths = ["/", "/old", "/new", "/other", "/page"]
+    assert set(results) == {server.url + path for path in paths}
+    # /new is visited as itself when /old redirects to it, so the link on /other isn't fetched
+    assert sent.count("/new") == 1
+    old, new = results[server.url + "/old"], results[server.url + "/new"]
+    assert (old.status, old.redirect, old.new_links) == (302, server.url + "/new", 1)
+    assert (new.status, new.redirect, new.new_links) == (200, None, 2)
+
+
+def test_coordinator_times_out_without_workers(crawler_server):  # noqa: F811
+    with Coordinator(port=0, timeout=0.2) as coordinator:
+        assert coordinator.crawl(crawler_server.url) == set()
+        assert coordinator.stop_reason == TIMED_OUT
+
+
+def test_coordinator_config(coordinator):
+    assert coordinator.config["address"] == coordinator_address(coordinator)
+    assert coordinator.config["lease_ttl"] == 60.0
+
+
+def test_crawl_worker_config():
+    worker = CrawlWorker("127.0.0.1:8765", max_workers=4)
+    assert worker.address == ("127.0.0.1", 8765)
+    assert worker.config["coordinator"] == "127.0.0.1:8765"
+    assert worker.config["lease_size"] == 4
+
+
+def test_crawl_worker_no_coordinator():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        address = "{}:{}".format(*sock.getsockname())
+    with pytest.raises(OSError):
+        CrawlWorker(address, timeout=0.2).work()
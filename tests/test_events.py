@@ -0,0 +1,99 @@
+import io
+import json
+import random
+
+import pytest
+
+from simple_crawler.events import ConsoleSink
+from simple_crawler.events import CRAWLING
+from simple_crawler.events import ERROR
+from simple_crawler.events import FOUND
+from simple_crawler.events import JsonLinesSink
+from simple_crawler.events import make_sink
+from simple_crawler.events import NullSink
+from simple_crawler.events import VISITED
+from simple_crawler.hyperlink import make_hyperlink
+
+URL = make_hyperlink("https://www.example.com/")
+
+
+def test_console_sink_writes_lines():
+    stream = io.StringIO()
+    sink = ConsoleSink(stream)
+    # written as it comes while not started
+    sink.emit(CRAWLING, URL)
+    assert stream.getvalue() == "CRAWLING: https://www.example.com/\n"
+
+    with sink:
+        sink.emit(FOUND, URL, href="/hello")
+        sink.emit(ERROR, URL, error=ValueError("400 BAD REQUEST"))
+    assert stream.getvalue().splitlines()[1:] == [
+        "FOUND: /hello ON https://www.example.com/",
+        "ERROR: 400 BAD REQUEST ON https://www.example.com/",
+    ]
+
+
+def test_console_sink_batches_writes():
+    class Stream(io.StringIO):
+        writes = 0
+
+        def write(self, text):
+            self.writes += 1
+            return super().write(text)
+
+    stream = Stream()
+    sink = ConsoleSink(stream, batch_size=100)
+    sink.start()
+    with sink._lock:
+        # the writer is held up, so every event is queued
+        for i in range(250):
+            sink.emit(FOUND, URL, href=f"/{i}")
+    sink.close()
+    assert len(stream.getvalue().splitlines()) == 250
+    assert stream.writes <= 4
+
+
+def test_sink_verbosity():
+    stream = io.StringIO()
+    sink = ConsoleSink(stream, verbosity=2)
+    assert sink.wants(VISITED)
+    assert not sink.wants(FOUND)
+    sink.emit(FOUND, URL, href="/hello")
+    sink.emit(VISITED, URL)
+    assert stream.getvalue() == "VISITED: https://www.example.com/\n"
+
+
+def test_sink_found_sample():
+    stream = io.StringIO()
+    sink = ConsoleSink(stream, found_sample=0.25, rng=random.Random(0))
+    for i in range(1000):
+        sink.emit(FOUND, URL, href=f"/{i}")
+        sink.emit(VISITED, URL)
+    lines = stream.getvalue().splitlines()
+    assert lines.count("VISITED: https://www.example.com/") == 1000
+    assert 150 < len(lines) - 1000 < 350
+
+    with pytest.raises(ValueError):
+        ConsoleSink(found_sample=2)
+
+
+def test_json_lines_sink(tmp_path):
+    path = str(tmp_path / "events.jsonl")
+    with JsonLinesSink(path) as sink:
+        sink.emit(FOUND, URL, href=make_hyperlink("https://www.example.com/hello"))
+    sink.emit(VISITED, URL)
+
+    events = [json.loads(line) for line in open(path)]
+    assert [event["event"] for event in events] == [FOUND, VISITED]
+    assert events[0]["url"] == "https://www.example.com/"
+    assert events[0]["href"] == "https://www.example.com/hello"
+    assert isinstance(events[0]["time"], float)
+
+
+def test_make_sink(tmp_path):
+    assert isinstance(make_sink(0), NullSink)
+    assert not make_sink(0).wants(ERROR)
+    assert isinstance(make_sink(1), ConsoleSink)
+    sink = make_sink(2, 0.5, str(tmp_path / "events.jsonl"))
+    assert isinstance(sink, JsonLinesSink)
+    assert (sink.verbosity, sink.found_sample) == (2, 0.5)
@@ -0,0 +1,106 @@
+import threading
+
+import pytest
+
+from simple_crawler.fingerprint import FingerprintRegistry
+from simple_crawler.fingerprint import FingerprintTable
+from simple_crawler.hyperlink import make_hyperlink
+
+LINKS = ["/", "/hello", "/world", "https://www.example.com/", "https://www.example.com/hello"]
+
+
+@pytest.mark.parametrize("shards", [1, 2, 64])
+@pytest.mark.parametrize("collisions", ["ignore", "check"])
+def test_fingerprint_registry_add_if_absent(shards, collisions):
+    registry = FingerprintRegistry(shards=shards, collisions=collisions)
+    assert registry.is_empty()
+    for link in LINKS:
+        assert registry.add_if_absent(make_hyperlink(link)) is True
+    for link in LINKS:
+        assert registry.add_if_absent(make_hyperlink(link)) is False
+        assert make_hyperlink(link) in registry
+    assert len(registry) == len(LINKS)
+    assert registry.is_not_empty()
+    assert make_hyperlink("/not/there") not in registry
+    assert registry.collisions == 0
+
+
+def test_fingerprint_registry_errors():
+    with pytest.raises(TypeError):
+        FingerprintRegistry().add("/hello")
+
+    with pytest.raises(ValueError):
+        FingerprintRegistry(shards=0)
+
+    with pytest.raises(ValueError):
+        FingerprintRegistry(collisions="hope")
+
+    with pytest.raises(ValueError):
+        FingerprintTable(max_load=1)
+
+
+@pytest.mark.parametrize("check_collisions", [True, False])
+def test_fingerprint_table_grows(check_collisions):
+    table = FingerprintTable(capacity=4, max_load=0.5, check_collisions=check_collisions)
+    assert table.capacity == 4
+    keys = list(range(1, 101))
+    assert all(table.add_fingerprint(key, key * 2) for key in keys)
+    assert not any(table.add_fingerprint(key, key * 2) for key in keys)
+    assert all(table.has_fingerprint(key, key * 2) for key in keys)
+    assert not table.has_fingerprint(101, 202)
+    assert len(table) == 100
+    assert table.capacity == 256
+    assert table.memory_usage() == 256 * 8 * (2 if check_collisions else 1)
+
+
+def test_fingerprint_table_collisions():
+    checked = FingerprintTable(check_collisions=True)
+    assert checked.add_fingerprint(7, 1) is True
+    # same fingerprint but a different check is a different url
+    assert checked.add_fingerprint(7, 2) is True
+    assert checked.has_fingerprint(7, 2)
+    assert not checked.has_fingerprint(7, 3)
+    assert checked.collisions == 1
+    assert len(checked) == 2
+
+    # the table growing doesn't count collisions again
+    grows = FingerprintTable(capacity=4, max_load=0.5, check_collisions=True)
+    assert grows.add_fingerprint(7, 1) and grows.add_fingerprint(7, 2)
+    assert all(grows.add_fingerprint(key, key) for key in range(8, 100))
+    assert grows.capacity == 256
+    assert grows.collisions == 1
+    assert grows.has_fingerprint(7, 1) and grows.has_fingerprint(7, 2)
+
+    ignored = FingerprintTable()
+    assert ignored.add_fingerprint(7, 1) is True
+    assert ignored.add_fingerprint(7, 2) is False
+    assert ignored.collisions == 0
+
+
+def test_fingerprint_registry_memory_usage():
+    registry = FingerprintRegistry(shards=1, capacity=1024)
+    for i in range(10000):
+        registry.add(make_hyperlink(f"https://www.example.com/page/{i}"))
+    assert len(registry) == 10000
+    # 16384 slots of 8 bytes each
+    assert registry.memory_usage() == 16384 * 8
+
+
+def test_fingerprint_registry_add_if_absent_is_atomic():
+    registry = FingerprintRegistry(shards=4, capacity=2)
+    links = [make_hyperlink(f"/page/{i}") for i in range(1000)]
+    new = []
+    barrier = threading.Barrier(8)
+
+    def worker():
+        barrier.wait()
+        new.extend(link for link in links if registry.add_if_absent(link))
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(map(str, new)) == sorted(map(str, links))
+    assert len(registry) == len(links)
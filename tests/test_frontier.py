@@ -0,0 +1,219 @@
+import queue
+import threading
+import time
+
+import pytest
+
+from simple_crawler.frontier import Frontier
+from simple_crawler.hyperlink import make_hyperlink
+from simple_crawler.ordering import BestFirst
+from simple_crawler.ordering import make_order
+
+A = [make_hyperlink(f"https://a.example.com/{i}") for i in range(3)]
+B = [make_hyperlink(f"https://b.example.com/{i}") for i in range(3)]
+
+
+def test_frontier_put_get_task_done():
+    frontier = Frontier()
+    assert frontier.empty()
+    assert frontier.get(timeout=0) is None
+
+    for url in A:
+        frontier.put(url)
+    assert len(frontier) == 3
+    assert frontier.outstanding == 3
+
+    assert [frontier.get(timeout=0) for _ in A] == A
+    assert frontier.empty()
+    for url in A:
+        frontier.task_done(url)
+    assert frontier.outstanding == 0
+    assert frontier.get(timeout=0) is None
+
+
+def test_frontier_times_out_when_urls_are_outstanding():
+    frontier = Frontier()
+    frontier.put(A[0])
+    assert frontier.get(timeout=0) == A[0]
+    # A[0] is never finished (hung request)
+    assert frontier.get(timeout=0.05) is None
+
+
+def test_frontier_max_per_host():
+    frontier = Frontier(max_per_host=1)
+    for url in A + B:
+        frontier.put(url)
+
+    first, second = frontier.get_nowait(), frontier.get_nowait()
+    assert {frontier.host(first), frontier.host(second)} == {"a.example.com", "b.example.com"}
+    # both hosts are at capacity
+    with pytest.raises(Exception):
+        frontier.get_nowait()
+
+    frontier.task_done(first)
+    assert frontier.host(frontier.get_nowait()) == frontier.host(first)
+
+
+def test_frontier_delay_does_not_block_other_hosts():
+    frontier = Frontier()
+    frontier.set_delay("a.example.com", 60)
+    for url in A + B:
+        frontier.put(url)
+
+    got = [frontier.get(timeout=0) for _ in range(4)]
+    # one url from a (which then cools down) and every url from b
+    assert got.count(A[0]) == 1
+    assert [url for url in got if url in B] == B
+    assert 0 < frontier.next_ready_in() <= 60
+
+
+def test_frontier_delay_releases_host_when_timer_expires():
+    frontier = Frontier(default_delay=0.1)
+    for url in A:
+        frontier.put(url)
+
+    start = time.monotonic()
+    assert [frontier.get(timeout=0) for _ in A] == A
+    # timeout doesn't apply while a host is cooling down
+    assert time.monotonic() - start >= 0.2
+
+
+def test_frontier_get_wakes_on_put():
+    frontier = Frontier()
+    frontier.put(A[0])
+    assert frontier.get() == A[0]
+
+    def put_later():
+        time.sleep(0.05)
+        frontier.put(A[1])
+
+    threading.Thread(target=put_later).start()
+    assert frontier.get(timeout=5) == A[1]
+
+
+def test_frontier_max_per_host_value_error():
+    with pytest.raises(ValueError):
+        Frontier(max_per_host=0)
+
+
+class ListSpill:
+    def __init__(self):
+        self.urls = []
+
+    def push(self, url, depth=0):
+        self.urls.append((str(url), depth))
+
+    def pop_batch(self, size):
+        batch, self.urls = self.urls[:size], self.urls[size:]
+        return batch
+
+
+def test_frontier_spill():
+    with pytest.raises(ValueError):
+        Frontier(spill=ListSpill())
+
+    spill = ListSpill()
+    frontier = Frontier(spill=spill, max_in_memory=2)
+    for url in A + B:
+        frontier.put(url)
+    assert len(frontier) == 6
+    assert spill.urls == [(str(url), 0) for url in A[2:] + B]
+
+    got = []
+    while len(got) < 6:
+        url = frontier.get(timeout=0)
+        got.append(url)
+        frontier.task_done(url)
+    assert sorted(got, key=str) == sorted(A + B, key=str)
+    assert spill.urls == []
+    assert frontier.get(timeout=0) is None
+
+
+def test_frontier_depth_of():
+    frontier = Frontier()
+    frontier.put(A[0])
+    frontier.put(A[1], depth=3)
+    assert frontier.get(timeout=0) == A[0]
+    assert frontier.get(timeout=0) == A[1]
+    assert frontier.depth_of(A[0]) == 0
+    assert frontier.depth_of(A[1]) == 3
+    frontier.task_done(A[1])
+    assert frontier.depth_of(A[1]) == 0
+
+
+def test_frontier_order_within_host():
+    urls = [make_hyperlink(f"https://a.example.com/{i}") for i in range(4)]
+    depths = [2, 0, 1, 0]
+
+    bfs = Frontier(order=make_order("bfs"))
+    dfs = Frontier(order=make_order("dfs"))
+    for url, depth in zip(urls, depths):
+        bfs.put(url, depth)
+        dfs.put(url, depth)
+
+    assert [bfs.get(timeout=0) for _ in urls] == [urls[1], urls[3], urls[2], urls[0]]
+    assert [dfs.get(timeout=0) for _ in urls] == [urls[0], urls[2], urls[3], urls[1]]
+
+
+def test_frontier_order_across_hosts():
+    frontier = Frontier(order=make_order("bfs"))
+    frontier.put(A[0], depth=3)
+    frontier.put(B[0], depth=1)
+    assert frontier.get(timeout=0) == B[0]
+    assert frontier.get(timeout=0) == A[0]
+
+
+def test_frontier_best_first_rescores_queued_urls():
+    order = BestFirst()
+    frontier = Frontier(order=order)
+    low = make_hyperlink("https://a.example.com/low/1")
+    high = make_hyperlink("https://a.example.com/high/1")
+    frontier.put(low)
+    frontier.put(high)
+    # learnt after both were queued, so /low/ must be put back behind /high/
+    order.record("https://a.example.com/low/0", 0)
+    order.record("https://a.example.com/high/0", 50)
+    assert frontier.get(timeout=0) == high
+    assert frontier.get(timeout=0) == low
+
+
+def test_frontier_retry():
+    frontier = Frontier()
+    frontier.put(A[0], depth=2)
+    assert frontier.get(timeout=0) == A[0]
+    frontier.retry(A[0], 0.05)
+
+    # still outstanding, so get waits for it rather than returning None
+    assert frontier.outstanding == 1
+    assert len(frontier) == 1
+    assert not frontier.empty()
+    with pytest.raises(queue.Empty):
+        frontier.get_nowait()
+    assert 0 < frontier.next_ready_in() <= 0.05
+    assert frontier.get(timeout=0) == A[0]
+    assert frontier.depth_of(A[0]) == 2
+    frontier.task_done(A[0])
+    assert frontier.get(timeout=0) is None
+
+
+def test_frontier_retry_doesnt_hold_up_host():
+    frontier = Frontier(max_per_host=1)
+    frontier.put(A[0])
+    frontier.put(A[1])
+    assert frontier.get(timeout=0) == A[0]
+    frontier.retry(A[0], 10)
+    # A[0] gave up its slot while it waits
+    assert frontier.get(timeout=0) == A[1]
+
+
+def test_frontier_in_flight():
+    frontier = Frontier()
+    frontier.put(A[0])
+    frontier.put(B[0])
+    assert frontier.in_flight() == 0
+    url = frontier.get(timeout=0)
+    assert frontier.in_flight() == 1
+    frontier.retry(url, 10)
+    assert frontier.in_flight() == 0
+    frontier.task_done(frontier.get(timeout=0))
+    assert frontier.in_flight() == 0
@@ -1,7 +1,18 @@
+import pickle
+import urllib.parse
+
 import pytest
 
+from simple_crawler.hyperlink import LINK_CACHE
+from simple_crawler.hyperlink import LinkPipeline
 from simple_crawler.hyperlink import make_hyperlink
 from simple_crawler.hyperlink import make_hyperlink_set
+from simple_crawler.url_normalisation import normalise_authority
+from simple_crawler.url_normalisation import normalise_fragment
+from simple_crawler.url_normalisation import normalise_path
+from simple_crawler.url_normalisation import normalise_query
+from simple_crawler.url_normalisation import normalise_scheme
+from simple_crawler.url_normalisation import normalise_url
 
 
 @pytest.mark.parametrize(
@@ -137,6 +148,50 @@ def test_hyperlink_normalisation(input_link, output_result):
     assert make_hyperlink(input_link).url == output_result
 
 
+@pytest.mark.parametrize(
+    "input_link",
+    [
+        "HTTPS://HELLO.WORLD@EXAMPLE.CO.UK/ hi there",
+        "http://hello:@example.com/hello/world?world=hello&hello=world#hi",
+        "https://www.EXAMPLE.com.:8080",
+        "mailto:hello@example.com",
+        "//www.example.com/../hello",
+        "../hello?b=2&a=1#top",
+        "",
+    ],
+)
+def test_hyperlink_parsed_once_is_normalised(input_link):
+    href = make_hyperlink(input_link)
+    assert href.url == normalise_url(input_link)
+    # the components are those of the link as it was given, normalised
+    scheme, authority, path, query, fragment = urllib.parse.urlsplit(input_link)
+    assert href.scheme == normalise_scheme(scheme)
+    assert href.authority == normalise_authority(authority)
+    assert href.path == normalise_path(path)
+    assert href.query == normalise_query(query)
+    assert href.fragment == normalise_fragment(fragment)
+
+
+def test_hyperlink_is_immutable():
+    href = make_hyperlink("https://www.example.com/hello")
+    with pytest.raises(AttributeError):
+        href.url = "https://www.example.com/world"
+    with pytest.raises(AttributeError):
+        href.authority = "www.example.org"
+    with pytest.raises(AttributeError):
+        del href.path
+    assert href.url == "https://www.example.com/hello"
+
+
+def test_hyperlink_hash_and_pickle():
+    href = make_hyperlink("HTTPS://www.example.com/hello?b=2&a=1")
+    assert hash(href) == hash(make_hyperlink("https://www.example.com/hello?a=1&b=2"))
+    assert len({href, make_hyperlink("https://www.example.com/hello?a=1&b=2")}) == 1
+    copy = pickle.loads(pickle.dumps(href))
+    assert copy == href and hash(copy) == hash(href)
+    assert copy.authority == "www.example.com"
+
+
 def test_hyperlink_set_behaves_like_set():
     links = {"/hello", "/world", "/?hello=world"}
     # check __init__
@@ -361,3 +416,73 @@ def test_hyperlink_set_filter_by_mutli_kwargs(fields, input_links, output_links)
     filtered_hrefs = input_hrefs.filter_by(**fields)
     output_hrefs = make_hyperlink_set(output_links)
     assert filtered_hrefs == output_hrefs
+
+
+LINKS = [
+    "https://www.example.com#with-fragment",
+    "https://www.example.com?with=query",
+    "#with-fragment",
+    "?with=query",
+    "../hello?b=2&a=1",
+    "./hello",
+    "hello",
+    "//www.EXAMPLE.com/world",
+    "https://www.subdomain.example.com",
+    "mailto:hello@example.com",
+]
+
+
+@pytest.mark.parametrize("query", [True, False])
+@pytest.mark.parametrize("fragment", [True, False])
+@pytest.mark.parametrize(
+    "base", ["https://www.example.com/a/b", "https://www.example.com/?x=1#top"]
+)
+def test_link_pipeline_same_as_chain(query, fragment, base):
+    base = make_hyperlink(base)
+    pipeline = (
+        LinkPipeline()
+        .trim(query=query, fragment=fragment)
+        .join(base)
+        .filter_by(authority=base.authority)
+    )
+    # as the chain on each link, which (unlike the chain on a set) keeps both
+    # ../hello and ./hello though they are the same before they are joined
+    expected = set()
+    for link in LINKS:
+        chained = (
+            make_hyperlink_set([link])
+            .trim(query=query, fragment=fragment)
+            .join_all(base)
+            .filter_by(authority=base.authority)
+        )
+        expected |= chained.collection
+    assert pipeline.collect(LINKS).collection == expected
+    assert pipeline.collect(make_hyperlink(link) for link in LINKS).collection == expected
+
+
+def test_link_pipeline_lazy_and_deduped():
+    pipeline = LinkPipeline().join("https://www.example.com/").filter_by(scheme="HTTPS")
+    links = iter(["/a", "/b", "/a", "http://www.example.com/", "/c"])
+    found = pipeline(links)
+    assert next(found) == make_hyperlink("https://www.example.com/a")
+    assert next(links) == "/b"
+    assert list(found) == [make_hyperlink("https://www.example.com/c")]
+
+
+def test_link_pipeline_only_makes_links_left():
+    LINK_CACHE.clear()
+    pipeline = LinkPipeline().trim(fragment=True).filter_by(authority="www.example.com")
+    (link,) = pipeline(["https://www.example.com/a#b", "https://www.example.org/"])
+    assert (link.url, link._input_url) == ("https://www.example.com/a", "https://www.example.com/a")
+    assert link.authority == "www.example.com"
+    assert LINK_CACHE.stats()["misses"] == 2
+
+
+def test_link_pipeline_steps_compose():
+    pipeline = LinkPipeline().trim(query=True)
+    both = pipeline.trim(fragment=True)
+    assert list(pipeline(["/a?b#c"])) == [make_hyperlink("/a#c")]
+    assert list(both(["/a?b#c"])) == [make_hyperlink("/a")]
+    assert list(LinkPipeline()([])) == []
+    with pytest.raises(TypeError):
+        list(LinkPipeline()([1]))
@@ -0,0 +1,98 @@
+import pytest
+import requests
+
+from simple_crawler.metrics import CrawlMetrics
+from simple_crawler.metrics import Histogram
+from simple_crawler.metrics import MetricsRegistry
+from simple_crawler.metrics import MetricsServer
+
+
+def test_counter():
+    registry = MetricsRegistry()
+    pages = registry.counter("pages_total", "pages crawled")
+    statuses = registry.counter("responses_total", "responses", "status")
+    pages.inc()
+    pages.inc(2)
+    statuses.inc(label=404)
+    statuses.inc(label=200)
+    statuses.inc(label=200)
+    assert pages.value() == 3
+    assert statuses.values() == {200: 2, 404: 1}
+    assert registry.render().splitlines()[-2:] == [
+        'responses_total{status="200"} 2',
+        'responses_total{status="404"} 1',
+    ]
+    registry.reset()
+    assert (pages.value(), statuses.values()) == (0, {})
+
+
+def test_gauge_is_read_when_rendered():
+    registry = MetricsRegistry()
+    queue = []
+    registry.gauge("queued", "urls queued", lambda: len(queue))
+    assert registry.render().endswith("queued 0\n")
+    queue.append(1)
+    assert registry.render().endswith("queued 1\n")
+
+
+def test_histogram():
+    histogram = Histogram("seconds", "seconds", "host", buckets=(0.1, 1))
+    for value in (0.05, 0.5, 0.5, 5):
+        histogram.observe(value, label="a.example.com")
+    histogram.observe(0.1, label="b.example.com")
+
+    assert [f"{name} {dict(labels)} {value}" for name, labels, value in histogram.samples()] == [
+        "seconds_bucket {'host': 'a.example.com', 'le': 0.1} 1",
+        "seconds_bucket {'host': 'a.example.com', 'le': 1} 3",
+        "seconds_bucket {'host': 'a.example.com', 'le': '+Inf'} 4",
+        "seconds_sum {'host': 'a.example.com'} 6.05",
+        "seconds_count {'host': 'a.example.com'} 4",
+        "seconds_bucket {'host': 'b.example.com', 'le': 0.1} 1",
+        "seconds_bucket {'host': 'b.example.com', 'le': 1} 1",
+        "seconds_bucket {'host': 'b.example.com', 'le': '+Inf'} 1",
+        "seconds_sum {'host': 'b.example.com'} 0.1",
+        "seconds_count {'host': 'b.example.com'} 1",
+    ]
+
+    summary = histogram.summary()["a.example.com"]
+    assert summary["count"] == 4
+    assert summary["p50"] == pytest.approx(0.55)
+    # past the last bucket the best guess is its bound
+    assert summary["p99"] == 1
+
+
+def test_histogram_summary_without_label():
+    histogram = Histogram("seconds", "seconds")
+    assert histogram.summary() == {"count": 0, "sum": 0.0, "p50": None, "p99": None}
+    histogram.observe(0.001)
+    assert histogram.summary()["count"] == 1
+
+
+def test_crawl_metrics_stats():
+    frontier = [1, 2, 3]
+    metrics = CrawlMetrics(frontier_size=lambda: len(frontier), in_flight=lambda: 2)
+    metrics.start()
+    metrics.pages.inc()
+    metrics.bytes.inc(100)
+    metrics.responses.inc(label=200)
+    stats = metrics.stats()
+    assert (stats["pages"], stats["bytes"], stats["frontier"], stats["in_flight"]) == (1, 100, 3, 2)
+    assert stats["bytes_per_sec"] == pytest.approx(100 * stats["pages_per_sec"])
+    assert stats["status_codes"] == {200: 1}
+    assert stats["fetch_seconds"] == {}
+
+    # a new crawl starts from nothing
+    metrics.start()
+    assert metrics.stats()["pages"] == 0
+
+
+def test_metrics_server():
+    registry = MetricsRegistry()
+    registry.counter("pages_total", "pages crawled").inc(5)
+    with MetricsServer(registry, 0) as server:
+        host, port = server.address
+        resp = requests.get(f"http://{host}:{port}/metrics")
+        assert resp.status_code == 200
+        assert resp.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+        assert resp.text == registry.render()
+        assert requests.get(f"http://{host}:{port}/").status_code == 404
@@ -0,0 +1,73 @@
+import pytest
+
+from simple_crawler.ordering import BestFirst
+from simple_crawler.ordering import BreadthFirst
+from simple_crawler.ordering import DepthFirst
+from simple_crawler.ordering import DepthWeighted
+from simple_crawler.ordering import make_order
+from simple_crawler.ordering import path_pattern
+
+
+@pytest.mark.parametrize(
+    "url, pattern",
+    [
+        ("https://www.example.com", "/"),
+        ("https://www.example.com/about", "/"),
+        ("https://www.example.com/blog/", "/blog/"),
+        ("https://www.example.com/blog/hello", "/blog/"),
+        ("https://www.example.com/blog/2020/hello", "/blog/#/"),
+        ("https://www.example.com/v2/items/10/", "/v#/items/#/"),
+    ],
+)
+def test_path_pattern(url, pattern):
+    assert path_pattern(url) == pattern
+
+
+@pytest.mark.parametrize(
+    "name, cls",
+    [
+        ("bfs", BreadthFirst),
+        ("dfs", DepthFirst),
+        ("depth-weighted", DepthWeighted),
+        ("best-first", BestFirst),
+    ],
+)
+def test_make_order(name, cls):
+    assert isinstance(make_order(name), cls)
+
+
+def test_make_order_unknown():
+    with pytest.raises(ValueError):
+        make_order("random")
+
+
+def test_orders_sort_urls():
+    found = [("/a", 1), ("/b", 0), ("/c", 2), ("/d", 1)]
+
+    def crawl_order(order):
+        keys = {url: order.key(url, depth, seq) for seq, (url, depth) in enumerate(found)}
+        return sorted(keys, key=keys.get)
+
+    assert crawl_order(BreadthFirst()) == ["/b", "/a", "/d", "/c"]
+    assert crawl_order(DepthFirst()) == ["/c", "/d", "/a", "/b"]
+    assert crawl_order(DepthWeighted(weight=0)) == ["/a", "/b", "/c", "/d"]
+    assert crawl_order(DepthWeighted(weight=1.5)) == ["/b", "/a", "/d", "/c"]
+
+
+def test_best_first_link_yield():
+    order = BestFirst(prior=2)
+    assert order.link_yield("/blog/") == 2
+    order.record("/blog/1", 10)
+    order.record("/blog/2", 0)
+    assert order.link_yield("/blog/") == 4
+    order.record("/tags/1", 0)
+    assert order.link_yield("/tags/") == 1
+    assert order.top_patterns() == [("/blog/", 4), ("/tags/", 1)]
+
+    assert order.key("/blog/3", 0, 1) < order.key("/tags/3", 0, 0)
+    assert order.key("/new/1", 0, 2) < order.key("/tags/3", 0, 0)
+
+
+def test_best_first_depth_weight():
+    order = BestFirst(depth_weight=1)
+    assert order.key("/a", 0, 1) < order.key("/b", 1, 0)
@@ -4,6 +4,7 @@ from simple_crawler.hyperlink import make_hyperlink
 from simple_crawler.hyperlink import make_hyperlink_set
 from simple_crawler.parser import AnchorTagParser
 from simple_crawler.parser import get_hrefs_from_html
+from simple_crawler.parser import parse_hrefs
 from tests.conftest import make_a_tag
 from tests.conftest import make_a_tags
 from tests.conftest import make_html
@@ -156,3 +157,16 @@ def test_get_hrefs_from_html_unique(input_links, output_results):
     hrefs = {make_hyperlink(link) for link in output_results}
     assert get_hrefs_from_html(html).collection == hrefs
     assert get_hrefs_from_html(html) == make_hyperlink_set(hrefs)
+
+
+@pytest.mark.parametrize("encoding", ["utf-8", "latin-1", None, "not-an-encoding"])
+def test_parse_hrefs(encoding):
+    links = ["/", "/hello", "https://www.example.com/world", "/hello", "?q=caf\u00e9"]
+    html = make_html(make_a_tags(links) + "<a>no href</a><a href>empty</a>")
+    content = html.encode(encoding if encoding in ("utf-8", "latin-1") else "utf-8")
+    assert parse_hrefs(content, encoding) == [
+        "/",
+        "/hello",
+        "https://www.example.com/world",
+        "?q=caf\u00e9",
+    ]
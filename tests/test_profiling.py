@@ -0,0 +1,92 @@
+import json
+import threading
+
+from simple_crawler.profiling import CPROFILE_FILE
+from simple_crawler.profiling import CPROFILE_TEXT_FILE
+from simple_crawler.profiling import NoTracer
+from simple_crawler.profiling import Profiler
+from simple_crawler.profiling import STAGES_FILE
+from simple_crawler.profiling import TRACE_FILE
+from simple_crawler.profiling import TRACEMALLOC_FILE
+from simple_crawler.profiling import Tracer
+
+
+def test_no_tracer_keeps_nothing():
+    tracer = NoTracer()
+    with tracer.span("parse"):
+        pass
+    tracer.add("fetch", 0.0, 1.0)
+    assert not hasattr(tracer, "spans")
+
+
+def test_tracer_span():
+    tracer = Tracer()
+    with tracer.span("parse"):
+        pass
+    with tracer.span("fetch", tid=1):
+        pass
+
+    parse, fetch = tracer.spans
+    assert (parse.name, parse.tid) == ("parse", threading.get_ident())
+    assert (fetch.name, fetch.tid) == ("fetch", 1)
+    assert parse.start >= tracer.started
+    assert parse.duration >= 0
+
+
+def test_tracer_stages_sorted_by_total():
+    tracer = Tracer()
+    tracer.add("parse", 0.0, 0.5)
+    tracer.add("fetch", 0.0, 1.0)
+    tracer.add("fetch", 1.0, 2.0)
+    assert list(tracer.stages()) == ["fetch", "parse"]
+    assert tracer.stages()["fetch"] == {"count": 2, "total": 3.0, "mean": 1.5, "max": 2.0}
+
+    lines = tracer.format_stages().splitlines()
+    assert lines[0].split() == ["stage", "count", "total", "s", "mean", "ms", "max", "ms"]
+    assert lines[1].split() == ["fetch", "2", "3.000", "1500.000", "2000.000"]
+
+
+def test_tracer_chrome_trace():
+    tracer = Tracer()
+    tracer.add("fetch", tracer.started + 1, 0.5, tid=7)
+    trace = tracer.chrome_trace()
+    (event,) = trace["traceEvents"]
+    assert event["name"] == "fetch"
+    assert event["ph"] == "X"
+    assert (event["ts"], event["dur"], event["tid"]) == (1e6, 5e5, 7)
+
+
+def test_profiler_writes_trace_and_stages(tmpdir):
+    directory = tmpdir.join("profile")
+    with Profiler(str(directory)) as profiler:
+        with profiler.tracer.span("parse"):
+            pass
+
+    assert json.load(open(directory.join(TRACE_FILE)))["traceEvents"][0]["name"] == "parse"
+    assert "\nparse " in directory.join(STAGES_FILE).read()
+    assert not directory.join(CPROFILE_FILE).exists()
+    assert not directory.join(TRACEMALLOC_FILE).exists()
+
+
+def profiled_work():
+    return sum(range(1000))
+
+
+def test_profiler_cprofile_every_thread(tmpdir):
+    with Profiler(str(tmpdir), cprofile=True):
+        thread = threading.Thread(target=profiled_work)
+        thread.start()
+        thread.join()
+
+    assert tmpdir.join(CPROFILE_FILE).exists()
+    assert "profiled_work" in tmpdir.join(CPROFILE_TEXT_FILE).read()
+
+
+def test_profiler_tracemalloc(tmpdir):
+    with Profiler(str(tmpdir), memory=True):
+        kept = [bytes(1000) for _ in range(100)]
+
+    report = tmpdir.join(TRACEMALLOC_FILE).read()
+    assert report.startswith("current: ")
+    assert "test_profiling.py" in report
+    assert kept
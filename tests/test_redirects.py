@@ -0,0 +1,54 @@
+import pytest
+
+from simple_crawler.hyperlink import make_hyperlink
+from simple_crawler.redirects import MAX_REDIRECTS
+from simple_crawler.redirects import RedirectCache
+
+HOST = "https://www.example.com"
+
+
+def link(path: str):
+    return make_hyperlink(HOST + path)
+
+
+@pytest.fixture
+def cache():
+    cache = RedirectCache()
+    cache.put(link("/a"), link("/b"))
+    cache.put(link("/b"), link("/c"))
+    return cache
+
+
+def test_redirect_cache_resolve(cache):
+    assert cache.resolve(link("/a")) == link("/c")
+    assert cache.resolve(link("/b")) == link("/c")
+    assert cache.resolve(link("/c")) == link("/c")
+    # keyed by normalised url
+    assert cache.resolve(make_hyperlink("HTTPS://www.EXAMPLE.com/a")) == link("/c")
+
+
+def test_redirect_cache_loop(cache):
+    cache.put(link("/c"), link("/a"))
+    assert cache.resolve(link("/a")) == link("/a")
+    assert cache.resolve(link("/c")) == link("/c")
+
+
+def test_redirect_cache_long_chain():
+    cache = RedirectCache()
+    for i in range(MAX_REDIRECTS * 2):
+        cache.put(link(f"/{i}"), link(f"/{i + 1}"))
+    assert cache.resolve(link("/0")) == link(f"/{MAX_REDIRECTS}")
+
+
+def test_redirect_cache_ignores_self_redirect():
+    cache = RedirectCache()
+    cache.put(link("/a"), link("/a"))
+    assert len(cache) == 0
+    assert link("/a") not in cache
+
+
+def test_redirect_cache_edges(cache):
+    assert link("/a") in cache
+    assert link("/c") not in cache
+    assert len(cache) == 2
+    assert sorted(cache.edges()) == [(HOST + "/a", HOST + "/b"), (HOST + "/b", HOST + "/c")]
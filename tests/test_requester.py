@@ -1,11 +1,18 @@
+import asyncio
+
 import pytest
 from flask import abort
 from flask import Flask
+from flask import make_response
+from flask import request
 
+from simple_crawler.requester import AsyncRequester
+from simple_crawler.requester import BadResponse
 from simple_crawler.requester import ClientError
 from simple_crawler.requester import Requester
 from simple_crawler.requester import ServerError
 from simple_crawler.requester import WrongMIMEType
+from tests.conftest import RawServer
 from tests.conftest import WebServer
 
 USER_AGENT = "TestAgent"
@@ -37,6 +44,17 @@ def requester_server():
     def mime(group, name):
         return MOCK_BODY, 200, {"Content-Type": f"{group}/{name}"}
 
+    @server.app.route("/etag")
+    def etag():
+        response = make_response(MOCK_BODY)
+        response.set_etag("v1")
+        return response.make_conditional(request)
+
+    @server.app.route("/not-modified")
+    def not_modified():
+        # a 304 with no Content-Type
+        return "", 304, {"Content-Type": ""}
+
     with server.run():
         yield server
 
@@ -81,3 +99,83 @@ def test_requester_get_request_different_mime_type(requester, requester_server,
 def test_requester_get_request_mime_type_error(requester, check_head, requester_server):
     with pytest.raises(WrongMIMEType):
         requester(requester_server.url + "/mime/image/png", check_head_first=check_head)
+
+
+def run(coroutine):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+@pytest.fixture
+def async_requester():
+    return AsyncRequester(user_agent=USER_AGENT)
+
+
+@pytest.mark.parametrize("method, text", [("GET", MOCK_BODY), ("HEAD", "")])
+def test_async_requester_request_200(method, text, async_requester, requester_server):
+    response = run(
+        async_requester.request(method, requester_server.url + "/", mime_types=("text/html",))
+    )
+    assert response.text == text
+    assert response.status_code == 200
+    assert response.reason == "OK"
+    assert "text/html" in response.headers["content-type"]
+
+
+@pytest.mark.parametrize("code, exc", [(400, ClientError), (404, ClientError), (500, ServerError)])
+def test_async_requester_get_request_raises_error(async_requester, code, exc, requester_server):
+    with pytest.raises(exc):
+        run(async_requester(requester_server.url + f"/error/{code}", check_head_first=False))
+
+
+@pytest.mark.parametrize(
+    "response",
+    [
+        # the connection is closed mid body
+        b"HTTP/1.1 200 OK\r\nContent-Type: text/html\r\nContent-Length: 100\r\n\r\n<html>",
+        b"HTTP/1.1 200 OK\r\nContent-Type: text/html\r\nTransfer-Encoding: chunked\r\n\r\n64\r\n<ht",
+        b"HTTP/1.1 OK\r\n\r\n",
+        b"hello",
+    ],
+)
+def test_async_requester_bad_response(async_requester, response):
+    with RawServer({"/": response}).run() as server:
+        with pytest.raises(BadResponse):
+            run(async_requester(server.url + "/", check_head_first=False))
+
+
+@pytest.mark.parametrize("check_head", [True, False])
+def test_async_requester_get_request_mime_type_error(async_requester, check_head, requester_server):
+    with pytest.raises(WrongMIMEType):
+        run(async_requester(requester_server.url + "/mime/image/png", check_head_first=check_head))
+
+
+@pytest.mark.parametrize("etag, status", [('"v1"', 304), ('"v0"', 200)])
+@pytest.mark.parametrize("check_head", [True, False])
+def test_requester_conditional_request(requester, requester_server, etag, status, check_head):
+    response = requester(
+        requester_server.url + "/etag", check_head_first=check_head, headers={"If-None-Match": etag}
+    )
+    assert response.status_code == status
+    assert response.text == ("" if status == 304 else MOCK_BODY)
+
+
+@pytest.mark.parametrize("etag, status", [('"v1"', 304), ('"v0"', 200)])
+def test_async_requester_conditional_request(async_requester, requester_server, etag, status):
+    response = run(
+        async_requester(
+            requester_server.url + "/etag", check_head_first=False, headers={"If-None-Match": etag}
+        )
+    )
+    assert response.status_code == status
+    assert response.text == ("" if status == 304 else MOCK_BODY)
+
+
+def test_requester_not_modified_without_content_type(requester, requester_server):
+    response = requester(requester_server.url + "/not-modified", check_head_first=False)
+    assert response.status_code == 304
+    response = run(AsyncRequester()(requester_server.url + "/not-modified", check_head_first=False))
+    assert response.status_code == 304
@@ -0,0 +1,62 @@
+import random
+
+import pytest
+
+from simple_crawler.hyperlink import make_hyperlink
+from simple_crawler.retry import ErrorLog
+from simple_crawler.retry import parse_retry_after
+from simple_crawler.retry import RetryPolicy
+
+
+def test_parse_retry_after():
+    assert parse_retry_after(None) is None
+    assert parse_retry_after(" 5 ") == 5.0
+    assert parse_retry_after("-5") is None
+    assert parse_retry_after("") is None
+
+
+def test_retry_policy_backoff_grows_with_jitter():
+    policy = RetryPolicy(backoff=1, max_backoff=8, rng=random.Random(0))
+    for retry, (low, high) in enumerate([(0.5, 1), (1, 2), (2, 4), (4, 8), (4, 8)], 1):
+        delays = {policy.backoff_for(retry) for _ in range(20)}
+        assert all(low <= delay <= high for delay in delays)
+        # jitter spreads retries out
+        assert len(delays) > 1
+
+
+def test_retry_policy_delay():
+    policy = RetryPolicy(max_retries=2, backoff=1, max_backoff=10, rng=random.Random(0))
+    assert 0.5 <= policy.delay(1, 503) <= 1
+    assert 1 <= policy.delay(2, None) <= 2
+    # out of retries
+    assert policy.delay(3, 503) is None
+    # not a transient error
+    assert policy.delay(1, 404) is None
+    # Retry-After is honoured if longer, and given up on if too long
+    assert policy.delay(1, 429, "5") == 5.0
+    assert 0.5 <= policy.delay(1, 429, "0") <= 1
+    assert policy.delay(1, 429, "11") is None
+
+
+def test_retry_policy_never_retries():
+    assert RetryPolicy().delay(1, 503) is None
+    with pytest.raises(ValueError):
+        RetryPolicy(max_retries=-1)
+
+
+def test_error_log():
+    errors = ErrorLog()
+    a, b = make_hyperlink("https://a.example.com/"), make_hyperlink("https://b.example.com/x")
+    assert errors.record(a, 503) == 1
+    assert errors.record(a, "ConnectionError") == 2
+    assert errors.record(b, 503) == 1
+    assert errors.errors_of(a) == [503, "ConnectionError"]
+    assert errors.errors_of(make_hyperlink("https://a.example.com/other")) == []
+    assert errors.by_host() == {
+        "a.example.com": {503: 1, "ConnectionError": 1},
+        "b.example.com": {503: 1},
+    }
+    assert len(errors) == 3
+    errors.clear()
+    assert len(errors) == 0
+    assert errors.by_host() == {}
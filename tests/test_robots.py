@@ -0,0 +1,120 @@
+import threading
+import time
+from urllib.robotparser import RequestRate
+
+import pytest
+
+from simple_crawler.hyperlink import make_hyperlink
+from simple_crawler.robots import RobotsCache
+from simple_crawler.robots import RobotsRules
+
+ROBOTS_TXT = """
+# comment
+User-agent: Tester
+User-agent: OtherTester
+Allow: /this/
+Disallow: /this/not/
+Disallow: /hello
+Disallow: /*.php$
+Allow: /public/*.php$
+Disallow: /search?q=
+Crawl-delay: 0.5
+Request-rate: 3/2
+
+User-agent: *
+Disallow: /private
+"""
+
+
+@pytest.fixture(scope="module")
+def rules():
+    return RobotsRules(ROBOTS_TXT)
+
+
+@pytest.mark.parametrize(
+    "useragent, url, allowed",
+    [
+        ("Tester", "/", True),
+        ("Tester", "/this/", True),
+        ("Tester", "/this/not/here", False),
+        ("Tester", "/hello", False),
+        ("Tester", "/hello/world", False),
+        ("Tester", "/index.php", False),
+        ("Tester", "/index.php?a=b", True),
+        ("Tester", "/public/index.php", True),
+        ("Tester", "/search?q=hello", False),
+        ("Tester", "/search", True),
+        ("Tester", "/private", True),
+        ("Tester", "https://www.example.com/hello", False),
+        ("tester/1.0", "/hello", False),
+        ("OtherTester", "/hello", False),
+        ("Someone", "/hello", True),
+        ("Someone", "/private/page", False),
+        ("Someone", "/robots.txt", True),
+    ],
+)
+def test_robots_rules_can_fetch(rules, useragent, url, allowed):
+    assert rules.can_fetch(useragent, url) is allowed
+
+
+def test_robots_rules_delays(rules):
+    assert rules.crawl_delay("Tester") == 0.5
+    assert rules.request_rate("Tester") == RequestRate(3, 2)
+    assert rules.crawl_delay("Someone") is None
+    assert rules.request_rate("Someone") is None
+
+
+@pytest.mark.parametrize("text", ["", "Disallow: /", "User-agent: *\nDisallow:"])
+def test_robots_rules_allow_all(text):
+    assert RobotsRules(text).can_fetch("Tester", "/anything") is True
+
+
+def test_robots_cache_fetches_each_host_once():
+    fetched = []
+    lock = threading.Lock()
+
+    def fetch(robots_url):
+        time.sleep(0.05)
+        with lock:
+            fetched.append(str(robots_url))
+        return "User-agent: *\nDisallow: /private"
+
+    cache = RobotsCache(fetch)
+    urls = [make_hyperlink(f"https://{host}.example.com/page") for host in "abc"] * 5
+    threads = [threading.Thread(target=cache.get, args=(url,)) for url in urls]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(fetched) == [f"https://{host}.example.com/robots.txt" for host in "abc"]
+    assert len(cache) == 3
+    assert cache.get(urls[0]).can_fetch("Tester", "/private") is False
+
+
+def test_robots_cache_ttl_and_eviction():
+    fetched = []
+    loaded = []
+
+    def fetch(robots_url):
+        fetched.append(str(robots_url))
+        return ""
+
+    cache = RobotsCache(fetch, ttl=0.05, max_size=2, on_load=lambda url, _: loaded.append(url))
+    a, b, c = (make_hyperlink(f"https://{host}.example.com/") for host in "abc")
+
+    cache.get(a)
+    cache.get(a)
+    assert a in cache
+    assert len(fetched) == 1
+
+    time.sleep(0.1)
+    assert a not in cache
+    cache.get(a)
+    assert len(fetched) == 2
+
+    cache.get(b)
+    cache.get(c)
+    assert len(cache) == 2
+    assert a not in cache
+    assert loaded == [a, a, b, c]
@@ -0,0 +1,64 @@
+import pytest
+
+from simple_crawler.budget import FINISHED
+from simple_crawler.budget import MAX_PAGES
+from simple_crawler.hyperlink import make_hyperlink
+from simple_crawler.sharded import shard_of
+from simple_crawler.sharded import ShardedCrawler
+from tests.test_crawler import crawler_server  # noqa: F401
+
+
+@pytest.mark.parametrize("shards", [1, 2, 3, 8])
+def test_shard_of(shards):
+    links = [make_hyperlink(f"https://www.example.com/{i}") for i in range(100)]
+    found = {shard_of(link, shards) for link in links}
+    assert found == set(range(shards))
+    assert {shard_of(link, shards, by="host") for link in links} == {
+        shard_of(links[0], shards, by="host")
+    }
+
+
+@pytest.mark.parametrize("shard_by", ["url", "host"])
+@pytest.mark.parametrize("processes", [2, 3])
+def test_sharded_crawler_crawl_find_all_links(crawler_server, processes, shard_by):  # noqa: F811
+    crawler = ShardedCrawler(processes=processes, shard_by=shard_by, max_workers=4, timeout=5)
+    found_links = crawler.crawl(crawler_server.url)
+    assert found_links == crawler_server.links
+    assert crawler.stop_reason == FINISHED
+
+
+def test_sharded_crawler_iter_crawl(crawler_server):  # noqa: F811
+    crawler = ShardedCrawler(processes=2, max_workers=4, timeout=5)
+    results = list(crawler.iter_crawl(crawler_server.url))
+    assert {result.url for result in results if result.ok} == crawler_server.links
+    # each url is crawled by one process only
+    assert len(results) == len({result.url for result in results})
+
+
+def test_sharded_crawler_max_pages(crawler_server):  # noqa: F811
+    crawler = ShardedCrawler(processes=2, max_workers=1, timeout=5, max_pages=1)
+    found_links = crawler.crawl(crawler_server.url)
+    # each process may crawl one page before the first to do so stops them all
+    assert 1 <= len(found_links) <= 2
+    assert crawler.stop_reason == MAX_PAGES
+
+
+def test_sharded_crawler_config():
+    crawler = ShardedCrawler(processes=3, shard_by="host", max_workers=2)
+    assert crawler.config["processes"] == 3
+    assert crawler.config["shard_by"] == "host"
+    assert crawler.config["max_workers"] == 2
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [{"processes": 0}, {"shard_by": "path"}, {"state_dir": "state"}, {"validators_dir": "v"}],
+)
+def test_sharded_crawler_invalid(kwargs):
+    with pytest.raises(ValueError):
+        ShardedCrawler(**kwargs)
+
+
+def test_sharded_crawler_no_resume(crawler_server):  # noqa: F811
+    with pytest.raises(ValueError):
+        list(ShardedCrawler().iter_crawl(crawler_server.url, resume=True))
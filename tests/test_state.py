@@ -0,0 +1,74 @@
+import pytest
+
+from simple_crawler.hyperlink import make_hyperlink
+from simple_crawler.state import CrawlState
+from simple_crawler.state import NoCrawlState
+from simple_crawler.state import StateError
+
+SEED = make_hyperlink("https://www.example.com/")
+URLS = [make_hyperlink(f"https://www.example.com/{i}") for i in range(4)]
+
+
+def test_no_crawl_state():
+    state = NoCrawlState()
+    state.start(SEED)
+    state.seen(SEED)
+    state.finish(SEED, True)
+    state.checkpoint()
+    state.close()
+    with pytest.raises(StateError):
+        state.load()
+
+
+def test_crawl_state_load_without_start(tmp_path):
+    state = CrawlState(str(tmp_path))
+    assert CrawlState.exists(str(tmp_path))
+    with pytest.raises(StateError):
+        state.load()
+    state.close()
+
+
+def test_crawl_state_checkpoint_and_load(tmp_path):
+    state = CrawlState(str(tmp_path), checkpoint_interval=60)
+    state.start(SEED)
+    for depth, url in enumerate(URLS):
+        state.seen(url, depth)
+    state.seen(URLS[0])
+    state.finish(URLS[0], True)
+    state.finish(URLS[1], False)
+    state.close()
+
+    state = CrawlState(str(tmp_path))
+    seed, seen, done, pending = state.load()
+    state.close()
+    assert seed == str(SEED)
+    assert seen == {str(url) for url in URLS}
+    assert done == {str(URLS[0])}
+    assert pending == [(str(URLS[2]), 2), (str(URLS[3]), 3)]
+
+
+def test_crawl_state_start_clears_state(tmp_path):
+    state = CrawlState(str(tmp_path))
+    state.start(SEED)
+    state.seen(URLS[0])
+    state.push(URLS[1])
+    state.close()
+
+    state = CrawlState(str(tmp_path))
+    state.start(URLS[0])
+    assert state.pop_batch(10) == []
+    state.close()
+
+    state = CrawlState(str(tmp_path))
+    assert state.load() == (str(URLS[0]), set(), set(), [])
+    state.close()
+
+
+def test_crawl_state_spill(tmp_path):
+    state = CrawlState(str(tmp_path))
+    for depth, url in enumerate(URLS):
+        state.push(url, depth)
+    assert state.pop_batch(3) == [(str(url), depth) for depth, url in enumerate(URLS[:3])]
+    assert state.pop_batch(3) == [(str(URLS[3]), 3)]
+    assert state.pop_batch(3) == []
+    state.close()
@@ -0,0 +1,132 @@
+import random
+import threading
+
+import pytest
+
+from simple_crawler.hyperlink import LINK_CACHE
+from simple_crawler.hyperlink import make_hyperlink
+from simple_crawler.url_normalisation import _normalise_url
+from simple_crawler.url_normalisation import is_canonical
+from simple_crawler.url_normalisation import LRUCache
+from simple_crawler.url_normalisation import normalise_url
+from simple_crawler.url_normalisation import URL_CACHE
+
+
+def test_lru_cache_drops_least_recently_used():
+    cache = LRUCache(max_size=2)
+    calls = []
+
+    def compute(key):
+        calls.append(key)
+        return key.upper()
+
+    assert [cache.get(key, compute) for key in ("a", "b", "a", "c", "b")] == list("ABACB")
+    # b was dropped for c, as a was used more recently
+    assert calls == ["a", "b", "c", "b"]
+    assert cache.stats() == {"size": 2, "max_size": 2, "hits": 1, "misses": 4, "hit_rate": 0.2}
+    cache.clear()
+    assert (len(cache), cache.stats()["hits"]) == (0, 0)
+
+
+def test_lru_cache_max_size_zero_keeps_nothing():
+    cache = LRUCache(max_size=0)
+    assert cache.get("a", str.upper) == cache.get("a", str.upper) == "A"
+    assert (len(cache), cache.misses) == (0, 2)
+
+
+def test_lru_cache_errors_are_not_cached():
+    cache = LRUCache()
+    with pytest.raises(ValueError):
+        cache.get("a", int)
+    assert len(cache) == 0
+
+
+def test_lru_cache_thread_safe():
+    cache = LRUCache(max_size=50)
+    keys = [str(i) for i in range(100)]
+
+    def run():
+        for key in keys * 20:
+            assert cache.get(key, lambda key: key * 2) == key * 2
+
+    threads = [threading.Thread(target=run) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    stats = cache.stats()
+    assert stats["size"] == 50
+    assert stats["hits"] + stats["misses"] == 8 * 20 * 100
+
+
+@pytest.mark.parametrize(
+    "url",
+    [
+        "https://www.example.com/",
+        "http://www.example.com:8080/hello/world.html",
+        "https://www.example.com/Hello%20World?a=1&b=2#top",
+        "/hello/world/",
+        "/?a=1",
+    ],
+)
+def test_is_canonical(url):
+    assert is_canonical(url)
+    assert _normalise_url(url) == url
+
+
+@pytest.mark.parametrize(
+    "url",
+    [
+        "HTTPS://www.example.com/",
+        "https://www.EXAMPLE.com/",
+        "https://www.example.com./",
+        "https://user@www.example.com/",
+        "https://www.example.com",
+        "https://www.example.com/?",
+        "https://www.example.com/hello world",
+        "https://www.example.com/?b=2&a=1",
+        "https://www.example.com/?a=1+2",
+        # python < 3.7 quotes ~ in paths and queries
+        "https://www.example.com/~user",
+        "/?a=~",
+        "/hello//world",
+        "/hello/./world",
+        "hello",
+        "mailto:hello@example.com",
+    ],
+)
+def test_is_not_canonical(url):
+    assert not is_canonical(url)
+
+
+def test_is_canonical_never_wrong():
+    # any url said to be canonical must be left as it is by normalising
+    rng = random.Random(0)
+    prefixes = ["", "/", "http://", "https://www.example.com", "https://a.b:80/", "HTTP://a.b/"]
+    alphabet = "aZ09-._~%/?#&=:+ @!"
+    canonical = 0
+    for _ in range(50000):
+        url = rng.choice(prefixes) + "".join(rng.choices(alphabet, k=rng.randint(0, 12)))
+        if is_canonical(url):
+            canonical += 1
+            assert _normalise_url(url) == url
+    assert canonical > 100
+
+
+def test_normalise_url_cached():
+    URL_CACHE.clear()
+    url = "HTTPS://www.EXAMPLE.com/a?b=2&a=1"
+    assert normalise_url(url) == normalise_url(url) == _normalise_url(url)
+    assert (URL_CACHE.hits, URL_CACHE.misses) == (1, 1)
+    # canonical urls are returned as they are, without the cache
+    assert normalise_url("https://www.example.com/") == "https://www.example.com/"
+    assert (URL_CACHE.hits, URL_CACHE.misses) == (1, 1)
+
+
+def test_hyperlink_cached():
+    LINK_CACHE.clear()
+    first = make_hyperlink("/hello?b=2&a=1")
+    second = make_hyperlink("/hello?b=2&a=1")
+    assert first == second and first is not second
+    assert first.path is second.path
+    assert LINK_CACHE.stats()["hit_rate"] == 0.5
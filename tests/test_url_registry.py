@@ -0,0 +1,54 @@
+import threading
+
+import pytest
+
+from simple_crawler.hyperlink import make_hyperlink
+from simple_crawler.hyperlink import make_hyperlink_set
+from simple_crawler.url_registry import URLRegistry
+
+LINKS = ["/", "/hello", "/world", "https://www.example.com/", "https://www.example.com/hello"]
+
+
+@pytest.mark.parametrize("shards", [1, 2, 64])
+def test_url_registry_add_if_absent(shards):
+    registry = URLRegistry(shards=shards)
+    assert registry.is_empty()
+    for link in LINKS:
+        assert registry.add_if_absent(make_hyperlink(link)) is True
+    for link in LINKS:
+        assert registry.add_if_absent(make_hyperlink(link)) is False
+        assert make_hyperlink(link) in registry
+    assert len(registry) == len(LINKS)
+    assert registry.is_not_empty()
+    assert registry == make_hyperlink_set(LINKS)
+    assert registry == URLRegistry(make_hyperlink_set(LINKS))
+    assert make_hyperlink("/not/there") not in registry
+
+
+def test_url_registry_type_error():
+    with pytest.raises(TypeError):
+        URLRegistry().add("/hello")
+
+    with pytest.raises(ValueError):
+        URLRegistry(shards=0)
+
+
+def test_url_registry_add_if_absent_is_atomic():
+    registry = URLRegistry(shards=4)
+    links = [make_hyperlink(f"/page/{i}") for i in range(1000)]
+    new = []
+    barrier = threading.Barrier(8)
+
+    def worker():
+        barrier.wait()
+        new.extend(link for link in links if registry.add_if_absent(link))
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # each link was reported as new by exactly one thread
+    assert sorted(new, key=str) == sorted(links, key=str)
+    assert len(registry) == len(links)
@@ -0,0 +1,71 @@
+import pytest
+
+from simple_crawler.hyperlink import make_hyperlink
+from simple_crawler.validators import content_hash
+from simple_crawler.validators import NoValidatorStore
+from simple_crawler.validators import Validators
+from simple_crawler.validators import ValidatorStore
+
+URLS = [make_hyperlink(f"https://www.example.com/{i}") for i in range(4)]
+VALIDATORS = Validators(
+    '"v1"', "Wed, 01 Jan 2020 00:00:00 GMT", content_hash(b"html"), ("/a", "/b")
+)
+
+
+class MockResponse:
+    def __init__(self, headers: dict, content: bytes):
+        self.headers = headers
+        self.content = content
+
+
+def test_no_validator_store():
+    store = NoValidatorStore()
+    store.put(URLS[0], VALIDATORS)
+    assert store.get(URLS[0]) is None
+    store.close()
+
+
+@pytest.mark.parametrize(
+    "validators, headers",
+    [
+        (
+            VALIDATORS,
+            {"If-None-Match": '"v1"', "If-Modified-Since": "Wed, 01 Jan 2020 00:00:00 GMT"},
+        ),
+        (VALIDATORS._replace(etag=None), {"If-Modified-Since": "Wed, 01 Jan 2020 00:00:00 GMT"}),
+        (VALIDATORS._replace(etag=None, last_modified=None), {}),
+    ],
+)
+def test_validators_headers(validators, headers):
+    assert validators.headers() == headers
+
+
+def test_validators_from_response():
+    resp = MockResponse({"ETag": '"v1"'}, b"html")
+    links = [make_hyperlink("/b"), make_hyperlink("/a")]
+    assert Validators.from_response(resp, links) == VALIDATORS._replace(last_modified=None)
+
+
+def test_validator_store_put_and_get(tmp_path):
+    store = ValidatorStore(str(tmp_path), flush_size=2)
+    store.put(URLS[0], VALIDATORS)
+    # buffered
+    assert store.get(URLS[0]) == VALIDATORS
+    store.put(URLS[1], VALIDATORS._replace(etag=None))
+    # written
+    assert store.get(URLS[1]) == VALIDATORS._replace(etag=None)
+    assert store.get(URLS[2]) is None
+    assert len(store) == 2
+    store.close()
+
+
+def test_validator_store_kept_between_crawls(tmp_path):
+    store = ValidatorStore(str(tmp_path))
+    store.put(URLS[0], VALIDATORS)
+    store.put(URLS[0], VALIDATORS._replace(etag='"v2"'))
+    store.close()
+
+    store = ValidatorStore(str(tmp_path))
+    assert store.get(URLS[0]) == VALIDATORS._replace(etag='"v2"')
+    assert len(store) == 1
+    store.close()
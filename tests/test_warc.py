@@ -0,0 +1,174 @@
+import gzip
+
+import pytest
+import requests
+from flask import Flask
+from flask import redirect
+
+from simple_crawler.crawler import Crawler
+from simple_crawler.warc import read_members
+from simple_crawler.warc import WarcArchive
+from simple_crawler.warc import WarcError
+from simple_crawler.warc import WarcReplayAdapter
+from simple_crawler.warc import WarcWriter
+from tests.conftest import make_html_from_links
+from tests.test_crawler import OtherPortWebServer
+
+
+def make_response(url: str, content: bytes, status_code: int = 200, headers: dict = None):
+    resp = requests.Response()
+    resp.url = url
+    resp.status_code = status_code
+    resp.reason = "OK"
+    resp.headers = requests.structures.CaseInsensitiveDict(headers or {})
+    resp._content = content
+    return resp
+
+
+def replay_session(path: str) -> requests.Session:
+    session = requests.Session()
+    adapter = WarcReplayAdapter(WarcArchive(path))
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+@pytest.fixture
+def site():
+    server = OtherPortWebServer(Flask("warc"))
+
+    @server.app.route("/")
+    def index():
+        return make_html_from_links(["/hello", "/world", "/moved"])
+
+    @server.app.route("/hello")
+    def hello():
+        return make_html_from_links(["/", "/hello/world"])
+
+    @server.app.route("/hello/world")
+    def hello_world():
+        return "<html><body>hello world</body></html>"
+
+    @server.app.route("/world")
+    def world():
+        return "", 200, {"Content-Type": "application/pdf"}
+
+    @server.app.route("/moved")
+    def moved():
+        return redirect("/hello/world")
+
+    return server
+
+
+def test_warc_writer_is_gzip_per_record(tmp_path):
+    path = str(tmp_path / "test.warc.gz")
+    with WarcWriter(path) as writer:
+        writer.write_response(make_response("https://www.example.com/", b"<html></html>"))
+        writer.write_response(make_response("https://www.example.com/a", b"a"))
+    assert writer.records == 2
+
+    # the whole file is valid gzip and each record is its own member
+    assert gzip.open(path).read().count(b"WARC/1.1\r\n") == 3
+    with open(path, "rb") as stream:
+        members = list(read_members(stream))
+    assert len(members) == 3
+    assert members[0][0] == 0
+    assert b"WARC-Type: warcinfo" in members[0][1]
+    assert b"WARC-Target-URI: https://www.example.com/a" in members[2][1]
+
+
+def test_warc_archive_roundtrip(tmp_path):
+    path = str(tmp_path / "test.warc.gz")
+    headers = {"Content-Type": "text/html", "Content-Encoding": "gzip", "ETag": '"v1"'}
+    with WarcWriter(path) as writer:
+        writer.write_response(make_response("https://www.example.com/", b"old"))
+        writer.write_response(
+            make_response("https://www.example.com/", b"<html></html>", 201, headers)
+        )
+
+    archive = WarcArchive(path)
+    assert len(archive) == 1
+    assert "https://www.example.com/" in archive
+    assert "https://www.example.com/a" not in archive
+
+    # the last record of a url wins, its body is as decoded by requests
+    status_code, reason, headers, body = archive.get("https://www.example.com/")
+    assert (status_code, reason, body) == (201, "OK", b"<html></html>")
+    assert headers["etag"] == '"v1"'
+    assert headers["Content-Length"] == "13"
+    assert "Content-Encoding" not in headers
+
+
+def test_warc_archive_appends(tmp_path):
+    path = str(tmp_path / "test.warc.gz")
+    for url in ("https://www.example.com/a", "https://www.example.com/b"):
+        with WarcWriter(path) as writer:
+            writer.write_response(make_response(url, b""))
+    assert len(WarcArchive(path)) == 2
+
+
+def test_warc_archive_invalid(tmp_path):
+    path = tmp_path / "test.warc.gz"
+    path.write_bytes(gzip.compress(b"not a warc record\r\n\r\n"))
+    with pytest.raises(WarcError):
+        len(WarcArchive(str(path)))
+
+    path.write_bytes(gzip.compress(b"WARC/1.1\r\n\r\n")[:-4])
+    with pytest.raises(WarcError):
+        len(WarcArchive(str(path)))
+
+
+def test_warc_replay_adapter(tmp_path):
+    path = str(tmp_path / "test.warc.gz")
+    headers = {"Content-Type": "text/html; charset=utf-8"}
+    with WarcWriter(path) as writer:
+        writer.write_response(
+            make_response("https://www.example.com/", b"<html></html>", 200, headers)
+        )
+
+    session = replay_session(path)
+    resp = session.get("https://www.example.com/")
+    assert resp.status_code == 200
+    assert resp.text == "<html></html>"
+    assert resp.encoding == "utf-8"
+    assert session.head("https://www.example.com/").content == b""
+
+    resp = session.get("https://www.example.com/missing")
+    assert resp.status_code == 404
+    assert resp.reason == "Not In Archive"
+
+
+def test_crawler_replay_matches_live_crawl(site, tmp_path):
+    path = str(tmp_path / "crawl.warc.gz")
+    with site.run():
+        live = list(Crawler(timeout=5, warc_out=path).iter_crawl(site.url))
+
+    # the server is down, every response comes from the archive
+    replayed = list(Crawler(timeout=5, replay=path).iter_crawl(site.url))
+    assert {r.url for r in replayed if r.ok} == {r.url for r in live if r.ok}
+    assert {(r.url, r.status, r.new_links) for r in replayed} == {
+        (r.url, r.status, r.new_links) for r in live
+    }
+
+
+def test_crawler_replay_follows_redirects(site, tmp_path):
+    path = str(tmp_path / "crawl.warc.gz")
+    with site.run():
+        Crawler(timeout=5, warc_out=path).crawl(site.url + "/moved")
+
+    archive = WarcArchive(path)
+    assert site.url + "/moved" in archive
+    assert site.url + "/hello/world" in archive
+
+    resp = replay_session(path).get(site.url + "/moved")
+    assert resp.url == site.url + "/hello/world"
+    assert [r.status_code for r in resp.history] == [302]
+
+
+def test_crawler_warc_out_records_only_during_crawl(site, tmp_path):
+    path = str(tmp_path / "crawl.warc.gz")
+    crawler = Crawler(timeout=5, warc_out=path, obey_robots=False)
+    with site.run():
+        crawler.crawl(site.url + "/hello/world")
+    assert crawler._requester.recorder is None
+    assert list(WarcArchive(path).index) == [site.url + "/hello/world"]